@@ -43,9 +43,85 @@ class Settings(BaseSettings):
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24 часа
     
+    # Стоимость bcrypt (log2 числа раундов). При изменении хеши пользователей
+    # пересчитываются при следующем входе
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Пул хеширования паролей: число потоков (0 - по числу ядер, не больше 4)
+    # и число ожидающих вызовов, после которого вход отклоняется с 503
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+    
+    # Ограничение попыток входа за окно (секунды): на учетную запись и на IP-адрес
+    LOGIN_MAX_ATTEMPTS: int = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+    LOGIN_IP_MAX_ATTEMPTS: int = int(os.getenv("LOGIN_IP_MAX_ATTEMPTS", "20"))
+    LOGIN_ATTEMPT_WINDOW: int = int(os.getenv("LOGIN_ATTEMPT_WINDOW", "300"))
+    # Число ключей ограничения частоты в памяти процесса, когда Redis недоступен
+    RATE_LIMIT_LOCAL_SIZE: int = int(os.getenv("RATE_LIMIT_LOCAL_SIZE", "10000"))
+    # Доверенные прокси (адреса и сети через запятую): только от них принимаются
+    # X-Forwarded-For и X-Real-IP. По умолчанию - локальные адреса и частные сети Docker
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16")
+    
+    # Время жизни записей в кэше пользователей (секунды)
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "30"))
+    # Период проверки версии кэша пользователей в Redis (секунды): не дольше этого
+    # интервала другие процессы видят деактивированного пользователя или прежнюю роль
+    USER_CACHE_VERSION_CHECK_INTERVAL: float = float(os.getenv("USER_CACHE_VERSION_CHECK_INTERVAL", "1"))
+    # Число проверенных JWT токенов в кэше процесса (0 - без кэша)
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    # Реестр сессий: как долго процесс доверяет последней проверке сессии в Redis
+    # (наибольшая задержка завершения сессии в других процессах, секунды) и размер кэша проверок
+    SESSION_CHECK_INTERVAL: float = float(os.getenv("SESSION_CHECK_INTERVAL", "5"))
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+    # Конфигурация полнотекстового поиска PostgreSQL
+    SEARCH_LANGUAGE: str = os.getenv("SEARCH_LANGUAGE", "russian")
+    
+    # Снимок статистики дашборда: время жизни в Redis и период пересчета (секунды).
+    # Период должен быть меньше времени жизни, чтобы снимок не успевал устареть
+    DASHBOARD_CACHE_TTL: int = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+    DASHBOARD_REFRESH_INTERVAL: int = int(os.getenv("DASHBOARD_REFRESH_INTERVAL", "60"))
+    
+    # Бэкенд рассылки сообщений чата между процессами: redis или local
+    CHAT_BROADCAST_BACKEND: str = os.getenv("CHAT_BROADCAST_BACKEND", "redis")
+    
+    # Исходящие сообщения WebSocket: размер очереди подключения, таймаут отправки (секунды)
+    # и политика для медленных клиентов при переполнении очереди: drop или disconnect
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+    WS_SEND_TIMEOUT: float = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop")
+    
+    # Пакетная запись сообщений чата: интервал сбора пакета (мс) и максимальный размер пакета
+    CHAT_WRITE_BATCH_INTERVAL_MS: int = int(os.getenv("CHAT_WRITE_BATCH_INTERVAL_MS", "5"))
+    CHAT_WRITE_BATCH_SIZE: int = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "200"))
+    
+    # Логирование тел запросов: доля запросов с телом в логе и максимальный размер тела (байты)
+    LOG_BODY_SAMPLE_RATE: float = float(os.getenv("LOG_BODY_SAMPLE_RATE", "0.1"))
+    LOG_BODY_MAX_BYTES: int = int(os.getenv("LOG_BODY_MAX_BYTES", "2048"))
+    
+    # Кэш ответов каталога: время жизни записи (секунды), размер локального LRU процесса
+    # и период проверки версии кэша в Redis (секунды)
+    CATALOG_CACHE_TTL: int = int(os.getenv("CATALOG_CACHE_TTL", "60"))
+    CATALOG_CACHE_LOCAL_SIZE: int = int(os.getenv("CATALOG_CACHE_LOCAL_SIZE", "1000"))
+    CATALOG_CACHE_VERSION_CHECK_INTERVAL: float = float(os.getenv("CATALOG_CACHE_VERSION_CHECK_INTERVAL", "1"))
+    
+    # Фасеты каталога: границы ценовых интервалов и число продавцов в ответе
+    FACET_PRICE_EDGES: str = os.getenv("FACET_PRICE_EDGES", "0,100,500,1000,5000,10000")
+    FACET_SELLERS_LIMIT: int = int(os.getenv("FACET_SELLERS_LIMIT", "20"))
+    
+    # Учет SQL-запросов в заголовках ответа и логе (для разработки и CI)
+    # и число повторов запроса одной формы, после которого он считается N+1
+    SQL_QUERY_STATS: bool = os.getenv("SQL_QUERY_STATS", "False") == "True"
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+    
+    # Каталог метрик Prometheus, общий для всех процессов приложения и Celery.
+    # Пустое значение - метрики только текущего процесса
+    PROMETHEUS_MULTIPROC_DIR: str = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+    
     # Настройки файлов
     UPLOAD_DIR: str = "media/uploads"
     MAX_UPLOAD_SIZE: int = 5_242_880  # 5MB
+    # Размер части, которой загружаемый файл копируется на диск (байты)
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "65536"))
     
     class Config:
         env_file = ".env"
@@ -56,6 +132,11 @@ class Settings(BaseSettings):
     def ALLOWED_HOSTS(self) -> List[str]:
         """Преобразуем строку с запятыми в список строк"""
         return self._ALLOWED_HOSTS.split(",")
+    
+    @property
+    def FACET_PRICE_BUCKETS(self) -> List[float]:
+        """Границы ценовых интервалов фасетов по возрастанию"""
+        return sorted(float(edge) for edge in self.FACET_PRICE_EDGES.split(","))
 
 # Создание экземпляра настроек
 settings = Settings() 
\ No newline at end of file
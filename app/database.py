@@ -1,8 +1,15 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import redis
 from app.config import settings
+from app.services.metrics import instrument_engine, instrument_redis
+from app.services.query_stats import install_query_instrumentation
+
+# Учет SQL-запросов всех движков (число, время, повторы N+1)
+install_query_instrumentation()
 
 # Создание движка SQLAlchemy для соединения с базой данных
 engine = create_engine(
@@ -11,9 +18,47 @@ engine = create_engine(
     pool_pre_ping=True,   # Проверка соединения перед использованием
 )
 
+instrument_engine(engine, "sync")
+
 # Создание фабрики сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Соответствие синхронных драйверов асинхронным
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Преобразует URL базы данных с синхронным драйвером в URL для асинхронного драйвера
+    (asyncpg для PostgreSQL, aiosqlite для SQLite)
+    """
+    url = make_url(database_url)
+    async_driver = ASYNC_DRIVERS.get(url.drivername)
+    if async_driver is None:
+        # Драйвер уже асинхронный или неизвестен - оставляем как есть
+        return database_url
+    return url.set(drivername=async_driver).render_as_string(hide_password=False)
+
+# Асинхронный движок для роутеров, которые не должны блокировать event loop
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    echo=settings.DEBUG,
+    pool_pre_ping=True,
+)
+instrument_engine(async_engine.sync_engine, "async")
+
+# Фабрика асинхронных сессий
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Создание базового класса для моделей
 Base = declarative_base()
 
@@ -22,6 +67,7 @@ try:
     redis_client = redis.from_url(settings.REDIS_URL)
     # Проверка подключения к Redis
     redis_client.ping()
+    instrument_redis(redis_client)
 except Exception as e:
     import logging
     logging.error(f"Ошибка подключения к Redis: {str(e)}")
@@ -48,4 +94,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Функция-зависимость для получения асинхронной сессии БД
+async def get_async_db():
+    """
+    Асинхронный генератор для получения сессии базы данных.
+    Запросы через эту сессию не блокируют event loop.
+    Связи моделей нужно загружать явно (selectinload/joinedload),
+    ленивая загрузка в асинхронной сессии недоступна.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db 
\ No newline at end of file
@@ -2,7 +2,7 @@ from fastapi import FastAPI, Request, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 import os
 from datetime import datetime, timedelta
 import logging
@@ -13,24 +13,18 @@ from pathlib import Path
 from app.routers import auth, users, products, orders, admin, chat
 from app.database import engine, Base
 from app.config import settings
-from app.security import get_cookie_user
+from app.security import get_cookie_user, password_hasher
+from app.services.user_cache import user_cache
+from app.services.token_cache import token_cache
+from app.services.sessions import session_store
+from app.services.response_cache import catalog_cache
+from app.services.log_pipeline import setup_logging, stop_logging
+from app.middleware import RequestPipelineMiddleware
+from app.services import metrics
 
-# Настройка логирования
-# Создаем директорию для логов, если её нет
-logs_dir = Path("logs")
-logs_dir.mkdir(exist_ok=True)
-
-# Настройка общего логгера
-logging.basicConfig(
-    level=logging.DEBUG if settings.DEBUG else logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        # Логи в файл
-        logging.FileHandler(logs_dir / "tradehub.log"),
-        # Логи в консоль
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Настройка логирования: запись в файл (JSON) и консоль выполняется
+# в отдельном потоке, логгеры приложения только ставят записи в очередь
+setup_logging(Path("logs"), logging.DEBUG if settings.DEBUG else logging.INFO)
 
 # Получаем корневой логгер и устанавливаем уровень логов
 logger = logging.getLogger("tradehub")
@@ -47,16 +41,15 @@ error_logger.setLevel(logging.ERROR)
 # Создание таблиц в базе данных
 Base.metadata.create_all(bind=engine)
 
-# Запуск миграций
+# Применение миграций, еще не записанных в schema_migrations
 try:
-    from app.migrations.create_phone_verifications import run_migration
-    migration_result = run_migration()
-    if migration_result:
-        logger.info("Миграция для верификации телефонов успешно выполнена")
+    from app.migrations.runner import run_pending_migrations
+    if run_pending_migrations():
+        logger.info("Миграции базы данных успешно применены")
     else:
-        logger.error("Ошибка при выполнении миграции для верификации телефонов")
+        logger.error("Ошибка при применении миграций базы данных")
 except Exception as e:
-    logger.error(f"Ошибка при запуске миграции: {str(e)}")
+    logger.error(f"Ошибка при запуске миграций: {str(e)}")
 
 # Инициализация приложения FastAPI
 app = FastAPI(
@@ -188,90 +181,13 @@ app.include_router(orders.router, prefix="/orders", tags=["orders"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    # Начало запроса - логируем информацию
-    request_id = f"{datetime.now().timestamp()}-{id(request)}"
-    client_host = request.client.host if request.client else "unknown"
-    
-    request_info = {
-        "request_id": request_id,
-        "client_ip": client_host,
-        "method": request.method,
-        "url": str(request.url),
-        "path": request.url.path,
-        "headers": dict(request.headers),
-        "timestamp": datetime.now().isoformat()
-    }
-    
-    # Логируем информацию о запросе
-    api_logger.info(f"Запрос {request_id}: {request.method} {request.url.path} от {client_host}")
-    
-    # Детальное логирование для POST запросов
-    if request.method == "POST":
-        try:
-            if request.headers.get("content-type", "").startswith("application/json"):
-                body = await request.json()
-                # Скрываем пароли и другие чувствительные данные
-                if "password" in body:
-                    body["password"] = "[СКРЫТО]"
-                request_info["body"] = body
-                api_logger.debug(f"Тело запроса: {json.dumps(body, ensure_ascii=False)}")
-            elif request.headers.get("content-type", "").startswith("multipart/form-data"):
-                form = await request.form()
-                form_dict = {k: "[FILE]" if hasattr(v, "filename") else v for k, v in form.items()}
-                # Скрываем пароли
-                if "password" in form_dict:
-                    form_dict["password"] = "[СКРЫТО]"
-                request_info["form"] = form_dict
-                api_logger.debug(f"Форма запроса: {json.dumps(form_dict, ensure_ascii=False)}")
-        except Exception as e:
-            api_logger.error(f"Ошибка при логировании тела запроса: {str(e)}")
-    
-    # Засекаем время
-    start_time = datetime.now()
-    
-    try:
-        # Выполняем запрос
-        response = await call_next(request)
-        
-        # Подсчитываем время выполнения
-        process_time = (datetime.now() - start_time).total_seconds()
-        
-        # Логируем информацию о времени выполнения и статусе ответа
-        api_logger.info(
-            f"Ответ {request_id}: {response.status_code} для {request.method} {request.url.path} "
-            f"(выполнено за {process_time:.4f} сек)"
-        )
-        
-        # Добавляем заголовок с временем обработки
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        return response
-    except Exception as exc:
-        # Логируем ошибки
-        process_time = (datetime.now() - start_time).total_seconds()
-        error_logger.exception(
-            f"Ошибка {request_id}: Исключение при обработке {request.method} {request.url.path}: "
-            f"{str(exc)} (через {process_time:.4f} сек)"
-        )
-        raise
-
-@app.middleware("http")
-async def add_current_user_to_request(request: Request, call_next):
-    """
-    Добавляет текущего пользователя в request для передачи в шаблоны
-    """
-    # Получаем пользователя из cookie
-    current_user = get_cookie_user(request)
-    
-    # Добавляем пользователя в request.state
-    request.state.user = current_user
-    
-    # Вызываем следующий обработчик
-    response = await call_next(request)
-    
-    return response
+# Логирование запросов, пользователь для шаблонов, заголовки безопасности
+# и URL туннеля Serveo - одним ASGI-middleware за один проход
+app.add_middleware(
+    RequestPipelineMiddleware,
+    user_resolver=get_cookie_user,
+    tunnel_url_file=Path("logs") / "serveo" / "current_url.txt"
+)
 
 # Функция для объединения контекста шаблона
 def get_template_context(request: Request, context: dict = None) -> dict:
@@ -307,30 +223,49 @@ async def health_check():
     """
     Проверка состояния API
     """
-    return {"status": "ok", "time": datetime.now().isoformat()}
+    return {
+        "status": "ok",
+        "time": datetime.now().isoformat(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "sessions": session_store.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "chat": chat.manager.stats()
+    }
 
-# Добавляем middleware для X-Serveo-URL
-@app.middleware("http")
-async def check_serveo_url(request: Request, call_next):
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
     """
-    Middleware для определения URL Serveo и установки правильных заголовков
+    Метрики Prometheus (в режиме нескольких процессов - сумма по всем процессам)
     """
-    # Извлекаем имя хоста из запроса
-    host = request.headers.get("host", "")
-    
-    # Проверяем, является ли запрос от Serveo
-    if "serveo.net" in host:
-        logger.info(f"Запрос через Serveo: {host}")
-        
-        # Запоминаем URL Serveo в логах
-        with open("logs/serveo/current_url.txt", "w") as f:
-            f.write(f"http://{host}")
-    
-    # Продолжаем обработку запроса
-    response = await call_next(request)
-    
-    # Добавляем заголовок безопасности для всех ответов
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "SAMEORIGIN"
-    
-    return response 
\ No newline at end of file
+    return Response(metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.on_event("shutdown")
+def mark_metrics_process_dead():
+    """
+    Удаление значений livesum-метрик процесса при остановке
+    """
+    metrics.mark_process_dead()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    """
+    Остановка пула хеширования паролей
+    """
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+def stop_chat_broadcast():
+    """
+    Остановка потока чтения подписок и закрытие соединения рассылки чата
+    """
+    chat.manager.broadcast.close()
+
+@app.on_event("shutdown")
+def flush_logs():
+    """
+    Запись оставшихся в очереди логов. Регистрируется последним,
+    чтобы сообщения остальных обработчиков остановки тоже попали в лог
+    """
+    stop_logging()
@@ -0,0 +1,216 @@
+"""
+ASGI-middleware приложения.
+
+Вся обработка запроса на уровне middleware (время, логирование, пользователь
+для шаблонов, заголовки безопасности, URL туннеля) выполняется одним слоем,
+который работает напрямую с ASGI-сообщениями, без BaseHTTPMiddleware:
+запрос не оборачивается в дополнительные объекты, тело не читается целиком,
+а ответ не проходит через промежуточные потоки.
+"""
+
+import logging
+import random
+import re
+import time
+from itertools import count
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS, route_label
+from app.services.query_stats import start_request_stats
+
+api_logger = logging.getLogger("api")
+error_logger = logging.getLogger("errors")
+sql_logger = logging.getLogger("sql")
+logger = logging.getLogger("tradehub")
+
+# Значения полей с паролями и токенами скрываются в логируемом теле запроса
+_SECRET_FIELDS = re.compile(r'("[^"]*(?:password|token|secret)[^"]*"\s*:\s*)"(?:[^"\\]|\\.)*"', re.IGNORECASE)
+
+_request_counter = count(1)
+
+# Пути, для которых пользователь не нужен (статика, медиа, проверка состояния)
+SKIP_USER_PATHS = ("/static", "/media", "/health")
+
+# Заголовки безопасности, добавляемые ко всем ответам
+SECURITY_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"SAMEORIGIN"),
+)
+_SECURITY_HEADER_NAMES = {name for name, _ in SECURITY_HEADERS}
+
+TUNNEL_HOST_SUFFIX = "serveo.net"
+
+def is_html_request(scope: Scope) -> bool:
+    """
+    Проверяет, ожидает ли клиент HTML-страницу (браузер или HTMX)
+    """
+    if scope["path"].startswith(SKIP_USER_PATHS):
+        return False
+    accept = b""
+    for name, value in scope["headers"]:
+        if name == b"hx-request" and value == b"true":
+            return True
+        if name == b"accept":
+            accept = value
+    return b"text/html" in accept
+
+class RequestPipelineMiddleware:
+    """
+    Единый middleware обработки запроса:
+    - время обработки (заголовок X-Process-Time, метрики Prometheus по шаблону маршрута)
+      и одна структурированная запись в лог на запрос. Тело логируется только для выборки JSON-запросов и не больше заданного
+      размера, файлы и формы не разбираются;
+    - текущий пользователь из cookie в request.state.user, только для HTML-запросов;
+    - заголовки безопасности для всех ответов;
+    - URL публичного туннеля (Serveo), файл перезаписывается только при смене URL;
+    - при включенном учете SQL - число и время запросов в заголовках X-DB-Query-Count
+      и X-DB-Query-Time и предупреждение в лог о повторяющихся запросах (N+1).
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        body_sample_rate: float = settings.LOG_BODY_SAMPLE_RATE,
+        body_max_bytes: int = settings.LOG_BODY_MAX_BYTES,
+        user_resolver: Optional[Callable[[Request], object]] = None,
+        tunnel_url_file: Optional[Union[str, Path]] = None,
+        query_stats: bool = settings.SQL_QUERY_STATS
+    ):
+        self.app = app
+        self.body_sample_rate = body_sample_rate
+        self.body_max_bytes = body_max_bytes
+        self.user_resolver = user_resolver
+        self.tunnel_url_file = Path(tunnel_url_file) if tunnel_url_file else None
+        self._tunnel_url: Optional[str] = None
+        self.query_stats = query_stats
+
+    def _resolve_user(self, scope: Scope):
+        """
+        Пользователь нужен только при отрисовке HTML-шаблонов,
+        для статики и JSON API cookie не разбираем
+        """
+        user = None
+        if self.user_resolver is not None and is_html_request(scope):
+            user = self.user_resolver(Request(scope))
+        scope.setdefault("state", {})["user"] = user
+
+    def _remember_tunnel_url(self, scope: Scope):
+        """
+        Запоминание URL туннеля, если запрос пришел через Serveo
+        """
+        if self.tunnel_url_file is None:
+            return
+        host = ""
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value.decode("latin-1")
+                break
+        if TUNNEL_HOST_SUFFIX not in host:
+            return
+
+        url = f"http://{host}"
+        if url == self._tunnel_url:
+            return
+        try:
+            self.tunnel_url_file.parent.mkdir(parents=True, exist_ok=True)
+            self.tunnel_url_file.write_text(url)
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении URL туннеля: {str(e)}")
+            return
+        self._tunnel_url = url
+        logger.info(f"Запрос через Serveo: {host}")
+
+    def _should_log_body(self, scope: Scope) -> bool:
+        if scope["method"] not in ("POST", "PUT", "PATCH") or self.body_max_bytes <= 0:
+            return False
+        if random.random() >= self.body_sample_rate:
+            return False
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                return value.startswith(b"application/json")
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = f"{int(time.time() * 1000)}-{next(_request_counter)}"
+        status_code = 500
+        body_chunks = []
+        body_size = 0
+        query_stats = start_request_stats() if self.query_stats else None
+
+        if self._should_log_body(scope):
+            async def receive_wrapper() -> Message:
+                # Копируем начало тела по мере того, как его читает приложение
+                nonlocal body_size
+                message = await receive()
+                if message["type"] == "http.request" and body_size < self.body_max_bytes:
+                    chunk = message.get("body", b"")[:self.body_max_bytes - body_size]
+                    body_chunks.append(chunk)
+                    body_size += len(chunk)
+                return message
+        else:
+            receive_wrapper = receive
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                process_time = time.perf_counter() - started
+                headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                headers.append((b"x-process-time", f"{process_time:.6f}".encode()))
+                if query_stats is not None:
+                    headers.append((b"x-db-query-count", str(query_stats.count).encode()))
+                    headers.append((b"x-db-query-time", f"{query_stats.duration:.6f}".encode()))
+                message["headers"] = headers
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(scope["method"])
+        in_progress.inc()
+        try:
+            self._remember_tunnel_url(scope)
+            self._resolve_user(scope)
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception as exc:
+            error_logger.exception(
+                f"Ошибка {request_id}: Исключение при обработке {scope['method']} {scope['path']}: {str(exc)}",
+                extra={"request_id": request_id}
+            )
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            in_progress.dec()
+            HTTP_REQUEST_DURATION.labels(scope["method"], route_label(scope), str(status_code)).observe(duration)
+            extra = {
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round(duration * 1000, 3),
+                "client_ip": scope["client"][0] if scope.get("client") else "unknown",
+            }
+            if query_stats is not None:
+                extra["db_queries"] = query_stats.count
+                extra["db_time_ms"] = round(query_stats.duration * 1000, 3)
+                repeated = query_stats.n_plus_one()
+                if repeated:
+                    sql_logger.warning(
+                        f"Возможный N+1 в {scope['method']} {route_label(scope)}: "
+                        + "; ".join(f"{count} x {shape[:200]}" for shape, count in repeated),
+                        extra={"request_id": request_id}
+                    )
+            if body_chunks:
+                body = b"".join(body_chunks).decode("utf-8", errors="replace")
+                extra["body"] = _SECRET_FIELDS.sub(r'\1"[СКРЫТО]"', body)
+            api_logger.info(f"{scope['method']} {scope['path']} {status_code} {extra['duration_ms']} мс", extra=extra)
@@ -0,0 +1,40 @@
+"""
+Миграция для добавления материализованного пути в таблицу categories,
+его заполнения по parent_id и создания индекса для поиска поддерева
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.database import engine
+from app.models.product import Category
+from app.services.category_tree import backfill_category_paths
+
+def run_migration(bind=None):
+    """
+    Запускает миграцию путей категорий
+    """
+    bind = bind or engine
+    try:
+        existing = {column["name"] for column in inspect(bind).get_columns("categories")}
+
+        with bind.begin() as conn:
+            if "path" not in existing:
+                conn.execute(text("ALTER TABLE categories ADD COLUMN path VARCHAR(255)"))
+
+            # Пути пересчитываются целиком, поэтому после добавления категорий
+            # в обход ORM (например, SQL-скриптами) миграцию можно запустить повторно
+            updated = backfill_category_paths(Session(bind=conn))
+
+            for index in Category.__table__.indexes:
+                if index.name == "ix_categories_path":
+                    index.create(conn, checkfirst=True)
+
+        print(f"Миграция путей категорий успешно выполнена: обновлено категорий {updated}.")
+        return True
+    except SQLAlchemyError as e:
+        print(f"Ошибка при выполнении миграции: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,49 @@
+"""
+Миграция для добавления агрегатов рейтинга в таблицы users и products
+и их первичного заполнения по существующим отзывам
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.database import engine
+from app.services.ratings import backfill_rating_aggregates
+
+RATING_COLUMNS = {
+    "users": ["rating_sum", "rating_count"],
+    "products": ["rating_sum", "rating_count", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"],
+}
+
+def run_migration(bind=None):
+    """
+    Запускает миграцию для добавления агрегатов рейтинга
+    """
+    bind = bind or engine
+    try:
+        inspector = inspect(bind)
+        migrations = []
+        for table, columns in RATING_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for column in columns:
+                if column not in existing:
+                    migrations.append(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+
+        if not migrations:
+            return True
+
+        with bind.begin() as conn:
+            for migration in migrations:
+                conn.execute(text(migration))
+
+            # Новые колонки заполняем по уже оставленным отзывам
+            result = backfill_rating_aggregates(Session(bind=conn))
+
+        print(f"Миграция агрегатов рейтинга успешно выполнена: добавлено {len(migrations)} колонок, "
+              f"пересчитано продавцов {result['sellers']}, товаров {result['products']}.")
+        return True
+    except SQLAlchemyError as e:
+        print(f"Ошибка при выполнении миграции: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
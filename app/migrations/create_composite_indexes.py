@@ -0,0 +1,42 @@
+"""
+Миграция для создания составных индексов частых запросов в существующих таблицах:
+каталог по статусу и дате, товары и заказы продавца, заказы покупателя,
+сообщения чата, отзывы о продавце и товары категории
+"""
+
+from sqlalchemy.exc import SQLAlchemyError
+from app.database import engine
+from app.models.product import Product, product_category
+from app.models.order import Order, Review
+from app.models.chat import Message
+
+COMPOSITE_INDEXES = [
+    "ix_products_status_created_at",
+    "ix_products_seller_id_status",
+    "ix_orders_buyer_id_created_at",
+    "ix_orders_seller_id_status",
+    "ix_messages_chat_id_created_at",
+    "ix_reviews_seller_id",
+    "ix_product_category_category_id",
+]
+
+def run_migration(bind=None):
+    """
+    Запускает миграцию для создания составных индексов
+    """
+    bind = bind or engine
+    try:
+        with bind.begin() as conn:
+            for table in (Product.__table__, Order.__table__, Review.__table__, Message.__table__, product_category):
+                for index in table.indexes:
+                    if index.name in COMPOSITE_INDEXES:
+                        index.create(conn, checkfirst=True)
+
+        print("Миграция составных индексов успешно выполнена.")
+        return True
+    except SQLAlchemyError as e:
+        print(f"Ошибка при выполнении миграции: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
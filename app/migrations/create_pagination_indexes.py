@@ -0,0 +1,40 @@
+"""
+Миграция для создания составных индексов курсорной пагинации по (created_at, id)
+в уже существующих таблицах (create_all не добавляет индексы к созданным таблицам)
+"""
+
+from sqlalchemy.exc import SQLAlchemyError
+from app.database import engine
+from app.models.user import User
+from app.models.product import Product
+from app.models.order import Order, Review
+from app.models.chat import Chat
+
+PAGINATION_INDEXES = [
+    "ix_users_created_at_id",
+    "ix_products_created_at_id",
+    "ix_orders_created_at_id",
+    "ix_reviews_product_id_created_at_id",
+    "ix_chats_created_at_id",
+]
+
+def run_migration(bind=None):
+    """
+    Запускает миграцию для создания индексов курсорной пагинации
+    """
+    bind = bind or engine
+    try:
+        with bind.begin() as conn:
+            for model in (User, Product, Order, Review, Chat):
+                for index in model.__table__.indexes:
+                    if index.name in PAGINATION_INDEXES:
+                        index.create(conn, checkfirst=True)
+
+        print("Миграция индексов пагинации успешно выполнена.")
+        return True
+    except SQLAlchemyError as e:
+        print(f"Ошибка при выполнении миграции: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
@@ -28,14 +28,20 @@ ALTER TABLE users
 ADD COLUMN IF NOT EXISTS phone_verified BOOLEAN DEFAULT FALSE;
 """
 
-def run_migration():
+def run_migration(bind=None):
     """
     Запускает миграцию для создания таблицы верификации телефонов
     """
+    bind = bind or engine
+    
+    # Скрипты написаны для PostgreSQL; в остальных базах таблицу и колонку
+    # создает Base.metadata.create_all
+    if bind.dialect.name != "postgresql":
+        return True
+    
+    # Создаем соединение с базой данных
+    conn = bind.connect()
     try:
-        # Создаем соединение с базой данных
-        conn = engine.connect()
-        
         # Создаем таблицу верификации телефонов
         conn.execute(text(CREATE_PHONE_VERIFICATIONS_TABLE))
         
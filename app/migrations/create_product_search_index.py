@@ -0,0 +1,95 @@
+"""
+Миграция для создания полнотекстового индекса товаров:
+колонка tsvector с GIN-индексом в PostgreSQL или теневая таблица FTS5 в SQLite
+"""
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.database import engine
+
+# PostgreSQL: генерируемая колонка пересчитывается при каждом изменении строки
+ADD_SEARCH_VECTOR_COLUMN = """
+ALTER TABLE products
+ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('{language}', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('{language}', coalesce(description, '')), 'B')
+) STORED;
+"""
+
+CREATE_SEARCH_VECTOR_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector);
+"""
+
+# SQLite: внешняя таблица FTS5, содержимое которой берется из products
+CREATE_PRODUCTS_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    title,
+    description,
+    content='products',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Триггеры поддерживают FTS5 в актуальном состоянии при изменении товаров
+CREATE_PRODUCTS_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END;
+    """,
+]
+
+# Индексация уже существующих товаров
+REBUILD_PRODUCTS_FTS = """
+INSERT INTO products_fts(products_fts) VALUES ('rebuild');
+"""
+
+def run_migration(bind=None):
+    """
+    Запускает миграцию для создания полнотекстового индекса товаров
+    """
+    bind = bind or engine
+    try:
+        with bind.begin() as conn:
+            if bind.dialect.name == "postgresql":
+                conn.execute(text(ADD_SEARCH_VECTOR_COLUMN.format(language=settings.SEARCH_LANGUAGE)))
+                conn.execute(text(CREATE_SEARCH_VECTOR_INDEX))
+            elif bind.dialect.name == "sqlite":
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+                )).first()
+                if not exists:
+                    conn.execute(text(CREATE_PRODUCTS_FTS_TABLE))
+                    conn.execute(text(REBUILD_PRODUCTS_FTS))
+                for trigger in CREATE_PRODUCTS_FTS_TRIGGERS:
+                    conn.execute(text(trigger))
+            else:
+                print(f"Полнотекстовый индекс не поддерживается для {bind.dialect.name}")
+                return False
+
+        print("Миграция полнотекстового индекса успешно выполнена.")
+        return True
+    except SQLAlchemyError as e:
+        print(f"Ошибка при выполнении миграции: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
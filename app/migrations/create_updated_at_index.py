@@ -0,0 +1,28 @@
+"""
+Миграция для создания индекса products.updated_at в существующей таблице.
+Индекс нужен, чтобы max(updated_at) для ETag списка товаров не читал всю таблицу.
+"""
+
+from sqlalchemy.exc import SQLAlchemyError
+from app.database import engine
+from app.models.product import Product
+
+def run_migration(bind=None):
+    """
+    Запускает миграцию для создания индекса даты изменения товаров
+    """
+    bind = bind or engine
+    try:
+        with bind.begin() as conn:
+            for index in Product.__table__.indexes:
+                if index.name == "ix_products_updated_at":
+                    index.create(conn, checkfirst=True)
+
+        print("Миграция индекса даты изменения товаров успешно выполнена.")
+        return True
+    except SQLAlchemyError as e:
+        print(f"Ошибка при выполнении миграции: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,122 @@
+"""
+Версионированный запуск миграций.
+
+Миграции применяются по порядку номеров, и каждая успешно выполненная
+записывается в таблицу schema_migrations, поэтому при следующих запусках
+приложения выполняются только новые. При ошибке применение останавливается:
+следующие миграции могут зависеть от предыдущих. В PostgreSQL одновременный
+запуск из нескольких процессов (воркеры uvicorn) упорядочивается
+advisory-блокировкой.
+
+Новая миграция - модуль app/migrations/<имя>.py с функцией run_migration(bind=None),
+которая возвращает True при успехе и может безопасно выполняться повторно
+(на базе, созданной create_all, изменения уже есть). Модуль добавляется в конец MIGRATIONS.
+
+Запуск вручную:
+    python -m app.migrations.runner           # применить новые миграции
+    python -m app.migrations.runner --status  # список миграций и их состояние
+"""
+
+import argparse
+import importlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# (версия, модуль в app.migrations) в порядке применения
+MIGRATIONS = [
+    ("0001", "create_phone_verifications"),
+    ("0002", "create_product_search_index"),
+    ("0003", "create_pagination_indexes"),
+    ("0004", "add_rating_aggregates"),
+    ("0005", "create_updated_at_index"),
+    ("0006", "add_category_paths"),
+    ("0007", "create_composite_indexes"),
+]
+
+# Ключ advisory-блокировки PostgreSQL на время применения миграций
+MIGRATION_LOCK_KEY = 7_284_531
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(32), primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+def applied_versions(bind=None) -> Dict[str, datetime]:
+    """
+    Примененные миграции: версия -> дата применения
+    """
+    bind = bind or engine
+    schema_migrations.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        rows = conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all()
+    return {row.version: row.applied_at for row in rows}
+
+def pending_migrations(bind=None) -> List[tuple]:
+    applied = applied_versions(bind)
+    return [(version, name) for version, name in MIGRATIONS if version not in applied]
+
+def _apply(bind, version: str, name: str) -> bool:
+    module = importlib.import_module(f"app.migrations.{name}")
+    if not module.run_migration(bind):
+        return False
+    with bind.begin() as conn:
+        conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+    logger.info(f"Миграция {version} {name} применена")
+    return True
+
+def run_pending_migrations(bind=None) -> bool:
+    """
+    Применяет еще не выполненные миграции. Возвращает False, если одна из них завершилась ошибкой
+    """
+    bind = bind or engine
+    lock = None
+    try:
+        if bind.dialect.name == "postgresql":
+            # Блокировка сессии: пока один процесс применяет миграции, остальные ждут,
+            # а затем видят их в schema_migrations
+            lock = bind.connect()
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+        for version, name in pending_migrations(bind):
+            if not _apply(bind, version, name):
+                logger.error(f"Миграция {version} {name} завершилась ошибкой, следующие миграции не применялись")
+                return False
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"Ошибка при применении миграций: {str(e)}")
+        return False
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            lock.close()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Применение миграций базы данных")
+    parser.add_argument("--status", action="store_true", help="показать состояние миграций без применения")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        applied = applied_versions()
+        for version, name in MIGRATIONS:
+            applied_at = applied.get(version)
+            state = f"применена {applied_at:%Y-%m-%d %H:%M:%S}" if applied_at else "ожидает"
+            print(f"{version} {name:<32} {state}")
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    if not run_pending_migrations():
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -8,6 +8,10 @@ class Chat(Base):
     Модель чата между покупателем и продавцом
     """
     __tablename__ = "chats"
+    __table_args__ = (
+        # Курсорная пагинация по (created_at, id)
+        Index("ix_chats_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -27,6 +31,10 @@ class Message(Base):
     Модель сообщения в чате
     """
     __tablename__ = "messages"
+    __table_args__ = (
+        # Сообщения чата в хронологическом порядке
+        Index("ix_messages_chat_id_created_at", "chat_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
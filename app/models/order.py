@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum, Index
 from sqlalchemy.orm import relationship
 import enum
 from app.database import Base
@@ -19,6 +19,13 @@ class Order(Base):
     Модель заказа
     """
     __tablename__ = "orders"
+    __table_args__ = (
+        # Курсорная пагинация по (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Последние заказы покупателя и заказы продавца по статусу
+        Index("ix_orders_buyer_id_created_at", "buyer_id", "created_at"),
+        Index("ix_orders_seller_id_status", "seller_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -68,6 +75,12 @@ class Review(Base):
     Модель отзыва
     """
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Отзывы всегда выбираются по товару, поэтому товар входит в ключ индекса
+        Index("ix_reviews_product_id_created_at_id", "product_id", "created_at", "id"),
+        # Отзывы о продавце (отзывы о товаре покрывает индекс выше)
+        Index("ix_reviews_seller_id", "seller_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum, Table, Index, event, select, update
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import set_committed_value
 import enum
 from app.database import Base
 from datetime import datetime
@@ -9,7 +10,9 @@ product_category = Table(
     "product_category",
     Base.metadata,
     Column("product_id", Integer, ForeignKey("products.id"), primary_key=True),
-    Column("category_id", Integer, ForeignKey("categories.id"), primary_key=True)
+    Column("category_id", Integer, ForeignKey("categories.id"), primary_key=True),
+    # Первичный ключ начинается с product_id; товары категории ищутся по этому индексу
+    Index("ix_product_category_category_id", "category_id")
 )
 
 class ProductStatus(str, enum.Enum):
@@ -37,6 +40,15 @@ class Product(Base):
     Модель товара
     """
     __tablename__ = "products"
+    __table_args__ = (
+        # Курсорная пагинация по (created_at, id)
+        Index("ix_products_created_at_id", "created_at", "id"),
+        # max(updated_at) для ETag списков товаров
+        Index("ix_products_updated_at", "updated_at"),
+        # Каталог активных товаров по дате и товары продавца по статусу
+        Index("ix_products_status_created_at", "status", "created_at"),
+        Index("ix_products_seller_id_status", "seller_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)
@@ -48,6 +60,16 @@ class Product(Base):
     status = Column(String(20), default=ProductStatus.DRAFT.value)
     quantity = Column(Integer, default=1)
     
+    # Агрегаты отзывов о товаре и распределение оценок от 1 до 5,
+    # обновляются вместе с созданием отзыва
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # Связи с пользователем-продавцом
     seller_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     seller = relationship("User", back_populates="products")
@@ -62,18 +84,35 @@ class Product(Base):
     orders = relationship("OrderItem", back_populates="product")
     reviews = relationship("Review", back_populates="product")
     moderation_history = relationship("ModerationHistory", back_populates="product")
+    
+    @property
+    def rating_average(self) -> float:
+        """Средняя оценка товара"""
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0.0
+    
+    @property
+    def rating_histogram(self) -> dict:
+        """Количество отзывов по каждой оценке"""
+        return {score: getattr(self, f"rating_{score}") or 0 for score in range(1, 6)}
 
 class Category(Base):
     """
     Модель категории товаров
     """
     __tablename__ = "categories"
+    __table_args__ = (
+        # Поиск поддерева по префиксу пути (LIKE '/1/5/%'); в PostgreSQL
+        # префиксный LIKE использует индекс только с varchar_pattern_ops
+        Index("ix_categories_path", "path", postgresql_ops={"path": "varchar_pattern_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, index=True)
     slug = Column(String(100), nullable=False, unique=True, index=True)
     description = Column(Text, nullable=True)
     parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    # Материализованный путь от корня: "/1/5/12/". Заполняется после вставки
+    path = Column(String(255), nullable=True)
     
     # Связи
     parent = relationship("Category", remote_side=[id], backref="subcategories")
@@ -82,6 +121,25 @@ class Category(Base):
     # Система отслеживания
     created_at = Column(DateTime, default=datetime.utcnow)
 
+def category_path(parent_path, category_id: int) -> str:
+    """
+    Материализованный путь категории по пути родителя
+    """
+    return f"{parent_path or '/'}{category_id}/"
+
+@event.listens_for(Category, "after_insert")
+def _assign_category_path(mapper, connection, target):
+    # Идентификатор известен только после вставки, поэтому путь записывается
+    # отдельным UPDATE. Родитель в том же flush вставляется раньше потомков
+    parent_path = None
+    if target.parent_id is not None:
+        parent_path = connection.execute(
+            select(Category.path).where(Category.id == target.parent_id)
+        ).scalar()
+    path = category_path(parent_path, target.id)
+    connection.execute(update(Category).where(Category.id == target.id).values(path=path))
+    set_committed_value(target, "path", path)
+
 class ProductImage(Base):
     """
     Модель изображения товара
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -32,6 +32,10 @@ class User(Base):
     Модель пользователя
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # Курсорная пагинация по (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -52,6 +56,10 @@ class User(Base):
     
     # Профиль продавца
     seller_rating = Column(Float, default=0.0)
+    
+    # Агрегаты отзывов о продавце, обновляются вместе с созданием отзыва
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     seller_description = Column(Text, nullable=True)
     
     # Система отслеживания
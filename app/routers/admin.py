@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Form
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
 import sqlalchemy as sa
 import enum
@@ -13,7 +13,14 @@ from app.models.order import Order, OrderStatus
 from app.schemas.user import User as UserSchema
 from app.schemas.product import ProductDetail
 from app.schemas.order import OrderDetail
-from app.security import get_current_admin, get_current_active_admin, get_current_active_user, ServeoSecurity
+from app.schemas.pagination import CursorPage
+from app.security import get_current_admin, get_current_active_user, ServeoSecurity
+from app.services.dashboard import get_dashboard_snapshot
+from app.services.pagination import apply_keyset_pagination, paginate_results
+from app.services.loaders import reload_for_schema
+from app.services.response_cache import invalidate_catalog
+from app.services.sessions import session_store
+from app.services.user_cache import user_cache
 
 router = APIRouter()
 
@@ -53,16 +60,18 @@ async def check_admin_serveo_security(request: Request, call_next):
     response = await call_next(request)
     return response
 
-@router.get("/users", response_model=List[UserSchema])
+@router.get("/users", response_model=Union[List[UserSchema], CursorPage[UserSchema]])
 async def get_all_users(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     search: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
-    Получение списка всех пользователей для администратора
+    Получение списка всех пользователей для администратора.
+    При переданном cursor ответ возвращается страницей курсорной пагинации.
     """
     query = db.query(User)
     
@@ -76,6 +85,10 @@ async def get_all_users(
             )
         )
     
+    if cursor is not None:
+        users = apply_keyset_pagination(query, User, cursor, limit).all()
+        return paginate_results(users, limit)
+    
     users = query.offset(skip).limit(limit).all()
     return users
 
@@ -97,6 +110,7 @@ async def activate_user(
     
     user.is_active = True
     db.commit()
+    user_cache.invalidate(user.id)
     db.refresh(user)
     
     return user
@@ -128,6 +142,9 @@ async def deactivate_user(
     
     user.is_active = False
     db.commit()
+    user_cache.invalidate(user.id)
+    # Сессии деактивированного пользователя завершаются во всех процессах
+    session_store.revoke_all(user.id)
     db.refresh(user)
     
     return user
@@ -150,6 +167,7 @@ async def make_user_admin(
     
     user.role = UserRole.ADMIN.value
     db.commit()
+    user_cache.invalidate(user.id)
     db.refresh(user)
     
     return user
@@ -203,8 +221,8 @@ async def get_moderation_page(
     # Общее количество для пагинации
     total_count = query.count()
     
-    # Сортировка и пагинация
-    query = query.order_by(Product.created_at.desc())
+    # Сортировка и пагинация (продавец выводится в карточке - загружаем в том же запросе)
+    query = query.order_by(Product.created_at.desc()).options(joinedload(Product.seller))
     items = query.offset((page - 1) * limit).limit(limit).all()
     
     # Добавляем текстовый статус и класс бейджа
@@ -308,7 +326,7 @@ async def filter_products(
         query = query.join(Product.categories).filter(Category.id == int(game))
     
     # Пагинация и сортировка
-    query = query.order_by(Product.created_at.desc())
+    query = query.order_by(Product.created_at.desc()).options(joinedload(Product.seller))
     items = query.limit(24).all()
     
     # Добавляем текстовый статус и класс бейджа
@@ -377,6 +395,7 @@ async def get_product_moderation_details(
     # Получаем историю модерации
     moderation_history = (
         db.query(ModerationHistory)
+        .options(joinedload(ModerationHistory.admin))
         .filter(ModerationHistory.product_id == product_id)
         .order_by(ModerationHistory.created_at.desc())
         .all()
@@ -441,13 +460,13 @@ async def approve_product(
     db.add(moderation_record)
     
     db.commit()
-    db.refresh(product)
+    invalidate_catalog()
     
     # Для HTMX запросов возвращаем обновленное представление
     if "HX-Request" in request.headers:
         return await get_product_moderation_details(request, product_id, db, current_user)
     
-    return product
+    return reload_for_schema(db, product, ProductDetail)
 
 @router.put("/products/{product_id}/reject", response_model=ProductDetail)
 async def reject_product(
@@ -483,13 +502,13 @@ async def reject_product(
     db.add(moderation_record)
     
     db.commit()
-    db.refresh(product)
+    invalidate_catalog()
     
     # Для HTMX запросов возвращаем обновленное представление
     if "HX-Request" in request.headers:
         return await get_product_moderation_details(request, product_id, db, current_user)
     
-    return product
+    return reload_for_schema(db, product, ProductDetail)
 
 @router.put("/products/{product_id}/revert-to-moderation", response_model=ProductDetail)
 async def revert_product_to_moderation(
@@ -523,13 +542,13 @@ async def revert_product_to_moderation(
     db.add(moderation_record)
     
     db.commit()
-    db.refresh(product)
+    invalidate_catalog()
     
     # Для HTMX запросов возвращаем обновленное представление
     if "HX-Request" in request.headers:
         return await get_product_moderation_details(request, product_id, db, current_user)
     
-    return product
+    return reload_for_schema(db, product, ProductDetail)
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(
@@ -537,85 +556,10 @@ async def get_dashboard_stats(
     current_user: User = Depends(get_current_admin)
 ):
     """
-    Получение статистики для панели администратора
-    """
-    # Количество пользователей
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    sellers = db.query(User).filter(User.role == UserRole.SELLER.value).count()
-    admins = db.query(User).filter(User.role == UserRole.ADMIN.value).count()
-    
-    # Количество товаров
-    total_products = db.query(Product).count()
-    active_products = db.query(Product).filter(Product.status == ProductStatus.ACTIVE.value).count()
-    moderation_products = db.query(Product).filter(Product.status == ProductStatus.MODERATION.value).count()
-    hidden_products = db.query(Product).filter(Product.status == ProductStatus.HIDDEN.value).count()
-    
-    # Средняя цена товаров
-    avg_price = db.query(sa.func.avg(Product.price)).scalar() or 0
-    
-    # Количество заказов
-    total_orders = db.query(Order).count()
-    pending_orders = db.query(Order).filter(Order.status == OrderStatus.PENDING.value).count()
-    completed_orders = db.query(Order).filter(Order.status == OrderStatus.COMPLETED.value).count()
-    cancelled_orders = db.query(Order).filter(Order.status == OrderStatus.CANCELLED.value).count()
-    
-    # Статистика за последний месяц
-    month_ago = datetime.utcnow() - timedelta(days=30)
-    new_users_month = db.query(User).filter(User.created_at >= month_ago).count()
-    new_orders_month = db.query(Order).filter(Order.created_at >= month_ago).count()
-    
-    # Продажи за месяц
-    month_sales = db.query(sa.func.sum(Order.total_amount)).filter(
-        Order.status == OrderStatus.COMPLETED.value,
-        Order.created_at >= month_ago
-    ).scalar() or 0
-    
-    # Сумма всех завершенных заказов
-    total_sales = db.query(sa.func.sum(Order.total_amount)).filter(
-        Order.status == OrderStatus.COMPLETED.value
-    ).scalar() or 0
-    
-    # Средний чек
-    avg_order = 0
-    if completed_orders > 0:
-        avg_order = total_sales / completed_orders
-    
-    # Комиссии (демонстрационные расчеты)
-    platform_fee = total_sales * 0.1  # 10% комиссия платформы
-    payment_fee = total_sales * 0.02  # 2% комиссия платежной системы
-    
-    return {
-        "users": {
-            "total": total_users,
-            "active": active_users,
-            "sellers": sellers,
-            "admins": admins,
-            "new_month": new_users_month
-        },
-        "products": {
-            "total": total_products,
-            "active": active_products,
-            "moderation": moderation_products,
-            "hidden": hidden_products,
-            "avg_price": float(avg_price)
-        },
-        "orders": {
-            "total": total_orders,
-            "pending": pending_orders,
-            "completed": completed_orders,
-            "cancelled": cancelled_orders,
-            "new_month": new_orders_month,
-            "avg_completion_time": "24ч"  # Демонстрационные данные
-        },
-        "sales": {
-            "total": float(total_sales),
-            "month": float(month_sales),
-            "avg_order": float(avg_order),
-            "platform_fee": float(platform_fee),
-            "payment_fee": float(payment_fee)
-        }
-    }
+    Получение статистики для панели администратора.
+    Статистика берется из снимка, который обновляет фоновая задача Celery.
+    """
+    return get_dashboard_snapshot(db)
 
 @router.get("/refresh-dashboard")
 async def refresh_dashboard(
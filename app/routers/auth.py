@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, Qu
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from datetime import timedelta, datetime
+from datetime import datetime
 from typing import Optional
 import re
 import json
@@ -11,16 +11,25 @@ from app.database import get_db
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, User as UserSchema, Token
 from app.security import (
-    get_password_hash, verify_password, create_access_token,
-    get_current_user, create_password_reset_token, verify_password_reset_token,
-    create_phone_verification, send_sms_code, verify_phone_code
+    get_password_hash_async, verify_user_password, create_session_token,
+    get_cookie_token, decode_access_token, get_current_user, create_password_reset_token, verify_password_reset_token,
+    create_phone_verification, send_sms_code, verify_phone_code,
+    check_rate_limit, record_login_attempt
 )
+from app.services.rate_limit import RateLimit, client_ip
+from app.services.sessions import session_store
 from app.config import settings
 from fastapi.templating import Jinja2Templates
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+# Ограничения частоты для маршрутов, которые отправляют SMS и письма
+# или проверяют одноразовые коды, - по IP-адресу клиента
+sms_rate_limit = RateLimit("sms", limit=5, period=600)
+code_rate_limit = RateLimit("verify-code", limit=10, period=600)
+reset_rate_limit = RateLimit("password-reset", limit=5, period=3600)
+
 # === HTML маршруты для браузера ===
 
 @router.get("/login", response_class=HTMLResponse)
@@ -40,17 +49,32 @@ async def login_submit(
     """
     Обработка формы входа
     """
+    # Ограничение попыток входа по учетной записи и IP-адресу: попытка списывается
+    # до проверки пароля, успешный вход сбрасывает лимит учетной записи
+    ip = client_ip(request)
+    try:
+        check_rate_limit(username, ip)
+    except HTTPException as e:
+        return templates.TemplateResponse(
+            "auth/login.html", 
+            {"request": request, "error": e.detail},
+            status_code=e.status_code,
+            headers=e.headers
+        )
+    
     # Поиск пользователя по email или имени пользователя
     user = db.query(User).filter(
         (User.email == username) | (User.username == username)
     ).first()
     
-    # Проверка пользователя и пароля
-    if not user or not verify_password(password, user.hashed_password):
+    # Проверка пользователя и пароля (bcrypt в пуле хеширования,
+    # устаревший хеш обновляется вместе с last_login)
+    if not user or not await verify_user_password(user, password):
         return templates.TemplateResponse(
             "auth/login.html", 
             {"request": request, "error": "Неверный email/имя пользователя или пароль"}
         )
+    record_login_attempt(username, True, ip)
     
     # Проверка активности пользователя
     if not user.is_active:
@@ -63,19 +87,8 @@ async def login_submit(
     user.last_login = datetime.utcnow()
     db.commit()
     
-    # Данные для JWT токена
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token_data = {
-        "sub": user.username,
-        "id": user.id,
-        "role": user.role
-    }
-    
-    # Создание токена
-    access_token = create_access_token(
-        data=access_token_data,
-        expires_delta=access_token_expires
-    )
+    # Регистрация сессии и создание токена с ее идентификатором
+    access_token = create_session_token(user, request)
     
     # Создаем редирект на главную с установкой cookie
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
@@ -190,7 +203,7 @@ async def register_submit(request: Request, db: Session = Depends(get_db)):
             )
         
         # Создаем хеш пароля
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         
         # Создаем нового пользователя
         db_user = User(
@@ -216,6 +229,9 @@ async def register_submit(request: Request, db: Session = Depends(get_db)):
                 "success": "Регистрация прошла успешно! Теперь вы можете войти в свой аккаунт."
             }
         )
+    except HTTPException:
+        # Перегрузка пула хеширования (503) не должна выглядеть как ошибка формы
+        raise
     except Exception as e:
         print(f"Ошибка при обработке регистрации: {e}")
         return templates.TemplateResponse(
@@ -230,7 +246,7 @@ async def verify_phone_page(request: Request, phone: str = Query(...)):
     """
     return templates.TemplateResponse("auth/verify-phone.html", {"request": request, "phone": phone})
 
-@router.post("/verify-phone", response_class=HTMLResponse)
+@router.post("/verify-phone", response_class=HTMLResponse, dependencies=[Depends(code_rate_limit)])
 async def verify_phone_submit(
     request: Request,
     phone: str = Form(...),
@@ -298,7 +314,7 @@ async def verify_phone_submit(
             {"request": request, "phone": phone, "error": f"Произошла ошибка при создании пользователя: {str(e)}"}
         )
 
-@router.get("/resend-code", response_class=RedirectResponse)
+@router.get("/resend-code", response_class=RedirectResponse, dependencies=[Depends(sms_rate_limit)])
 async def resend_code(
     request: Request,
     phone: str = Query(...),
@@ -374,7 +390,7 @@ async def reset_password_page(request: Request):
     """
     return templates.TemplateResponse("auth/reset-password.html", {"request": request})
 
-@router.post("/reset-password", response_class=HTMLResponse)
+@router.post("/reset-password", response_class=HTMLResponse, dependencies=[Depends(reset_rate_limit)])
 async def reset_password_submit(
     request: Request,
     email: str = Form(...),
@@ -468,7 +484,7 @@ async def set_new_password_submit(
         )
     
     # Создаем новый хеш пароля и обновляем пользователя
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     user.hashed_password = hashed_password
     db.commit()
     
@@ -479,10 +495,16 @@ async def set_new_password_submit(
     )
 
 @router.get("/logout")
-async def logout():
+async def logout(request: Request):
     """
     Выход из системы
     """
+    # Завершаем сессию, чтобы токен нельзя было использовать и после удаления cookie
+    token = get_cookie_token(request)
+    claims = decode_access_token(token) if token else None
+    if claims and claims.get("sid"):
+        session_store.revoke(claims["id"], claims["sid"])
+    
     # Создаем редирект на главную
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
@@ -508,24 +530,32 @@ async def logout():
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     Получение JWT токена для аутентификации через API
     """
+    # Ограничение попыток входа по учетной записи и IP-адресу: попытка списывается
+    # до проверки пароля, успешный вход сбрасывает лимит учетной записи
+    ip = client_ip(request)
+    check_rate_limit(form_data.username, ip)
+    
     # Поиск пользователя по email или имени пользователя
     user = db.query(User).filter(
         (User.email == form_data.username) | (User.username == form_data.username)
     ).first()
     
-    # Проверка пользователя и пароля
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Проверка пользователя и пароля (bcrypt в пуле хеширования,
+    # устаревший хеш обновляется вместе с last_login)
+    if not user or not await verify_user_password(user, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email/имя пользователя или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    record_login_attempt(form_data.username, True, ip)
     
     # Проверка активности пользователя
     if not user.is_active:
@@ -538,19 +568,8 @@ async def login_for_access_token(
     user.last_login = datetime.utcnow()
     db.commit()
     
-    # Данные для JWT токена
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token_data = {
-        "sub": user.username,
-        "id": user.id,
-        "role": user.role
-    }
-    
-    # Создание токена
-    access_token = create_access_token(
-        data=access_token_data,
-        expires_delta=access_token_expires
-    )
+    # Регистрация сессии и создание токена с ее идентификатором
+    access_token = create_session_token(user, request)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -588,7 +607,7 @@ async def register(
             )
     
     # Создаем хеш пароля
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Создаем нового пользователя
     db_user = User(
@@ -664,7 +683,7 @@ async def test_sms_submit(
     
     return templates.TemplateResponse("auth/test-sms.html", context)
 
-@router.post("/send-verification-code", response_class=PlainTextResponse)
+@router.post("/send-verification-code", response_class=PlainTextResponse, dependencies=[Depends(sms_rate_limit)])
 async def send_verification_code(
     phone: str = Form(...),
     db: Session = Depends(get_db)
@@ -697,7 +716,7 @@ async def send_verification_code(
         print(f"Ошибка при отправке кода: {str(e)}")
         return f"ERROR: Произошла ошибка при отправке кода: {str(e)}"
 
-@router.post("/verify-code", response_class=PlainTextResponse)
+@router.post("/verify-code", response_class=PlainTextResponse, dependencies=[Depends(code_rate_limit)])
 async def verify_code_endpoint(
     phone: str = Form(...),
     code: str = Form(...),
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from typing import List, Dict, Any, Optional, Union
 import json
+import logging
 from datetime import datetime
 
-from app.database import get_db
+from app.database import SessionLocal, get_db, get_async_db
 from app.models.user import User
 from app.models.order import Order
 from app.models.chat import Chat, Message
@@ -15,49 +19,152 @@ from app.schemas.chat import (
     Message as MessageSchema,
     MessageCreate
 )
+from app.schemas.pagination import CursorPage
 from app.security import get_current_user
+from app.config import settings
+from app.services.broadcast import BroadcastBackend, create_broadcast_backend
+from app.services.message_writer import message_writer
+from app.services.metrics import WEBSOCKET_CONNECTIONS
+from app.services.pagination import apply_keyset_pagination, paginate_results
+from app.services.websocket_outbox import ConnectionOutbox
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 # Менеджер WebSocket-подключений
 class ConnectionManager:
-    def __init__(self):
-        # Словарь активных соединений: {chat_id: {user_id: websocket}}
-        self.active_connections: Dict[int, Dict[int, WebSocket]] = {}
+    def __init__(
+        self,
+        broadcast: BroadcastBackend,
+        queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.WS_SEND_TIMEOUT,
+        slow_consumer_policy: str = settings.WS_SLOW_CONSUMER_POLICY
+    ):
+        # Словарь активных соединений этого процесса: {chat_id: {user_id: очередь подключения}}
+        self.active_connections: Dict[int, Dict[int, ConnectionOutbox]] = {}
+        
+        # Бэкенд рассылки доставляет сообщения из всех процессов приложения
+        self.broadcast = broadcast
+        self.broadcast.set_handler(self.deliver_local)
+        
+        # Параметры очередей исходящих сообщений
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        
+        # Счетчики для метрик
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+        self.failed_connections = 0
     
     async def connect(self, websocket: WebSocket, chat_id: int, user_id: int):
         await websocket.accept()
         
-        # Инициализируем словарь для этого чата, если его еще нет
-        if chat_id not in self.active_connections:
-            self.active_connections[chat_id] = {}
+        # Состояние подключений меняется без await между проверкой и изменением:
+        # иначе одновременные подключение и отключение в том же чате могли бы
+        # оставить сокет без подписки процесса на сообщения чата
+        connections = self.active_connections.get(chat_id)
+        first_in_chat = connections is None
+        if first_in_chat:
+            connections = self.active_connections[chat_id] = {}
+        
+        # Повторное подключение пользователя заменяет предыдущее
+        previous = connections.get(user_id)
         
         # Сохраняем соединение
-        self.active_connections[chat_id][user_id] = websocket
+        connections[user_id] = ConnectionOutbox(
+            websocket,
+            max_size=self.queue_size,
+            send_timeout=self.send_timeout,
+            on_failure=lambda outbox: self._on_send_failure(chat_id, user_id, outbox)
+        )
+        self._update_connection_gauge()
+        
+        if previous is not None:
+            await previous.close()
+        # Подписываем процесс на сообщения чата
+        if first_in_chat:
+            await self.broadcast.subscribe(chat_id)
     
-    def disconnect(self, chat_id: int, user_id: int):
-        # Удаляем соединение
-        if chat_id in self.active_connections and user_id in self.active_connections[chat_id]:
-            del self.active_connections[chat_id][user_id]
-            
-            # Если в чате не осталось активных пользователей, удаляем запись о чате
-            if not self.active_connections[chat_id]:
-                del self.active_connections[chat_id]
+    async def disconnect(self, chat_id: int, user_id: int, websocket: WebSocket = None):
+        # Удаляем соединение (если передан сокет - только если он еще актуален)
+        connections = self.active_connections.get(chat_id)
+        if not connections or user_id not in connections:
+            return
+        outbox = connections[user_id]
+        if websocket is not None and outbox.websocket is not websocket:
+            return
+        
+        del connections[user_id]
+        self._update_connection_gauge()
+        
+        # Если в чате не осталось активных пользователей, удаляем запись о чате
+        # и отписываемся от его сообщений. Набор подписок бэкенда меняется
+        # в момент вызова, до закрытия сокета
+        if not connections:
+            del self.active_connections[chat_id]
+            await self.broadcast.unsubscribe(chat_id)
+        await outbox.close()
     
     async def send_message(self, message: dict, chat_id: int, exclude_user_id: int = None):
-        # Отправляем сообщение всем подключенным к чату, кроме исключенного пользователя
-        if chat_id in self.active_connections:
-            for user_id, connection in self.active_connections[chat_id].items():
-                if exclude_user_id is None or user_id != exclude_user_id:
-                    await connection.send_text(json.dumps(message))
+        # Публикуем сообщение для всех процессов, каждый доставит его своим подключениям
+        await self.broadcast.publish(chat_id, {"message": message, "exclude_user_id": exclude_user_id})
+    
+    async def deliver_local(self, chat_id: int, envelope: dict):
+        # Ставим сообщение в очереди всех подключенных к чату в этом процессе, кроме исключенного
+        # пользователя. Сообщение сериализуется один раз, отправку выполняют писатели подключений
+        exclude_user_id = envelope.get("exclude_user_id")
+        if chat_id not in self.active_connections:
+            return
+        
+        text = json.dumps(envelope["message"])
+        for user_id, outbox in list(self.active_connections[chat_id].items()):
+            if exclude_user_id is not None and user_id == exclude_user_id:
+                continue
+            if not outbox.enqueue(text):
+                await self._on_queue_full(chat_id, user_id, outbox)
     
     async def send_personal_message(self, message: dict, chat_id: int, user_id: int):
         # Отправляем сообщение конкретному пользователю в чате
         if chat_id in self.active_connections and user_id in self.active_connections[chat_id]:
-            await self.active_connections[chat_id][user_id].send_text(json.dumps(message))
+            outbox = self.active_connections[chat_id][user_id]
+            if not outbox.enqueue(json.dumps(message)):
+                await self._on_queue_full(chat_id, user_id, outbox)
+    
+    async def _on_queue_full(self, chat_id: int, user_id: int, outbox: ConnectionOutbox):
+        # Клиент не успевает принимать сообщения: отбрасываем сообщение или отключаем клиента
+        self.dropped_messages += 1
+        if self.slow_consumer_policy == "disconnect":
+            self.slow_disconnects += 1
+            await outbox.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            await self.disconnect(chat_id, user_id, outbox.websocket)
+    
+    async def _on_send_failure(self, chat_id: int, user_id: int, outbox: ConnectionOutbox):
+        # Отправка не удалась (клиент отключился или завис) - убираем подключение
+        self.failed_connections += 1
+        await outbox.close(code=status.WS_1011_INTERNAL_ERROR)
+        await self.disconnect(chat_id, user_id, outbox.websocket)
+    
+    def _update_connection_gauge(self):
+        # Число подключений этого процесса, /metrics суммирует его по всем процессам
+        WEBSOCKET_CONNECTIONS.set(sum(len(connections) for connections in self.active_connections.values()))
+    
+    def stats(self) -> dict:
+        # Метрики очередей исходящих сообщений этого процесса
+        depths = [outbox.depth for connections in self.active_connections.values() for outbox in connections.values()]
+        return {
+            "chats": len(self.active_connections),
+            "connections": len(depths),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self.dropped_messages,
+            "slow_disconnects": self.slow_disconnects,
+            "failed_connections": self.failed_connections
+        }
 
 # Создаем экземпляр менеджера подключений
-manager = ConnectionManager()
+manager = ConnectionManager(create_broadcast_backend())
 
 async def create_chat_for_order(order_id: int, db: Session):
     """
@@ -83,37 +190,48 @@ async def create_chat_for_order(order_id: int, db: Session):
     
     return db_chat
 
-@router.get("/", response_model=List[ChatSchema])
+@router.get("/", response_model=Union[List[ChatSchema], CursorPage[ChatSchema]])
 async def read_chats(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Получение списка чатов пользователя
+    Получение списка чатов пользователя.
+    При переданном cursor ответ возвращается страницей курсорной пагинации.
     """
-    if current_user.role == "admin":
-        # Администраторы видят все чаты
-        chats = db.query(Chat).offset(skip).limit(limit).all()
-    else:
-        # Обычные пользователи видят только свои чаты
-        chats = db.query(Chat).join(Order).filter(
+    query = select(Chat)
+    
+    if current_user.role != "admin":
+        # Обычные пользователи видят только свои чаты, администраторы - все
+        query = query.join(Order).where(
             (Order.buyer_id == current_user.id) | (Order.seller_id == current_user.id)
-        ).offset(skip).limit(limit).all()
+        )
+    
+    if cursor is not None:
+        result = await db.execute(apply_keyset_pagination(query, Chat, cursor, limit))
+        return paginate_results(result.scalars().all(), limit)
     
-    return chats
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.get("/{chat_id}", response_model=ChatDetail)
 async def read_chat(
     chat_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Получение информации о чате по ID
     """
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    result = await db.execute(
+        select(Chat)
+        .where(Chat.id == chat_id)
+        .options(selectinload(Chat.messages), joinedload(Chat.order))
+    )
+    chat = result.scalars().first()
     if chat is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -180,12 +298,12 @@ async def create_message(
         }
     }
     
-    # Асинхронно отправляем сообщение всем участникам чата, кроме отправителя
+    # Асинхронно отправляем сообщение всем участникам чата, кроме отправителя.
+    # Сообщение уже сохранено, поэтому ошибка рассылки не должна ломать ответ
     try:
         await manager.send_message(message_data, chat.id, current_user.id)
-    except:
-        # Игнорируем ошибки отправки WebSocket (например, нет активных соединений)
-        pass
+    except Exception as e:
+        logger.error(f"Ошибка рассылки сообщения {db_message.id} в чат {chat.id}: {str(e)}")
     
     return db_message
 
@@ -235,45 +353,50 @@ async def mark_message_as_read(
 async def websocket_endpoint(
     websocket: WebSocket,
     chat_id: int,
-    token: str,
-    db: Session = Depends(get_db)
+    token: str
 ):
     """
-    WebSocket-соединение для чата
+    WebSocket-соединение для чата.
+    Сессия БД нужна только для проверки доступа и закрывается до начала обмена сообщениями,
+    сообщения сохраняются пакетным писателем процесса.
     """
-    # Проверка токена и получение пользователя
-    try:
-        current_user = get_current_user(token, db)
-    except HTTPException:
-        # Если токен недействителен, закрываем соединение
-        await websocket.close(code=1008)  # Policy Violation
-        return
-    
-    # Проверка существования чата
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
-    if chat is None:
-        await websocket.close(code=1008)  # Policy Violation
-        return
-    
-    # Проверка прав доступа
-    order = chat.order
-    if current_user.role != "admin" and current_user.id != order.buyer_id and current_user.id != order.seller_id:
-        await websocket.close(code=1008)  # Policy Violation
-        return
+    with SessionLocal() as db:
+        # Проверка токена и получение пользователя
+        try:
+            current_user = await get_current_user(token, db)
+        except HTTPException:
+            # Если токен недействителен, закрываем соединение
+            await websocket.close(code=1008)  # Policy Violation
+            return
+        
+        # Проверка существования чата
+        chat = db.query(Chat).filter(Chat.id == chat_id).first()
+        if chat is None:
+            await websocket.close(code=1008)  # Policy Violation
+            return
+        
+        # Проверка прав доступа
+        order = chat.order
+        if current_user.role != "admin" and current_user.id != order.buyer_id and current_user.id != order.seller_id:
+            await websocket.close(code=1008)  # Policy Violation
+            return
+        
+        user_id = current_user.id
+        username = current_user.username
     
     # Подключаем пользователя к чату
-    await manager.connect(websocket, chat_id, current_user.id)
+    await manager.connect(websocket, chat_id, user_id)
     
     # Отправляем уведомление о подключении пользователя
     connection_message = {
         "type": "connection",
-        "user_id": current_user.id,
-        "username": current_user.username,
+        "user_id": user_id,
+        "username": username,
         "connected": True,
         "timestamp": datetime.utcnow().isoformat()
     }
     
-    await manager.send_message(connection_message, chat_id, current_user.id)
+    await manager.send_message(connection_message, chat_id, user_id)
     
     try:
         while True:
@@ -288,29 +411,21 @@ async def websocket_endpoint(
                 if not content:
                     continue
                 
-                # Создаем новое сообщение в БД
-                db_message = Message(
-                    chat_id=chat_id,
-                    sender_id=current_user.id,
-                    content=content
-                )
-                
-                db.add(db_message)
-                db.commit()
-                db.refresh(db_message)
+                # Сохраняем сообщение в БД вместе с сообщениями других сокетов
+                db_message = await message_writer.write(chat_id, user_id, content)
                 
                 # Формируем ответное сообщение
                 response = {
                     "type": "message",
-                    "id": db_message.id,
-                    "chat_id": db_message.chat_id,
-                    "sender_id": db_message.sender_id,
-                    "content": db_message.content,
-                    "is_read": db_message.is_read,
-                    "created_at": db_message.created_at.isoformat(),
+                    "id": db_message["id"],
+                    "chat_id": db_message["chat_id"],
+                    "sender_id": db_message["sender_id"],
+                    "content": db_message["content"],
+                    "is_read": db_message["is_read"],
+                    "created_at": db_message["created_at"].isoformat(),
                     "sender": {
-                        "id": current_user.id,
-                        "username": current_user.username
+                        "id": user_id,
+                        "username": username
                     }
                 }
                 
@@ -320,18 +435,22 @@ async def websocket_endpoint(
             except json.JSONDecodeError:
                 # Игнорируем неправильно отформатированные сообщения
                 continue
+            except SQLAlchemyError as e:
+                # Сообщение не сохранено - не рассылаем его, соединение оставляем открытым
+                logger.error(f"Ошибка сохранения сообщения в чат {chat_id}: {str(e)}")
+                continue
             
     except WebSocketDisconnect:
         # Обрабатываем отключение пользователя
-        manager.disconnect(chat_id, current_user.id)
+        await manager.disconnect(chat_id, user_id, websocket)
         
         # Отправляем уведомление об отключении пользователя
         disconnection_message = {
             "type": "connection",
-            "user_id": current_user.id,
-            "username": current_user.username,
+            "user_id": user_id,
+            "username": username,
             "connected": False,
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        await manager.send_message(disconnection_message, chat_id, current_user.id) 
\ No newline at end of file
+        await manager.send_message(disconnection_message, chat_id, user_id)
\ No newline at end of file
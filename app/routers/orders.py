@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional, Union
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.models.order import Order, OrderItem, OrderStatus, Review
 from app.models.product import Product
@@ -16,42 +18,58 @@ from app.schemas.order import (
     ReviewCreate,
     ReviewDetail
 )
+from app.schemas.pagination import CursorPage
 from app.security import get_current_user, get_current_seller, get_current_admin
+from app.services.pagination import apply_keyset_pagination, paginate_results
+from app.services.loaders import loader_options, reload_for_schema
+from app.services.ratings import apply_review_rating
+from app.services.stock import reserve_products
 from app.routers.chat import create_chat_for_order
 
 router = APIRouter()
 
-@router.get("/", response_model=List[OrderSchema])
+@router.get("/", response_model=Union[List[OrderSchema], CursorPage[OrderSchema]])
 async def read_orders(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Получение списка заказов пользователя (продавца или покупателя)
+    Получение списка заказов пользователя (продавца или покупателя).
+    При переданном cursor ответ возвращается страницей курсорной пагинации.
     """
-    if current_user.role == "admin":
-        # Администраторы видят все заказы
-        orders = db.query(Order).offset(skip).limit(limit).all()
-    else:
-        # Обычные пользователи видят только свои заказы
-        orders = db.query(Order).filter(
+    query = select(Order).options(*loader_options(OrderSchema))
+    
+    if current_user.role != "admin":
+        # Обычные пользователи видят только свои заказы, администраторы - все
+        query = query.where(
             (Order.buyer_id == current_user.id) | (Order.seller_id == current_user.id)
-        ).offset(skip).limit(limit).all()
+        )
     
-    return orders
+    if cursor is not None:
+        result = await db.execute(apply_keyset_pagination(query, Order, cursor, limit))
+        return paginate_results(result.scalars().all(), limit)
+    
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.get("/{order_id}", response_model=OrderDetail)
 async def read_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Получение информации о заказе по ID
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
+    result = await db.execute(
+        select(Order)
+        .where(Order.id == order_id)
+        .options(*loader_options(OrderDetail))
+    )
+    order = result.scalars().first()
     if order is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,46 +123,8 @@ async def create_order(
             detail="Заказ должен содержать хотя бы один товар"
         )
     
-    # Проверка товаров и расчет общей суммы
-    total_amount = 0
-    order_items = []
-    
-    for item_data in order_data.items:
-        product = db.query(Product).filter(Product.id == item_data.product_id).first()
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Товар с ID {item_data.product_id} не найден"
-            )
-        
-        # Проверка, что товар принадлежит указанному продавцу
-        if product.seller_id != order_data.seller_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Товар с ID {item_data.product_id} не принадлежит указанному продавцу"
-            )
-        
-        # Проверка наличия товара
-        if product.quantity < item_data.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Недостаточное количество товара с ID {item_data.product_id}"
-            )
-        
-        # Создание элемента заказа
-        order_item = OrderItem(
-            product_id=product.id,
-            quantity=item_data.quantity,
-            price=product.price
-        )
-        
-        # Добавляем в общую сумму
-        total_amount += product.price * item_data.quantity
-        
-        # Обновляем остаток товара
-        product.quantity -= item_data.quantity
-        
-        order_items.append(order_item)
+    # Проверка товаров, списание остатков и расчет общей суммы
+    order_items, total_amount = reserve_products(db, order_data.seller_id, order_data.items)
     
     # Создаем новый заказ
     db_order = Order(
@@ -161,12 +141,11 @@ async def create_order(
     # Сохраняем заказ в базу данных
     db.add(db_order)
     db.commit()
-    db.refresh(db_order)
     
     # Создаем чат для заказа
     await create_chat_for_order(db_order.id, db)
     
-    return db_order
+    return reload_for_schema(db, db_order, OrderDetail)
 
 @router.put("/{order_id}", response_model=OrderDetail)
 async def update_order(
@@ -232,9 +211,8 @@ async def update_order(
         setattr(db_order, key, value)
     
     db.commit()
-    db.refresh(db_order)
     
-    return db_order
+    return reload_for_schema(db, db_order, OrderDetail)
 
 @router.post("/{order_id}/reviews", response_model=ReviewDetail)
 async def create_review(
@@ -310,31 +288,34 @@ async def create_review(
         comment=review_data.comment
     )
     
-    # Сохраняем отзыв в базу данных
+    # Сохраняем отзыв и обновляем рейтинг продавца и товара в одной транзакции
     db.add(db_review)
+    apply_review_rating(db, db_review)
     db.commit()
-    db.refresh(db_review)
-    
-    # Обновляем рейтинг продавца
-    seller = db.query(User).filter(User.id == review_data.seller_id).first()
-    seller_reviews = db.query(Review).filter(Review.seller_id == review_data.seller_id).all()
-    
-    if seller_reviews:
-        total_rating = sum(review.rating for review in seller_reviews)
-        seller.seller_rating = total_rating / len(seller_reviews)
-        db.commit()
     
-    return db_review
+    return reload_for_schema(db, db_review, ReviewDetail)
 
-@router.get("/reviews/{product_id}", response_model=List[ReviewDetail])
+@router.get("/reviews/{product_id}", response_model=Union[List[ReviewDetail], CursorPage[ReviewDetail]])
 async def read_product_reviews(
     product_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получение списка отзывов о товаре
+    Получение списка отзывов о товаре.
+    При переданном cursor ответ возвращается страницей курсорной пагинации.
     """
-    reviews = db.query(Review).filter(Review.product_id == product_id).offset(skip).limit(limit).all()
-    return reviews 
\ No newline at end of file
+    query = (
+        select(Review)
+        .where(Review.product_id == product_id)
+        .options(*loader_options(ReviewDetail))
+    )
+    
+    if cursor is not None:
+        result = await db.execute(apply_keyset_pagination(query, Review, cursor, limit))
+        return paginate_results(result.scalars().all(), limit)
+    
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all() 
\ No newline at end of file
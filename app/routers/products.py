@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import List, Optional
-import os
-from uuid import uuid4
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, select, func
+from typing import List, Optional, Union
+from datetime import datetime
+import anyio
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.models.product import Product, Category, ProductImage, ProductStatus
 from app.schemas.product import (
@@ -15,42 +16,138 @@ from app.schemas.product import (
     ProductDetail,
     Category as CategorySchema,
     CategoryCreate,
-    CategoryWithChildren
+    CategoryWithChildren,
+    ProductFacets
 )
-from app.security import get_current_user, get_current_seller, get_current_admin
-from app.config import settings
+from app.security import get_current_user, get_current_seller, get_current_admin, get_request_user
+from app.schemas.pagination import CursorPage
+from app.services.search import apply_product_search
+from app.services.pagination import apply_keyset_pagination, paginate_results
+from app.services.loaders import loader_options, reload_for_schema
+from app.services.response_cache import catalog_cache, invalidate_catalog
+from app.services.conditional import Validators, make_validators, not_modified, with_validators
+from app.services.category_tree import category_tree
+from app.services.facets import load_facets
+from app.services.uploads import save_image_upload
 
 router = APIRouter()
 
+# Валидаторы условных GET-запросов: один дешевый запрос до загрузки данных.
+# Версия кэша каталога учитывает изменения без обновления строки товара
+# (например, состав категорий). ETag входит и в ключ кэша ответов, поэтому
+# изменение товара (остаток, рейтинг) сразу дает новую запись кэша
+async def categories_validators(db: AsyncSession) -> Validators:
+    count, last_created = (await db.execute(
+        select(func.count(Category.id), func.max(Category.created_at))
+    )).one()
+    return make_validators("c", count, last_created, await catalog_cache.current_version(), last_modified=last_created)
+
+async def products_validators(db: AsyncSession) -> Validators:
+    last_updated = (await db.execute(select(func.max(Product.updated_at)))).scalar()
+    return make_validators("p", last_updated, await catalog_cache.current_version(), last_modified=last_updated)
+
+async def product_validators(db: AsyncSession, product_id: int) -> Optional[Validators]:
+    # Для неактивных товаров ответ зависит от пользователя - без валидаторов
+    row = (await db.execute(
+        select(Product.updated_at, Product.status).where(Product.id == product_id)
+    )).first()
+    if row is None or row.status != ProductStatus.ACTIVE.value:
+        return None
+    # Версия кэша каталога учитывает изображения, категории и данные продавца,
+    # которые меняются без обновления строки товара
+    return make_validators(
+        "p", product_id, row.updated_at, await catalog_cache.current_version(), last_modified=row.updated_at
+    )
+
+# Запрос каталога с фильтрами списка товаров (общий для списка и фасетов)
+async def catalog_query(
+    db: AsyncSession,
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    seller_id: Optional[int] = None,
+    ranked: bool = True
+):
+    query = select(Product).where(Product.status == ProductStatus.ACTIVE.value)
+    
+    # Фильтрация по категории вместе с подкатегориями: префикс пути из дерева
+    # в памяти, поиск поддерева по индексу categories.path
+    if category_id:
+        tree = await category_tree.get(db)
+        path = tree.path(category_id)
+        if path:
+            query = query.where(Product.categories.any(Category.path.like(f"{path}%")))
+        else:
+            query = query.where(Product.categories.any(Category.id == category_id))
+    
+    # Фильтрация по продавцу
+    if seller_id:
+        query = query.where(Product.seller_id == seller_id)
+    
+    # Фильтрация по цене
+    if min_price:
+        query = query.where(Product.price >= min_price)
+    if max_price:
+        query = query.where(Product.price <= max_price)
+    
+    # Полнотекстовый поиск по названию и описанию с сортировкой по релевантности
+    # (ranked=False - только фильтр: для курсора порядок задается ключом страницы)
+    if search:
+        query = apply_product_search(query, search, db.bind.dialect.name, ranked=ranked)
+    
+    return query
+
 # Эндпоинты для категорий
 @router.get("/categories", response_model=List[CategorySchema])
 async def read_categories(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка категорий товаров
     """
-    categories = db.query(Category).filter(Category.parent_id == None).offset(skip).limit(limit).all()
-    return categories
+    validators = await categories_validators(db)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+    
+    async def load():
+        tree = await category_tree.get(db)
+        return tree.roots(skip, limit)
+    
+    response = await catalog_cache.respond(request, List[CategorySchema], load, variant=validators.etag)
+    return with_validators(response, validators)
 
 @router.get("/categories/{category_id}", response_model=CategoryWithChildren)
 async def read_category(
+    request: Request,
     category_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получение информации о категории по ID
+    Получение информации о категории по ID вместе со всеми подкатегориями
+    (из дерева категорий в памяти, без запроса на каждый узел)
     """
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if category is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Категория не найдена"
-        )
+    validators = await categories_validators(db)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+    
+    async def load():
+        tree = await category_tree.get(db)
+        category = tree.subtree(category_id)
+        if category is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Категория не найдена"
+            )
+        return category
     
-    return category
+    response = await catalog_cache.respond(request, CategoryWithChildren, load, variant=validators.etag)
+    return with_validators(response, validators)
 
 @router.post("/categories", response_model=CategorySchema)
 async def create_category(
@@ -89,84 +186,144 @@ async def create_category(
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    invalidate_catalog()
     
     return db_category
 
 # Эндпоинты для товаров
-@router.get("/", response_model=List[ProductSchema])
+@router.get("/", response_model=Union[List[ProductSchema], CursorPage[ProductSchema]])
 async def read_products(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     category_id: Optional[int] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     seller_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получение списка товаров с возможностью фильтрации
+    Получение списка товаров с возможностью фильтрации.
+    Фильтр category_id включает товары всех подкатегорий.
+    При переданном cursor (пустой - первая страница) включается курсорная пагинация
+    по дате создания, и ответ возвращается страницей с next_cursor.
+    Ответы без полнотекстового поиска кэшируются.
     """
-    query = db.query(Product).filter(Product.status == ProductStatus.ACTIVE.value)
+    query = await catalog_query(db, category_id, search, min_price, max_price, seller_id, ranked=cursor is None)
     
-    # Фильтрация по категории
-    if category_id:
-        query = query.filter(Product.categories.any(Category.id == category_id))
+    # Связи, которые сериализуются в ответе, загружаем заранее
+    query = query.options(*loader_options(ProductSchema))
     
-    # Фильтрация по продавцу
-    if seller_id:
-        query = query.filter(Product.seller_id == seller_id)
+    async def load():
+        if cursor is not None:
+            result = await db.execute(apply_keyset_pagination(query, Product, cursor, limit))
+            return paginate_results(result.scalars().all(), limit)
+        
+        result = await db.execute(query.offset(skip).limit(limit))
+        return result.scalars().all()
     
-    # Фильтрация по цене
-    if min_price:
-        query = query.filter(Product.price >= min_price)
-    if max_price:
-        query = query.filter(Product.price <= max_price)
+    # Результаты поиска слишком разнообразны, чтобы их кэшировать
+    if search:
+        return await load()
+    
+    validators = await products_validators(db)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
     
-    # Поиск по названию и описанию
+    schema = CursorPage[ProductSchema] if cursor is not None else List[ProductSchema]
+    response = await catalog_cache.respond(request, schema, load, variant=validators.etag)
+    return with_validators(response, validators)
+
+@router.get("/facets", response_model=ProductFacets)
+async def read_product_facets(
+    request: Request,
+    skip: int = 0,
+    limit: int = 20,
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    seller_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Страница товаров с теми же фильтрами, что и список, вместе с числом товаров
+    выборки по категориям, продавцам и ценовым интервалам
+    """
+    filters = dict(category_id=category_id, search=search, min_price=min_price, max_price=max_price, seller_id=seller_id)
+    page_query = (await catalog_query(db, **filters)).options(*loader_options(ProductSchema))
+    facets_query = await catalog_query(db, **filters, ranked=False)
+    
+    async def load():
+        result = await db.execute(page_query.offset(skip).limit(limit))
+        facets = await load_facets(db, facets_query, await category_tree.get(db))
+        return {"items": result.scalars().all(), **facets}
+    
+    # Как и в списке товаров, результаты поиска не кэшируются
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Product.title.ilike(search_term),
-                Product.description.ilike(search_term)
-            )
-        )
+        return await load()
+    
+    validators = await products_validators(db)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
     
-    products = query.offset(skip).limit(limit).all()
-    return products
+    response = await catalog_cache.respond(request, ProductFacets, load, variant=validators.etag)
+    return with_validators(response, validators)
 
 @router.get("/{product_id}", response_model=ProductDetail)
 async def read_product(
+    request: Request,
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получение информации о товаре по ID
+    Получение информации о товаре по ID.
+    Кэшируются только активные товары: остальные видны не всем пользователям.
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if product is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Товар не найден"
+    async def load():
+        result = await db.execute(
+            select(Product)
+            .where(Product.id == product_id)
+            .options(*loader_options(ProductDetail))
         )
-    
-    if product.status != ProductStatus.ACTIVE.value:
-        # Для неактивных товаров нужны права
-        try:
-            current_user = get_current_user(db=db)
-            if current_user.id != product.seller_id and current_user.role != "admin":
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Недостаточно прав для просмотра этого товара"
-                )
-        except HTTPException:
+        product = result.scalars().first()
+        if product is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Товар не найден"
             )
-    
-    return product
+        
+        if product.status != ProductStatus.ACTIVE.value:
+            # Для неактивных товаров нужны права владельца или администратора
+            # Проверка токена обращается к БД и Redis синхронно - выполняется в потоке
+            current_user = getattr(request.state, "user", None)
+            if current_user is None:
+                current_user = await anyio.to_thread.run_sync(get_request_user, request)
+            if current_user is None or (current_user.id != product.seller_id and current_user.role != "admin"):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Товар не найден"
+                )
+        
+        return product
+    
+    validators = await product_validators(db, product_id)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+    
+    response = await catalog_cache.respond(
+        request,
+        ProductDetail,
+        load,
+        cacheable=lambda product: product.status == ProductStatus.ACTIVE.value,
+        variant=validators.etag if validators else ""
+    )
+    return with_validators(response, validators)
 
 @router.post("/", response_model=ProductDetail)
 async def create_product(
@@ -205,9 +362,9 @@ async def create_product(
     
     db.add(db_product)
     db.commit()
-    db.refresh(db_product)
+    invalidate_catalog()
     
-    return db_product
+    return reload_for_schema(db, db_product, ProductDetail)
 
 @router.put("/{product_id}", response_model=ProductDetail)
 async def update_product(
@@ -246,6 +403,8 @@ async def update_product(
                 )
             categories.append(category)
         db_product.categories = categories
+        # Состав категорий не меняет строку товара - обновляем Last-Modified явно
+        db_product.updated_at = datetime.utcnow()
     
     # Обновляем поля товара
     update_data = product_data.dict(exclude_unset=True, exclude={"category_ids"})
@@ -257,9 +416,9 @@ async def update_product(
         db_product.status = ProductStatus.MODERATION.value
     
     db.commit()
-    db.refresh(db_product)
+    invalidate_catalog()
     
-    return db_product
+    return reload_for_schema(db, db_product, ProductDetail)
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(
@@ -288,6 +447,7 @@ async def delete_product(
     # Изменяем статус товара на удаленный
     db_product.status = ProductStatus.DELETED.value
     db.commit()
+    invalidate_catalog()
     
     return None
 
@@ -317,38 +477,8 @@ async def upload_product_image(
             detail="Недостаточно прав для редактирования этого товара"
         )
     
-    # Проверка размера файла
-    file_size = 0
-    contents = await file.read()
-    file_size = len(contents)
-    await file.seek(0)
-    
-    if file_size > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"Размер файла превышает максимально допустимый ({settings.MAX_UPLOAD_SIZE} байт)"
-        )
-    
-    # Проверка типа файла
-    content_type = file.content_type
-    if not content_type.startswith("image/"):
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Файл должен быть изображением"
-        )
-    
-    # Создаем директорию для загрузок, если она не существует
-    upload_dir = os.path.join(settings.UPLOAD_DIR, "products")
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Создаем уникальное имя файла
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid4()}{file_extension}"
-    file_path = os.path.join(upload_dir, unique_filename)
-    
-    # Сохраняем файл
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
+    # Потоковое сохранение с проверкой размера и формата изображения
+    relative_path = await save_image_upload(file, "products")
     
     # Если изображение отмечено как основное, снимаем отметку с других изображений
     if is_primary:
@@ -356,7 +486,6 @@ async def upload_product_image(
             image.is_primary = False
     
     # Создаем запись в базе данных
-    relative_path = os.path.join("products", unique_filename)
     db_image = ProductImage(
         product_id=db_product.id,
         image_url=relative_path,
@@ -367,9 +496,11 @@ async def upload_product_image(
     # устанавливаем его как миниатюру товара
     if is_primary or not db_product.thumbnail:
         db_product.thumbnail = relative_path
+    # Новое изображение меняет ответ товара - обновляем Last-Modified
+    db_product.updated_at = datetime.utcnow()
     
     db.add(db_image)
     db.commit()
-    db.refresh(db_product)
+    invalidate_catalog()
     
-    return db_product 
\ No newline at end of file
+    return reload_for_schema(db, db_product, ProductDetail) 
\ No newline at end of file
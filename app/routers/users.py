@@ -3,19 +3,18 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional, Dict, Any
-import os
 import shutil
-from uuid import uuid4
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime
 
 from app.database import get_db
 from app.models.user import User, UserRole
 from app.models.order import Order, Review
 from app.models.product import Product
 from app.schemas.user import User as UserSchema, UserUpdate, UserCreate, UserResponse
-from app.security import get_current_user, get_current_admin, get_password_hash, verify_password, check_password_strength
-from app.config import settings
+from app.security import get_current_user, get_current_admin, get_token_claims, get_password_hash, get_password_hash_async, verify_password_async, check_password_strength
+from app.services.user_cache import user_cache
+from app.services.sessions import session_store
+from app.services.uploads import delete_upload, save_image_upload
 from fastapi.templating import Jinja2Templates
 
 router = APIRouter()
@@ -97,47 +96,13 @@ async def upload_avatar(
     """
     Загрузка аватара пользователя
     """
-    # Проверка размера файла
-    file_size = 0
-    contents = await file.read()
-    file_size = len(contents)
-    await file.seek(0)
-    
-    if file_size > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"Размер файла превышает максимально допустимый ({settings.MAX_UPLOAD_SIZE} байт)"
-        )
-    
-    # Проверка типа файла
-    content_type = file.content_type
-    if not content_type.startswith("image/"):
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Файл должен быть изображением"
-        )
-    
-    # Создаем директорию для загрузок, если она не существует
-    upload_dir = os.path.join(settings.UPLOAD_DIR, "avatars")
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Создаем уникальное имя файла
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid4()}{file_extension}"
-    file_path = os.path.join(upload_dir, unique_filename)
-    
-    # Сохраняем файл
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
+    # Потоковое сохранение с проверкой размера и формата изображения
+    relative_path = await save_image_upload(file, "avatars")
     
     # Удаляем старый аватар, если он есть
-    if current_user.avatar:
-        old_avatar_path = os.path.join(settings.UPLOAD_DIR, current_user.avatar)
-        if os.path.exists(old_avatar_path):
-            os.remove(old_avatar_path)
+    await delete_upload(current_user.avatar)
     
     # Обновляем путь к аватару в базе данных
-    relative_path = os.path.join("avatars", unique_filename)
     current_user.avatar = relative_path
     db.commit()
     db.refresh(current_user)
@@ -165,6 +130,7 @@ async def become_seller(
     current_user.seller_description = description
     
     db.commit()
+    user_cache.invalidate(current_user.id)
     db.refresh(current_user)
     
     return current_user
@@ -378,55 +344,23 @@ async def upload_avatar_browser(
     Загрузка аватара пользователя через браузер
     """
     try:
-        # Проверка размера файла
-        file_size = 0
-        contents = await file.read()
-        file_size = len(contents)
-        await file.seek(0)
-        
-        if file_size > settings.MAX_UPLOAD_SIZE:
+        # Потоковое сохранение с проверкой размера и формата изображения
+        try:
+            relative_path = await save_image_upload(file, "avatars")
+        except HTTPException as e:
             return templates.TemplateResponse(
                 "account/edit_profile.html", 
                 {
                     "request": request, 
                     "user": current_user, 
-                    "error": f"Размер файла превышает максимально допустимый ({settings.MAX_UPLOAD_SIZE / 1024 / 1024:.1f} МБ)"
+                    "error": e.detail
                 }
             )
         
-        # Проверка типа файла
-        content_type = file.content_type
-        if not content_type.startswith("image/"):
-            return templates.TemplateResponse(
-                "account/edit_profile.html", 
-                {
-                    "request": request, 
-                    "user": current_user, 
-                    "error": "Файл должен быть изображением"
-                }
-            )
-        
-        # Создаем директорию для загрузок, если она не существует
-        upload_dir = os.path.join(settings.UPLOAD_DIR, "avatars")
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Создаем уникальное имя файла
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid4()}{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # Сохраняем файл
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
-        
         # Удаляем старый аватар, если он есть
-        if current_user.avatar:
-            old_avatar_path = os.path.join(settings.UPLOAD_DIR, current_user.avatar)
-            if os.path.exists(old_avatar_path):
-                os.remove(old_avatar_path)
+        await delete_upload(current_user.avatar)
         
         # Обновляем путь к аватару в базе данных
-        relative_path = os.path.join("avatars", unique_filename)
         current_user.avatar = relative_path
         db.commit()
         db.refresh(current_user)
@@ -454,44 +388,13 @@ async def upload_avatar_browser(
 async def user_security(
     request: Request,
     db: Session = Depends(get_db),
+    claims: Dict[str, Any] = Depends(get_token_claims),
     current_user: User = Depends(get_current_user)
 ):
     """
     Страница безопасности профиля пользователя
     """
-    # Здесь можно добавить получение списка сессий пользователя
-    # В примере просто создадим фиктивные данные
-    
-    # Создаем примеры сессий
-    sessions = [
-        {
-            "id": 1,
-            "device": "Chrome на Windows",
-            "device_icon": "desktop",
-            "ip": "192.168.1.1",
-            "location": "Москва, Россия",
-            "created_at": datetime.now(pytz.UTC),
-            "is_current": True
-        },
-        {
-            "id": 2,
-            "device": "Firefox на Mac",
-            "device_icon": "laptop",
-            "ip": "192.168.1.2",
-            "location": "Санкт-Петербург, Россия",
-            "created_at": datetime.now(pytz.UTC) - timedelta(days=1),
-            "is_current": False
-        },
-        {
-            "id": 3,
-            "device": "Safari на iPhone",
-            "device_icon": "mobile",
-            "ip": "192.168.1.3",
-            "location": "Екатеринбург, Россия",
-            "created_at": datetime.now(pytz.UTC) - timedelta(days=2),
-            "is_current": False
-        }
-    ]
+    sessions = session_store.list(current_user.id, claims.get("sid"))
     
     return templates.TemplateResponse(
         "account/security.html", 
@@ -502,6 +405,7 @@ async def user_security(
 async def change_password(
     request: Request,
     db: Session = Depends(get_db),
+    claims: Dict[str, Any] = Depends(get_token_claims),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -513,7 +417,7 @@ async def change_password(
     confirm_password = form.get("confirm_password")
     
     # Проверяем текущий пароль
-    if not verify_password(current_password, current_user.hashed_password):
+    if not await verify_password_async(current_password, current_user.hashed_password):
         return templates.TemplateResponse(
             "account/security.html", 
             {
@@ -576,8 +480,10 @@ async def change_password(
         )
     
     # Обновляем пароль
-    current_user.hashed_password = get_password_hash(new_password)
+    current_user.hashed_password = await get_password_hash_async(new_password)
     db.commit()
+    # Остальные сессии могли быть открыты со старым паролем
+    session_store.revoke_all(current_user.id, except_sid=claims.get("sid"))
     
     return templates.TemplateResponse(
         "account/security.html", 
@@ -627,7 +533,7 @@ async def disable_2fa(
     password = form.get("password")
     
     # Проверяем пароль
-    if not verify_password(password, current_user.hashed_password):
+    if not await verify_password_async(password, current_user.hashed_password):
         return templates.TemplateResponse(
             "account/security.html", 
             {
@@ -654,50 +560,41 @@ async def disable_2fa(
 @router.post("/profile/security/sessions/{session_id}/terminate", response_class=HTMLResponse)
 async def terminate_session(
     request: Request,
-    session_id: int,
+    session_id: str,
+    claims: Dict[str, Any] = Depends(get_token_claims),
     current_user: User = Depends(get_current_user)
 ):
     """
     Завершение сессии пользователя
     """
-    # В реальном приложении здесь была бы логика завершения конкретной сессии
-    
-    return templates.TemplateResponse(
-        "account/security.html", 
-        {
-            "request": request, 
-            "user": current_user,
-            "sessions": [],  # Здесь нужно вернуть обновленный список сессий
-            "tfa_success": "Сеанс успешно завершен"
-        }
-    )
+    context = {"request": request, "user": current_user}
+    if session_id == claims.get("sid"):
+        context["tfa_error"] = "Текущий сеанс завершается выходом из системы"
+    elif session_store.revoke(current_user.id, session_id):
+        context["tfa_success"] = "Сеанс успешно завершен"
+    else:
+        context["tfa_error"] = "Сеанс не найден"
+    context["sessions"] = session_store.list(current_user.id, claims.get("sid"))
+    
+    return templates.TemplateResponse("account/security.html", context)
 
 @router.post("/profile/security/sessions/terminate-all", response_class=HTMLResponse)
 async def terminate_all_sessions(
     request: Request,
+    claims: Dict[str, Any] = Depends(get_token_claims),
     current_user: User = Depends(get_current_user)
 ):
     """
     Завершение всех сессий пользователя кроме текущей
     """
-    # В реальном приложении здесь была бы логика завершения всех сессий кроме текущей
+    session_store.revoke_all(current_user.id, except_sid=claims.get("sid"))
     
     return templates.TemplateResponse(
         "account/security.html", 
         {
             "request": request, 
             "user": current_user,
-            "sessions": [
-                {
-                    "id": 1,
-                    "device": "Chrome на Windows",
-                    "device_icon": "desktop",
-                    "ip": "192.168.1.1",
-                    "location": "Москва, Россия",
-                    "created_at": datetime.now(pytz.UTC),
-                    "is_current": True
-                }
-            ],
+            "sessions": session_store.list(current_user.id, claims.get("sid")),
             "tfa_success": "Все сеансы успешно завершены"
         }
     )
@@ -751,6 +648,7 @@ async def become_seller_submit(
     current_user.seller_description = description
     
     db.commit()
+    user_cache.invalidate(current_user.id)
     db.refresh(current_user)
     
     # Перенаправляем на страницу профиля с сообщением об успехе
@@ -16,6 +16,7 @@ from app.schemas.chat import (
     Chat, ChatCreate, ChatDetail,
     Message, MessageCreate, MessageDetail
 )
+from app.schemas.pagination import CursorPage
 
 # Для удобного импорта: from app.schemas import User, Product, ...
 __all__ = [
@@ -35,5 +36,8 @@ __all__ = [
     
     # Chat
     "Chat", "ChatCreate", "ChatDetail",
-    "Message", "MessageCreate", "MessageDetail"
+    "Message", "MessageCreate", "MessageDetail",
+    
+    # Pagination
+    "CursorPage"
 ] 
\ No newline at end of file
@@ -0,0 +1,13 @@
+from pydantic.generics import GenericModel
+from typing import Generic, List, Optional, TypeVar
+
+ItemT = TypeVar("ItemT")
+
+class CursorPage(GenericModel, Generic[ItemT]):
+    """
+    Страница курсорной пагинации.
+    next_cursor передается в параметре cursor для получения следующей страницы,
+    None означает, что страница последняя.
+    """
+    items: List[ItemT]
+    next_cursor: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from app.models.product import ProductStatus
 
@@ -124,6 +124,9 @@ class ProductDetail(Product):
     Расширенная схема товара с подробной информацией
     """
     seller: 'UserInfo'  # Импортируем из user.py позже
+    rating_count: int = 0
+    rating_average: float = 0.0
+    rating_histogram: Dict[int, int] = {}
     
     class Config:
         orm_mode = True
@@ -138,4 +141,29 @@ class UserInfo(BaseModel):
         orm_mode = True
 
 # Обновляем ссылки на UserInfo
-ProductDetail.update_forward_refs() 
\ No newline at end of file
+ProductDetail.update_forward_refs() 
+class FacetCount(BaseModel):
+    """
+    Число товаров для значения фасета (категории или продавца)
+    """
+    id: int
+    name: str
+    count: int
+
+class PriceBucket(BaseModel):
+    """
+    Число товаров в ценовом интервале [min, max); None - без границы
+    """
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+class ProductFacets(BaseModel):
+    """
+    Страница товаров вместе с фасетами по всей выборке
+    """
+    items: List[Product]
+    total: int
+    categories: List[FacetCount] = []
+    sellers: List[FacetCount] = []
+    price_buckets: List[PriceBucket] = []
@@ -6,24 +6,21 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-from collections import defaultdict
-import time
+import math
 import random
 import string
 import os
 import logging
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.user import User, PhoneVerification
 from app.schemas.user import TokenData
-
-# Глобальные переменные для rate limiting и блокировки аккаунтов
-LOGIN_ATTEMPTS = defaultdict(list)  # username -> list of timestamps
-BLOCKED_USERS = defaultdict(float)  # username -> timestamp until blocked
-MAX_ATTEMPTS = 5  # Максимальное количество попыток
-BLOCK_DURATION = 900  # Время блокировки в секундах (15 минут)
-ATTEMPT_WINDOW = 300  # Окно времени для подсчета попыток (5 минут)
+from app.services.user_cache import get_user_by_id_cached
+from app.services.token_cache import token_cache
+from app.services.password_hasher import PasswordHasher
+from app.services.rate_limit import client_ip, rate_limiter, too_many_requests
+from app.services.sessions import session_store
 
 def check_password_strength(password: str) -> bool:
     """
@@ -43,46 +40,42 @@ def check_password_strength(password: str) -> bool:
     
     return all([has_upper, has_lower, has_digit, has_special])
 
-def check_rate_limit(username: str) -> None:
-    """
-    Проверка rate limiting и блокировки
-    """
-    current_time = time.time()
-    
-    # Проверка блокировки
-    if username in BLOCKED_USERS:
-        block_end = BLOCKED_USERS[username]
-        if current_time < block_end:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Аккаунт заблокирован на {int(block_end - current_time)} секунд"
-            )
-        else:
-            del BLOCKED_USERS[username]
-            LOGIN_ATTEMPTS[username] = []
+def _login_keys(username: str, ip: Optional[str] = None):
+    # Неудачные входы считаются и по учетной записи, и по IP-адресу:
+    # перебор паролей одного аккаунта и перебор аккаунтов с одного адреса
+    keys = [(f"login:user:{username.strip().lower()}", settings.LOGIN_MAX_ATTEMPTS)]
+    if ip:
+        keys.append((f"login:ip:{ip}", settings.LOGIN_IP_MAX_ATTEMPTS))
+    return keys
 
-    # Очистка старых попыток
-    LOGIN_ATTEMPTS[username] = [t for t in LOGIN_ATTEMPTS[username] 
-                              if current_time - t < ATTEMPT_WINDOW]
-    
-    # Проверка количества попыток
-    if len(LOGIN_ATTEMPTS[username]) >= MAX_ATTEMPTS:
-        BLOCKED_USERS[username] = current_time + BLOCK_DURATION
-        LOGIN_ATTEMPTS[username] = []
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Превышено количество попыток. Аккаунт заблокирован на {BLOCK_DURATION} секунд"
-        )
+def check_rate_limit(username: str, ip: Optional[str] = None) -> None:
+    """
+    Списание попытки входа до проверки пароля (лимит общий для всех процессов).
+    Попытка учитывается атомарно при проверке: одновременные запросы не могут
+    пройти проверку раньше, чем будут учтены предыдущие
+    """
+    for key, limit in _login_keys(username, ip):
+        result = rate_limiter.hit(key, limit, settings.LOGIN_ATTEMPT_WINDOW)
+        if not result.allowed:
+            raise too_many_requests(
+                result,
+                detail=f"Слишком много попыток входа. Повторите через {max(math.ceil(result.retry_after), 1)} секунд"
+            )
 
-def record_login_attempt(username: str, success: bool) -> None:
+def record_login_attempt(username: str, success: bool, ip: Optional[str] = None) -> None:
     """
-    Запись попытки входа
+    Учет результата входа. Попытка уже списана в check_rate_limit,
+    успешный вход сбрасывает лимит учетной записи
     """
-    if not success:
-        LOGIN_ATTEMPTS[username].append(time.time())
+    if success:
+        rate_limiter.reset(_login_keys(username)[0][0])
+
+# Контекст для хеширования паролей. Хеши с другой стоимостью bcrypt
+# считаются устаревшими и пересчитываются при входе
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
-# Контекст для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Пул потоков для bcrypt в async-обработчиках
+password_hasher = PasswordHasher(pwd_context)
 
 # Схема авторизации OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
@@ -99,6 +92,28 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Проверка пароля в пуле хеширования, не блокируя event loop
+    """
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Создание хеша пароля в пуле хеширования, не блокируя event loop
+    """
+    return await password_hasher.hash(password)
+
+async def verify_user_password(user: User, plain_password: str) -> bool:
+    """
+    Проверка пароля пользователя при входе. Если хеш создан с другой стоимостью
+    bcrypt, он заменяется новым (сохраняется вызывающим кодом при commit)
+    """
+    verified, new_hash = await password_hasher.verify_and_update(plain_password, user.hashed_password)
+    if verified and new_hash:
+        user.hashed_password = new_hash
+    return verified
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Создание JWT токена доступа
@@ -150,41 +165,90 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """
     return db.query(User).filter(User.username == username).first()
 
+def create_session_token(user: User, request: Request) -> str:
+    """
+    Регистрация сессии входа и создание токена доступа с ее идентификатором
+    """
+    data = {
+        "sub": user.username,
+        "id": user.id,
+        "role": user.role
+    }
+    sid = session_store.create(user.id, client_ip(request), request.headers.get("user-agent", ""))
+    if sid:
+        data["sid"] = sid
+    return create_access_token(
+        data=data,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+def _verify_access_token(token: str) -> Optional[Dict[str, Any]]:
+    # Проверка подписи и срока действия. Результат кэшируется до exp
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    # Токены сброса пароля подписаны тем же ключом, но для входа не годятся
+    if claims.get("sub") is None or claims.get("type") is not None:
+        return None
+    token_cache.set(token, claims)
+    return claims
+
+def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Утверждения токена доступа, если токен действителен и его сессия не завершена
+    """
+    claims = _verify_access_token(token)
+    if claims is None or not session_store.is_active(claims.get("sid")):
+        return None
+    return claims
+
+def get_user_by_claims(db: Session, claims: Dict[str, Any]) -> Optional[User]:
+    """
+    Получение пользователя по утверждениям токена: по первичному ключу,
+    для старых токенов без ID - по имени пользователя
+    """
+    user_id = claims.get("id")
+    if user_id is not None:
+        return db.get(User, user_id)
+    return get_user_by_username(db, claims["sub"])
+
 def get_user_by_token(token: str, db: Session) -> Optional[User]:
     """
     Получение пользователя по токену
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        user = get_user_by_username(db, username)
-        return user
-    except JWTError:
+    claims = decode_access_token(token)
+    if claims is None:
         return None
+    return get_user_by_claims(db, claims)
+
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Утверждения проверенного токена доступа
+    """
+    claims = decode_access_token(token)
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Не удалось проверить учетные данные",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     """
     Получение текущего пользователя по токену
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Не удалось проверить учетные данные",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = get_user_by_username(db, username)
+    user = get_user_by_claims(db, get_token_claims(token))
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Не удалось проверить учетные данные",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if not user.is_active:
         raise HTTPException(
@@ -222,37 +286,61 @@ async def get_current_admin_user(current_user: User = Depends(get_current_user))
         )
     return current_user
 
+def get_cookie_token(request) -> Optional[str]:
+    """
+    Токен доступа из cookie
+    """
+    token = request.cookies.get("access_token")
+    # Если токен в формате "Bearer <token>", удаляем префикс
+    if token and token.startswith("Bearer "):
+        token = token[7:]
+    return token or None
+
+def get_bearer_token(request) -> Optional[str]:
+    """
+    Токен доступа из заголовка Authorization: Bearer
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
 def get_cookie_user(request):
     """
     Получение текущего пользователя из cookie
     """
+    return _get_token_user(get_cookie_token(request))
+
+def get_request_user(request):
+    """
+    Получение текущего пользователя по заголовку Authorization (клиенты API)
+    или по cookie (веб-интерфейс). Выполняет синхронные запросы к БД и Redis:
+    из асинхронного кода вызывается в потоке
+    """
+    return _get_token_user(get_bearer_token(request) or get_cookie_token(request))
+
+def _get_token_user(token: Optional[str]):
     try:
-        # Получаем токен из cookie
-        token = request.cookies.get("access_token")
         if not token:
             return None
         
-        # Если токен в формате "Bearer <token>", удаляем префикс
-        if token.startswith("Bearer "):
-            token = token[7:]
-        
-        # Проверяем валидность токена
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username = payload.get("sub")
-            if not username:
-                return None
-                
-            # Проверяем срок действия токена
-            exp = payload.get("exp")
-            if not exp or datetime.utcnow() > datetime.fromtimestamp(exp):
-                return None
-        except JWTError:
+        # Проверяем подпись, срок действия токена и его сессию
+        payload = decode_access_token(token)
+        if payload is None:
             return None
+        username = payload["sub"]
         
-        # Получаем пользователя из базы данных
-        db = next(get_db())
-        user = get_user_by_username(db, username)
+        # Получаем пользователя по ID из токена через кэш,
+        # для старых токенов без ID - по имени пользователя
+        user_id = payload.get("id")
+        if user_id is not None:
+            user = get_user_by_id_cached(user_id)
+        else:
+            db = SessionLocal()
+            try:
+                user = get_user_by_username(db, username)
+            finally:
+                db.close()
         
         # Проверяем активность пользователя
         if user and not user.is_active:
@@ -260,28 +348,56 @@ def get_cookie_user(request):
             
         return user
     except Exception as e:
-        print(f"Ошибка при получении пользователя из cookie: {e}")
+        print(f"Ошибка при получении пользователя по токену: {e}")
         return None
 
-def get_current_seller(current_user: User = Depends(get_current_user)) -> User:
+def _role_guard(roles, detail: str):
+    """
+    Проверка роли по утверждениям токена до загрузки пользователя из сессии.
+    
+    Роль в токене могла устареть (переход в продавцы, назначение администратором),
+    поэтому токену верим только в безопасную сторону: если роль из токена подходит,
+    окончательная проверка выполняется по записи пользователя. Отказ по роли из
+    токена подтверждается кэшем пользователей, который сбрасывается при смене роли,
+    и запрос без прав отклоняется без обращения к базе данных.
+    """
+    def guard(claims: Dict[str, Any] = Depends(get_token_claims)) -> Dict[str, Any]:
+        if claims.get("role") in roles or claims.get("id") is None:
+            return claims
+        cached = get_user_by_id_cached(claims["id"])
+        if cached is not None and cached.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return claims
+    return guard
+
+SELLER_ROLE_DETAIL = "Недостаточно прав. Требуется роль продавца."
+ADMIN_ROLE_DETAIL = "Недостаточно прав. Требуется роль администратора."
+
+def get_current_seller(
+    claims: Dict[str, Any] = Depends(_role_guard(("seller", "admin"), SELLER_ROLE_DETAIL)),
+    current_user: User = Depends(get_current_user)
+) -> User:
     """
     Получение текущего пользователя-продавца
     """
     if current_user.role != "seller" and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Недостаточно прав. Требуется роль продавца."
+            detail=SELLER_ROLE_DETAIL
         )
     return current_user
 
-def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+def get_current_admin(
+    claims: Dict[str, Any] = Depends(_role_guard(("admin",), ADMIN_ROLE_DETAIL)),
+    current_user: User = Depends(get_current_user)
+) -> User:
     """
     Получение текущего пользователя-администратора
     """
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Недостаточно прав. Требуется роль администратора."
+            detail=ADMIN_ROLE_DETAIL
         )
     return current_user
 
@@ -290,16 +406,14 @@ async def authenticate_user(username: str, password: str, db: Session) -> Union[
     Аутентификация пользователя
     """
     try:
-        # Проверка rate limiting
+        # Попытка списывается до проверки пароля
         check_rate_limit(username)
         
         user = db.query(User).filter(User.username == username).first()
         if not user:
-            record_login_attempt(username, False)
             return False
             
-        if not verify_password(password, user.hashed_password):
-            record_login_attempt(username, False)
+        if not await verify_user_password(user, password):
             return False
             
         # Успешная аутентификация
@@ -310,7 +424,6 @@ async def authenticate_user(username: str, password: str, db: Session) -> Union[
         # Пробрасываем исключения от rate limiting
         raise e
     except Exception as e:
-        record_login_attempt(username, False)
         return False
 
 # Функции для SMS-верификации
@@ -424,7 +537,7 @@ class ServeoSecurity:
             return True
             
         # Для Serveo проверяем IP клиента
-        client_ip = request.headers.get("x-forwarded-for") or request.client.host
+        ip = client_ip(request)
         
         # Белый список IP для доступа к админке через Serveo (из файла)
         whitelist_file = "admin_ip_whitelist.txt"
@@ -435,7 +548,7 @@ class ServeoSecurity:
                     whitelist = [line.strip() for line in f.readlines() if line.strip()]
                     
                 # Если IP в белом списке, разрешаем доступ
-                if client_ip in whitelist:
+                if ip in whitelist:
                     return True
         except Exception as e:
             logging.error(f"Ошибка при проверке белого списка IP: {str(e)}")
@@ -453,34 +566,11 @@ class ServeoSecurity:
             return True
             
         # Получаем IP клиента
-        client_ip = request.headers.get("x-forwarded-for") or request.client.host
-        
-        # Создаем ключ для Redis
-        redis_key = f"ratelimit:{limit_key}:{client_ip}"
+        ip = client_ip(request)
         
-        # Используем Redis для отслеживания количества запросов
-        try:
-            from app.database import redis_client
-            
-            # Получаем текущее значение счетчика
-            count = redis_client.get(redis_key)
-            
-            if count is None:
-                # Если счетчик не существует, создаем новый
-                redis_client.set(redis_key, 1, ex=per_minutes*60)
-                return True
-            
-            # Увеличиваем счетчик
-            count = int(count) + 1
-            redis_client.set(redis_key, count, keepttl=True)
-            
-            # Проверяем превышение лимита
-            if count > max_requests:
-                logging.warning(f"Превышен лимит запросов: {limit_key} от {client_ip}, {count}/{max_requests}")
-                return False
-                
-            return True
-        except Exception as e:
-            logging.error(f"Ошибка при проверке ограничения скорости: {str(e)}")
-            # В случае ошибки разрешаем запрос
-            return True 
\ No newline at end of file
+        # Атомарный учет запроса в общем ограничителе частоты (Redis или память процесса)
+        result = rate_limiter.hit(f"{limit_key}:ip:{ip}", max_requests, per_minutes * 60)
+        if not result.allowed:
+            logging.warning(f"Превышен лимит запросов: {limit_key} от {ip}, {max_requests} за {per_minutes} мин")
+            return False
+        return True
@@ -0,0 +1,199 @@
+"""
+Рассылка сообщений чата между процессами приложения.
+
+Каждый процесс (воркер uvicorn, контейнер) хранит только свои WebSocket-подключения.
+Сообщение публикуется в бэкенд рассылки, а каждый процесс, у которого есть
+подключения к чату, получает его и доставляет своим сокетам.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Awaitable, Callable, List, Optional, Set
+
+from app.config import settings
+from app.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Обработчик полученного сообщения: (chat_id, сообщение)
+MessageHandler = Callable[[int, dict], Awaitable[None]]
+
+class BroadcastBackend:
+    """
+    Базовый бэкенд рассылки сообщений чата
+    """
+    def __init__(self):
+        self.handler: Optional[MessageHandler] = None
+
+    def set_handler(self, handler: MessageHandler):
+        self.handler = handler
+
+    async def subscribe(self, chat_id: int):
+        """
+        Подписка процесса на сообщения чата
+        """
+
+    async def unsubscribe(self, chat_id: int):
+        """
+        Отписка процесса от сообщений чата
+        """
+
+    async def publish(self, chat_id: int, message: dict):
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Освобождение ресурсов бэкенда
+        """
+
+class LocalBroadcast(BroadcastBackend):
+    """
+    Рассылка внутри одного процесса (один воркер или недоступный Redis)
+    """
+    async def publish(self, chat_id: int, message: dict):
+        if self.handler is not None:
+            await self.handler(chat_id, message)
+
+class RedisBroadcast(BroadcastBackend):
+    """
+    Рассылка через Redis pub/sub с отдельным каналом на каждый чат.
+
+    PubSub redis-py не потокобезопасен, поэтому соединением подписки владеет
+    только фоновый поток чтения. subscribe/unsubscribe меняют набор нужных каналов
+    сразу при вызове (в event loop, в том же порядке, что и подключения), а поток
+    приводит подписку к этому набору и подтверждает изменения ожидающим корутинам.
+    Поэтому отписка и повторная подписка на тот же чат не могут примениться
+    в обратном порядке. Полученные сообщения передаются обработчику в event loop.
+    """
+    CHANNEL_PREFIX = "chat:"
+
+    def __init__(self, client, poll_timeout: float = 0.1):
+        super().__init__()
+        self.client = client
+        # Поток замечает изменение подписок не позже чем через poll_timeout
+        self.poll_timeout = poll_timeout
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._changed = threading.Event()
+        self._lock = threading.Lock()
+        self._wanted: Set[str] = set()
+        self._waiters: List[asyncio.Future] = []
+
+    def channel(self, chat_id: int) -> str:
+        return f"{self.CHANNEL_PREFIX}{chat_id}"
+
+    async def _update(self, add: Optional[str] = None, remove: Optional[str] = None):
+        # Набор каналов меняется до первого await, ожидается только подтверждение потока
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            if add is not None:
+                self._wanted.add(add)
+            if remove is not None:
+                self._wanted.discard(remove)
+            self._waiters.append(future)
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._thread = threading.Thread(target=self._listen, name="chat-broadcast", daemon=True)
+            self._thread.start()
+        self._changed.set()
+        await future
+
+    async def subscribe(self, chat_id: int):
+        await self._update(add=self.channel(chat_id))
+
+    async def unsubscribe(self, chat_id: int):
+        await self._update(remove=self.channel(chat_id))
+
+    async def publish(self, chat_id: int, message: dict):
+        await asyncio.to_thread(self.client.publish, self.channel(chat_id), json.dumps(message))
+
+    def _sync_subscriptions(self, subscribed: Set[str]) -> Set[str]:
+        """
+        Приведение подписки к нужному набору каналов (только в потоке чтения)
+        """
+        with self._lock:
+            wanted = set(self._wanted)
+            waiters, self._waiters = self._waiters, []
+        try:
+            added, removed = wanted - subscribed, subscribed - wanted
+            if added:
+                self.pubsub.subscribe(*added)
+            if removed:
+                self.pubsub.unsubscribe(*removed)
+        except Exception as e:
+            # Изменения будут применены повторно на следующей итерации
+            logger.error(f"Ошибка изменения подписок Redis: {str(e)}")
+            with self._lock:
+                self._waiters[:0] = waiters
+            self._changed.set()
+            self._stopped.wait(self.poll_timeout)
+            return subscribed
+        for future in waiters:
+            self._loop.call_soon_threadsafe(_resolve, future)
+        return wanted
+
+    def _listen(self):
+        """
+        Применение изменений подписок и чтение сообщений с передачей их в event loop
+        """
+        subscribed: Set[str] = set()
+        while not self._stopped.is_set():
+            if self._changed.is_set():
+                self._changed.clear()
+                subscribed = self._sync_subscriptions(subscribed)
+
+            if not subscribed:
+                self._changed.wait(self.poll_timeout)
+                continue
+
+            try:
+                data = self.pubsub.get_message(timeout=self.poll_timeout)
+            except Exception as e:
+                # При обрыве соединения redis-py переподключается и восстанавливает подписки
+                logger.error(f"Ошибка чтения подписки Redis: {str(e)}")
+                self._stopped.wait(self.poll_timeout)
+                continue
+
+            if data is None or data["type"] != "message" or self.handler is None:
+                continue
+
+            channel = data["channel"].decode() if isinstance(data["channel"], bytes) else data["channel"]
+            chat_id = int(channel[len(self.CHANNEL_PREFIX):])
+            future = asyncio.run_coroutine_threadsafe(self.handler(chat_id, json.loads(data["data"])), self._loop)
+            future.add_done_callback(_log_delivery_error)
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Подписки больше не применяются - ожидающие подключения не должны зависнуть
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        if self._loop is not None and not self._loop.is_closed():
+            for future in waiters:
+                self._loop.call_soon_threadsafe(_resolve, future)
+        self.pubsub.close()
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+def _log_delivery_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Ошибка доставки сообщения чата", exc_info=future.exception())
+
+def create_broadcast_backend() -> BroadcastBackend:
+    """
+    Создание бэкенда рассылки по настройке CHAT_BROADCAST_BACKEND.
+    Если Redis недоступен (используется заглушка), рассылка работает в пределах процесса.
+    """
+    if settings.CHAT_BROADCAST_BACKEND == "redis":
+        if hasattr(redis_client, "pubsub"):
+            return RedisBroadcast(redis_client)
+        logger.warning("Redis недоступен, сообщения чата рассылаются только внутри процесса")
+    return LocalBroadcast()
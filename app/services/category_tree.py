@@ -0,0 +1,138 @@
+"""
+Дерево категорий в памяти процесса.
+
+Категории хранятся списком смежности (parent_id) и материализованным путем
+(path = "/1/5/12/"). Все дерево загружается одним запросом и перестраивается
+только при смене версии кэша каталога (create_category вызывает invalidate_catalog),
+поэтому ответы с подкатегориями не делают запрос на каждый узел. Товары поддерева
+выбираются по индексу categories.path (LIKE '/1/5/%'), без рекурсивных запросов.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.product import Category, category_path
+from app.services.response_cache import catalog_cache
+
+_FIELDS = ("id", "name", "slug", "description", "parent_id", "created_at", "path")
+
+class CategoryTree:
+    """
+    Снимок дерева категорий: узлы по id, дочерние узлы и корни
+    """
+    def __init__(self, categories):
+        self.nodes: Dict[int, dict] = {}
+        self.children: Dict[Optional[int], List[int]] = {}
+        for category in categories:
+            self.nodes[category.id] = {field: getattr(category, field) for field in _FIELDS}
+        for category_id, node in sorted(self.nodes.items()):
+            self.children.setdefault(node["parent_id"], []).append(category_id)
+
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self.nodes
+
+    def roots(self, skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """
+        Корневые категории в порядке id
+        """
+        ids = self.children.get(None, [])
+        end = None if limit is None else skip + limit
+        return [self.nodes[category_id] for category_id in ids[skip:end]]
+
+    def path(self, category_id: int) -> Optional[str]:
+        node = self.nodes.get(category_id)
+        return node["path"] if node else None
+
+    def descendant_ids(self, category_id: int) -> List[int]:
+        """
+        Идентификаторы категории и всех ее потомков
+        """
+        if category_id not in self.nodes:
+            return []
+        result, stack = [], [category_id]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(self.children.get(current, ()))
+        return result
+
+    def subtree(self, category_id: int) -> Optional[dict]:
+        """
+        Категория с вложенными подкатегориями (для CategoryWithChildren)
+        """
+        node = self.nodes.get(category_id)
+        if node is None:
+            return None
+        return {
+            **node,
+            "subcategories": [self.subtree(child) for child in self.children.get(category_id, ())]
+        }
+
+class CategoryTreeCache:
+    """
+    Дерево категорий, перестраиваемое при смене версии кэша каталога
+    """
+    def __init__(self, cache=catalog_cache):
+        self.cache = cache
+        self._tree: Optional[CategoryTree] = None
+        self._version: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    async def get(self, db: AsyncSession) -> CategoryTree:
+        """
+        Актуальное дерево; при смене версии - одна загрузка всех категорий
+        """
+        version = await self.cache.current_version()
+        if self._tree is not None and self._version == version:
+            return self._tree
+        async with self._lock:
+            # Пока ждали блокировку, дерево мог перестроить другой запрос
+            if self._tree is not None and self._version == version:
+                return self._tree
+            result = await db.execute(select(Category))
+            self._tree = CategoryTree(result.scalars().all())
+            # Версия прочитана до загрузки: изменение во время загрузки
+            # приведет к повторной перестройке
+            self._version = version
+            self.rebuilds += 1
+            return self._tree
+
+    def clear(self):
+        self._tree = None
+        self._version = None
+
+category_tree = CategoryTreeCache()
+
+def backfill_category_paths(db: Session) -> int:
+    """
+    Заполнение материализованных путей по parent_id. Возвращает число обновленных категорий
+    """
+    rows = db.execute(select(Category.id, Category.parent_id, Category.path)).all()
+    parents = {row.id: row.parent_id for row in rows}
+    paths: Dict[int, str] = {}
+
+    def resolve(category_id: int) -> str:
+        # Цепочка предков обходится итеративно, без рекурсии по глубине дерева
+        chain = []
+        current = category_id
+        while current is not None and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents.get(current)
+        parent_path = paths.get(current) if current is not None else None
+        for node in reversed(chain):
+            parent_path = paths[node] = category_path(parent_path, node)
+        return paths[category_id]
+
+    updated = 0
+    for row in rows:
+        path = resolve(row.id)
+        if row.path != path:
+            db.execute(update(Category).where(Category.id == row.id).values(path=path))
+            updated += 1
+    db.flush()
+    return updated
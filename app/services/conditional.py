@@ -0,0 +1,84 @@
+"""
+Условные GET-запросы (ETag / Last-Modified).
+
+Валидаторы ответа вычисляются дешевым запросом (дата изменения строки по первичному
+ключу или max(updated_at) по индексу) до загрузки и сериализации данных. Если клиент
+прислал совпадающий If-None-Match или If-Modified-Since не раньше даты изменения,
+сразу возвращается 304 без тела.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+
+from fastapi import Request, Response, status
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+def make_validators(*parts, last_modified: Optional[datetime] = None) -> Validators:
+    """
+    Слабый ETag из частей версии ответа и дата последнего изменения (UTC)
+    """
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    if last_modified is not None:
+        # В заголовке Last-Modified дата передается с точностью до секунды
+        last_modified = last_modified.replace(microsecond=0)
+    etag = "-".join(str(part.timestamp() if isinstance(part, datetime) else part) for part in parts)
+    return Validators(etag=f'W/"{etag}"', last_modified=last_modified)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Сравнение слабых ETag: префикс W/ не учитывается
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """
+    Проверка условных заголовков запроса. If-None-Match имеет приоритет над If-Modified-Since
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validators.etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return validators.last_modified <= since
+    return False
+
+def _headers(validators: Validators) -> dict:
+    headers = {"ETag": validators.etag, "Cache-Control": "no-cache"}
+    if validators.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(validators.last_modified, usegmt=True)
+    return headers
+
+def not_modified(request: Request, validators: Optional[Validators]) -> Optional[Response]:
+    """
+    Ответ 304, если у клиента актуальная версия, иначе None
+    """
+    if validators is None or not is_not_modified(request, validators):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_headers(validators))
+
+def with_validators(response: Response, validators: Optional[Validators]) -> Response:
+    """
+    Добавление ETag и Last-Modified к ответу
+    """
+    if validators is not None:
+        response.headers.update(_headers(validators))
+    return response
@@ -0,0 +1,161 @@
+"""
+Статистика панели администратора.
+
+Статистика считается несколькими агрегирующими запросами (по одному на таблицу,
+с группировкой по статусу и условными суммами) и хранится в Redis как снимок.
+Снимок периодически пересчитывается задачей Celery, поэтому опрос дашборда
+не обращается к большим таблицам напрямую.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, redis_client
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.models.order import Order, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_SNAPSHOT_KEY = "dashboard:stats"
+
+def _count_if(condition):
+    """
+    Условный подсчет строк внутри агрегирующего запроса
+    """
+    return sa.func.coalesce(sa.func.sum(sa.case((condition, 1), else_=0)), 0)
+
+def compute_dashboard_stats(db: Session) -> dict:
+    """
+    Расчет статистики дашборда тремя агрегирующими запросами
+    """
+    month_ago = datetime.utcnow() - timedelta(days=30)
+
+    # Пользователи: один проход по таблице с условными суммами
+    users = db.execute(
+        sa.select(
+            sa.func.count(User.id),
+            _count_if(User.is_active == True),
+            _count_if(User.role == UserRole.SELLER.value),
+            _count_if(User.role == UserRole.ADMIN.value),
+            _count_if(User.created_at >= month_ago)
+        )
+    ).one()
+
+    # Товары: количество и сумма цен по статусам
+    products_by_status = {
+        status: (count, price_sum or 0)
+        for status, count, price_sum in db.execute(
+            sa.select(Product.status, sa.func.count(Product.id), sa.func.sum(Product.price))
+            .group_by(Product.status)
+        )
+    }
+    total_products = sum(count for count, _ in products_by_status.values())
+    avg_price = sum(price_sum for _, price_sum in products_by_status.values()) / total_products if total_products else 0
+
+    # Заказы: количество и суммы по статусам, в том числе за последний месяц
+    orders_by_status = {
+        row.status: row
+        for row in db.execute(
+            sa.select(
+                Order.status,
+                sa.func.count(Order.id).label("count"),
+                sa.func.coalesce(sa.func.sum(Order.total_amount), 0).label("amount"),
+                _count_if(Order.created_at >= month_ago).label("month_count"),
+                sa.func.coalesce(
+                    sa.func.sum(sa.case((Order.created_at >= month_ago, Order.total_amount), else_=0)), 0
+                ).label("month_amount")
+            )
+            .group_by(Order.status)
+        )
+    }
+
+    def products_count(status: ProductStatus) -> int:
+        return products_by_status.get(status.value, (0, 0))[0]
+
+    def orders_count(status: OrderStatus) -> int:
+        row = orders_by_status.get(status.value)
+        return row.count if row else 0
+
+    completed = orders_by_status.get(OrderStatus.COMPLETED.value)
+    completed_orders = completed.count if completed else 0
+    total_sales = float(completed.amount) if completed else 0.0
+    month_sales = float(completed.month_amount) if completed else 0.0
+
+    # Средний чек
+    avg_order = total_sales / completed_orders if completed_orders else 0
+
+    # Комиссии (демонстрационные расчеты)
+    platform_fee = total_sales * 0.1  # 10% комиссия платформы
+    payment_fee = total_sales * 0.02  # 2% комиссия платежной системы
+
+    return {
+        "users": {
+            "total": users[0],
+            "active": int(users[1]),
+            "sellers": int(users[2]),
+            "admins": int(users[3]),
+            "new_month": int(users[4])
+        },
+        "products": {
+            "total": total_products,
+            "active": products_count(ProductStatus.ACTIVE),
+            "moderation": products_count(ProductStatus.MODERATION),
+            "hidden": products_count(ProductStatus.HIDDEN),
+            "avg_price": float(avg_price)
+        },
+        "orders": {
+            "total": sum(row.count for row in orders_by_status.values()),
+            "pending": orders_count(OrderStatus.PENDING),
+            "completed": completed_orders,
+            "cancelled": orders_count(OrderStatus.CANCELLED),
+            "new_month": int(sum(row.month_count for row in orders_by_status.values())),
+            "avg_completion_time": "24ч"  # Демонстрационные данные
+        },
+        "sales": {
+            "total": total_sales,
+            "month": month_sales,
+            "avg_order": float(avg_order),
+            "platform_fee": float(platform_fee),
+            "payment_fee": float(payment_fee)
+        },
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+def refresh_dashboard_snapshot(db: Session = None) -> dict:
+    """
+    Пересчет статистики и сохранение снимка в Redis
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        stats = compute_dashboard_stats(db)
+    finally:
+        if own_session:
+            db.close()
+
+    try:
+        redis_client.set(DASHBOARD_SNAPSHOT_KEY, json.dumps(stats), ex=settings.DASHBOARD_CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении снимка статистики в Redis: {str(e)}")
+    return stats
+
+def get_dashboard_snapshot(db: Session) -> dict:
+    """
+    Получение снимка статистики из Redis.
+    Если снимка еще нет (первый запуск, Redis недоступен), он рассчитывается сразу.
+    """
+    try:
+        cached = redis_client.get(DASHBOARD_SNAPSHOT_KEY)
+    except Exception as e:
+        logger.error(f"Ошибка при чтении снимка статистики из Redis: {str(e)}")
+        cached = None
+
+    if cached:
+        return json.loads(cached)
+    return refresh_dashboard_snapshot(db)
@@ -0,0 +1,100 @@
+"""
+Фасеты каталога: число товаров выборки по категориям, продавцам и ценовым интервалам.
+
+Фасеты считаются группирующими запросами по тому же отфильтрованному запросу,
+что и страница товаров (подзапрос только с нужными колонками): ценовые интервалы
+и общее число - одним проходом через CASE, категории - по связующей таблице,
+продавцы - с ограничением по числу. Названия категорий берутся из дерева категорий
+в памяти, без соединения с categories. Готовые ответы кэшируются кэшем каталога.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.product import Product, product_category
+from app.models.user import User
+from app.services.category_tree import CategoryTree
+
+def price_bucket_expression(column, edges: List[float]):
+    """
+    Номер ценового интервала: 0 - ниже первой границы, len(edges) - выше последней
+    """
+    return case(
+        *[(column < edge, index) for index, edge in enumerate(edges)],
+        else_=literal(len(edges))
+    )
+
+def facet_queries(query, edges: Optional[List[float]] = None, sellers_limit: Optional[int] = None) -> Dict[str, object]:
+    """
+    Группирующие запросы фасетов для запроса товаров select(Product).where(...)
+    """
+    edges = edges if edges is not None else settings.FACET_PRICE_BUCKETS
+    sellers_limit = sellers_limit if sellers_limit is not None else settings.FACET_SELLERS_LIMIT
+
+    # Сортировка и пагинация исходного запроса на подсчет не влияют
+    filtered = (
+        query.with_only_columns(Product.id, Product.seller_id, Product.price)
+        .order_by(None).limit(None).offset(None)
+        .subquery("filtered")
+    )
+
+    bucket = price_bucket_expression(filtered.c.price, edges).label("bucket")
+    prices = select(bucket, func.count().label("count")).group_by(bucket)
+
+    categories = (
+        select(product_category.c.category_id, func.count().label("count"))
+        .join(filtered, filtered.c.id == product_category.c.product_id)
+        .group_by(product_category.c.category_id)
+    )
+
+    product_count = func.count().label("count")
+    sellers = (
+        select(filtered.c.seller_id, User.username, product_count)
+        .join(User, User.id == filtered.c.seller_id)
+        .group_by(filtered.c.seller_id, User.username)
+        .order_by(product_count.desc(), filtered.c.seller_id)
+        .limit(sellers_limit)
+    )
+    return {"prices": prices, "categories": categories, "sellers": sellers}
+
+def build_facets(rows: Dict[str, list], tree: CategoryTree, edges: Optional[List[float]] = None) -> dict:
+    """
+    Ответ фасетов из результатов facet_queries()
+    """
+    edges = edges if edges is not None else settings.FACET_PRICE_BUCKETS
+    bucket_counts = {row.bucket: row.count for row in rows["prices"]}
+
+    price_buckets = []
+    for index in range(len(edges) + 1):
+        count = bucket_counts.get(index, 0)
+        # Интервал ниже первой границы (обычно 0) выводится, только если в нем есть товары
+        if index == 0 and count == 0:
+            continue
+        price_buckets.append({
+            "min": edges[index - 1] if index > 0 else None,
+            "max": edges[index] if index < len(edges) else None,
+            "count": count,
+        })
+
+    categories = [
+        {"id": row.category_id, "name": tree.nodes[row.category_id]["name"], "count": row.count}
+        for row in rows["categories"] if row.category_id in tree
+    ]
+    categories.sort(key=lambda facet: (-facet["count"], facet["id"]))
+
+    return {
+        "total": sum(bucket_counts.values()),
+        "categories": categories,
+        "sellers": [{"id": row.seller_id, "name": row.username, "count": row.count} for row in rows["sellers"]],
+        "price_buckets": price_buckets,
+    }
+
+async def load_facets(db: AsyncSession, query, tree: CategoryTree) -> dict:
+    """
+    Подсчет фасетов для запроса товаров (три группирующих запроса)
+    """
+    rows = {name: (await db.execute(statement)).all() for name, statement in facet_queries(query).items()}
+    return build_facets(rows, tree)
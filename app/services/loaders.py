@@ -0,0 +1,59 @@
+"""
+Стратегии загрузки связей для схем ответа.
+
+Для каждой схемы, которая сериализует связи модели, здесь перечислены опции
+загрузки: коллекции загружаются selectinload (один дополнительный запрос на всю
+страницу), связи многие-к-одному - joinedload (в том же запросе). Число запросов
+на страницу не зависит от ее размера, а сериализация не вызывает ленивых загрузок.
+"""
+
+from typing import Tuple, Type
+
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
+
+from app.models.order import Order, Review
+from app.models.product import Product
+from app.schemas.order import Order as OrderSchema, OrderDetail, ReviewDetail
+from app.schemas.product import Product as ProductSchema, ProductDetail
+
+PRODUCT_OPTIONS = (
+    selectinload(Product.categories),
+    selectinload(Product.images),
+)
+PRODUCT_DETAIL_OPTIONS = PRODUCT_OPTIONS + (joinedload(Product.seller),)
+
+ORDER_OPTIONS = (selectinload(Order.items),)
+ORDER_DETAIL_OPTIONS = ORDER_OPTIONS + (
+    joinedload(Order.buyer),
+    joinedload(Order.seller),
+)
+
+REVIEW_DETAIL_OPTIONS = (joinedload(Review.reviewer),)
+
+_SCHEMA_OPTIONS = {
+    ProductSchema: PRODUCT_OPTIONS,
+    ProductDetail: PRODUCT_DETAIL_OPTIONS,
+    OrderSchema: ORDER_OPTIONS,
+    OrderDetail: ORDER_DETAIL_OPTIONS,
+    ReviewDetail: REVIEW_DETAIL_OPTIONS,
+}
+
+def loader_options(schema: Type) -> Tuple[LoaderOption, ...]:
+    """
+    Опции загрузки связей, которые сериализует схема ответа
+    """
+    return _SCHEMA_OPTIONS[schema]
+
+def reload_for_schema(db: Session, instance, schema: Type):
+    """
+    Перечитывание объекта после commit вместе со связями схемы ответа
+    (вместо db.refresh и ленивой загрузки каждой связи при сериализации)
+    """
+    mapper = inspect(instance).mapper
+    primary_key = inspect(instance).identity
+    query = select(mapper.class_).options(*loader_options(schema)).execution_options(populate_existing=True)
+    for column, value in zip(mapper.primary_key, primary_key):
+        query = query.where(column == value)
+    return db.execute(query).unique().scalar_one()
@@ -0,0 +1,94 @@
+"""
+Неблокирующий конвейер логирования.
+
+Логгеры приложения пишут только в очередь (QueueHandler), а запись в файл и консоль
+выполняет QueueListener в отдельном потоке. Медленный диск не задерживает event loop.
+В файл пишутся структурированные JSON-строки, в консоль - обычный текст.
+"""
+
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Optional
+
+# Стандартные атрибуты LogRecord; все остальные попали в запись через extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирование записи лога в одну JSON-строку с полями из extra
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в потоке приложения:
+    форматирование выполняется обработчиками в потоке слушателя
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы и исключение сводятся к строкам сразу, чтобы запись
+        # не держала ссылки на изменяемые объекты запроса
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging(logs_dir: Path, level: int = logging.INFO, console=None) -> QueueListener:
+    """
+    Настройка корневого логгера на запись через очередь.
+    Повторный вызов возвращает уже запущенного слушателя.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    logs_dir.mkdir(exist_ok=True)
+
+    # Логи в файл - JSON-строки
+    file_handler = logging.FileHandler(logs_dir / "tradehub.log", encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+
+    # Логи в консоль
+    console_handler = logging.StreamHandler(console or sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [NonBlockingQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """
+    Запись оставшихся в очереди сообщений и остановка потока слушателя
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,115 @@
+"""
+Пакетная запись сообщений чата.
+
+WebSocket-подключения не держат собственную сессию БД: сообщения из всех сокетов
+процесса собираются в очередь и раз в несколько миллисекунд записываются одним
+INSERT ... RETURNING. Число занятых соединений пула не зависит от числа
+подключенных пользователей.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.database import async_engine
+from app.models.chat import Message
+
+logger = logging.getLogger(__name__)
+
+class MessageWriter:
+    """
+    Объединение вставок сообщений из многих сокетов в пакетные INSERT
+    """
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_interval: float = settings.CHAT_WRITE_BATCH_INTERVAL_MS / 1000,
+        max_batch_size: int = settings.CHAT_WRITE_BATCH_SIZE
+    ):
+        self.engine = engine
+        self.batch_interval = batch_interval
+        self.max_batch_size = max_batch_size
+        self.batches_written = 0
+        self.messages_written = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self):
+        """
+        Запуск фоновой задачи записи в текущем event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def write(self, chat_id: int, sender_id: int, content: str) -> dict:
+        """
+        Сохранение сообщения. Возвращает сохраненную строку
+        (id, chat_id, sender_id, content, is_read, created_at)
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait(({"chat_id": chat_id, "sender_id": sender_id, "content": content}, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            # Ждем первое сообщение и даем остальным сокетам время присоединиться к пакету
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_interval
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        """
+        Запись пакета одним INSERT ... RETURNING
+        """
+        stmt = insert(Message).returning(
+            Message.id,
+            Message.chat_id,
+            Message.sender_id,
+            Message.content,
+            Message.is_read,
+            Message.created_at,
+            sort_by_parameter_order=True
+        )
+        try:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(stmt, [values for values, _ in batch])
+                rows = [dict(row._mapping) for row in result]
+        except Exception as e:
+            logger.error(f"Ошибка при записи пакета из {len(batch)} сообщений: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_written += 1
+        self.messages_written += len(rows)
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result(row)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches_written,
+            "messages": self.messages_written,
+            "pending": self._queue.qsize() if self._queue is not None else 0
+        }
+
+# Писатель сообщений процесса
+message_writer = MessageWriter(async_engine)
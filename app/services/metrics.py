@@ -0,0 +1,198 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Экспортируются через /metrics: гистограммы времени запросов по шаблонам маршрутов,
+число обрабатываемых запросов, пул соединений SQLAlchemy (выдачи, переполнение,
+ожидание соединения), время команд Redis, число WebSocket-подключений и время
+выполнения задач Celery.
+
+При нескольких процессах (воркеры uvicorn/gunicorn, процессы Celery) нужно задать
+переменную окружения PROMETHEUS_MULTIPROC_DIR - общий каталог, в котором каждый
+процесс хранит свои значения в mmap-файлах. /metrics в любом процессе отдает сумму
+по всем процессам. Каталог должен существовать и очищаться перед запуском приложения.
+"""
+
+import os
+import threading
+import time
+from functools import wraps
+from typing import Optional
+
+# Настройки загружают .env до импорта prometheus_client: режим нескольких процессов
+# выбирается библиотекой по PROMETHEUS_MULTIPROC_DIR при импорте
+from app.config import settings
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MULTIPROCESS = bool(settings.PROMETHEUS_MULTIPROC_DIR)
+
+# Маршрут для запросов, не попавших ни в один шаблон (404, статика)
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Число обрабатываемых HTTP-запросов",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts",
+    "Число выдач соединений из пула SQLAlchemy",
+    ["engine"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Число выданных соединений пула SQLAlchemy",
+    ["engine"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Число соединений сверх pool_size",
+    ["engine"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Время получения соединения из пула (включая открытие нового соединения)",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Время выполнения команды Redis",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections",
+    "Число активных WebSocket-подключений чата",
+    multiprocess_mode="livesum"
+)
+
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Время выполнения задачи Celery",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+)
+
+def route_label(scope) -> str:
+    """
+    Шаблон маршрута запроса (/products/{product_id}), а не фактический путь,
+    чтобы число рядов метрики не зависело от числа объектов
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+def _instrument_pool(pool, name: str):
+    # У SQLAlchemy нет события перед ожиданием соединения, поэтому время
+    # измеряется оберткой вокруг получения соединения из очереди пула
+    do_get = pool._do_get
+
+    @wraps(do_get)
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_WAIT.labels(name).observe(time.perf_counter() - started)
+
+    pool._do_get = timed_do_get
+
+def instrument_engine(engine: Engine, name: str):
+    """
+    Подключение метрик пула соединений движка
+    """
+    # Событие checkin вызывается до возврата соединения в пул, поэтому число
+    # выданных соединений считается по событиям, а не берется из пула.
+    # События приходят из разных потоков: счетчик и метрики меняются под блокировкой
+    checked_out = 0
+    lock = threading.Lock()
+
+    def update_gauges():
+        DB_POOL_CHECKED_OUT.labels(name).set(checked_out)
+        pool_size = engine.pool.size() if hasattr(engine.pool, "size") else checked_out
+        DB_POOL_OVERFLOW.labels(name).set(max(checked_out - pool_size, 0))
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        nonlocal checked_out
+        with lock:
+            checked_out += 1
+            update_gauges()
+        DB_POOL_CHECKOUTS.labels(name).inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        nonlocal checked_out
+        with lock:
+            checked_out = max(checked_out - 1, 0)
+            update_gauges()
+
+    # dispose() заменяет пул движка новым, обертку нужно повторить
+    @event.listens_for(engine, "engine_disposed")
+    def on_disposed(engine):
+        _instrument_pool(engine.pool, name)
+
+    _instrument_pool(engine.pool, name)
+
+def instrument_redis(client):
+    """
+    Измерение времени команд клиента Redis.
+    Заглушка Redis (без execute_command) остается как есть.
+    """
+    execute_command = getattr(client, "execute_command", None)
+    if execute_command is None:
+        return client
+
+    @wraps(execute_command)
+    def timed_execute_command(*args, **options):
+        started = time.perf_counter()
+        try:
+            return execute_command(*args, **options)
+        finally:
+            command = args[0] if args else "UNKNOWN"
+            if isinstance(command, bytes):
+                command = command.decode()
+            REDIS_COMMAND_DURATION.labels(str(command).upper()).observe(time.perf_counter() - started)
+
+    client.execute_command = timed_execute_command
+    return client
+
+def render_metrics() -> bytes:
+    """
+    Текст метрик для /metrics (сумма по всем процессам в режиме нескольких процессов)
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead(pid: Optional[int] = None):
+    """
+    Удаление значений livesum-метрик завершившегося процесса
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,59 @@
+"""
+Курсорная (keyset) пагинация по паре (created_at, id).
+
+В отличие от offset/limit, стоимость запроса не зависит от номера страницы,
+а вставка новых записей между запросами не сдвигает выдачу.
+Курсор непрозрачен для клиента: это base64 от JSON с ключом последней записи страницы.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Кодирование ключа записи в курсор
+    """
+    payload = json.dumps([created_at.isoformat(), id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Декодирование курсора в ключ записи
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+
+def apply_keyset_pagination(query, model, cursor: Optional[str], limit: int):
+    """
+    Сортировка от новых к старым и выборка страницы после курсора.
+    Пустой курсор означает первую страницу. Запрашивается на одну запись больше,
+    чтобы понять, есть ли следующая страница.
+    """
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(created_at, id))
+    return query.limit(limit + 1)
+
+def paginate_results(items: List[Any], limit: int) -> dict:
+    """
+    Формирование страницы и курсора следующей страницы
+    """
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,117 @@
+"""
+Хеширование и проверка паролей в отдельном пуле потоков.
+
+bcrypt занимает десятки и сотни миллисекунд процессора на каждый вызов. Внутри
+async-обработчиков он останавливал event loop, и всплеск входов задерживал все
+остальные запросы процесса. Теперь вызовы выполняются в ограниченном пуле потоков
+(bcrypt освобождает GIL), а event loop только ждет результат.
+
+Число ожидающих задач ограничено: когда пул занят и очередь заполнена, новый вызов
+сразу получает 503 с Retry-After вместо того, чтобы копить задержку для всех.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class PasswordHasher:
+    """
+    CryptContext с выполнением в ограниченном пуле потоков
+    """
+    def __init__(
+        self,
+        context: CryptContext,
+        max_workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_queue: int = settings.PASSWORD_HASH_QUEUE_SIZE
+    ):
+        self.context = context
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Пул создается при первом вызове (скрипты и тесты без входа его не запускают)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        """
+        Число выполняющихся и ожидающих вызовов
+        """
+        return self._pending
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                overloaded = True
+            else:
+                self._pending += 1
+                overloaded = False
+        if overloaded:
+            # При перегрузке отказов много - в лог попадает только часть
+            if self.rejected % 100 == 1:
+                logger.warning(f"Пул хеширования паролей перегружен: {self._pending} задач в работе, отклонено {self.rejected}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"}
+            )
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Задача освобождает место по завершении, а не когда ожидающий запрос
+        # прерван: отмененный запрос не останавливает уже начатый вызов bcrypt
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверка пароля; при устаревших параметрах хеша (например, другой стоимости bcrypt)
+        вторым значением возвращается новый хеш
+        """
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,119 @@
+"""
+Учет SQL-запросов для разработки и тестов.
+
+Слушатели событий SQLAlchemy считают число и время запросов всех движков
+(синхронного, асинхронного и тестовых) и записывают их в статистику текущего
+запроса (contextvar) и в активные перехваты capture_queries(). Повторяющиеся
+запросы одной формы (одинаковый SQL с разными параметрами) помечаются как N+1 -
+признак ленивой загрузки связей в цикле.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+# Списки параметров IN (?, ?, ?) сворачиваются в один, чтобы запросы
+# с разным числом значений считались одной формой
+_PARAMETER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """
+    Форма запроса: SQL без различий в пробелах и длине списков параметров
+    """
+    return _PARAMETER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+class QueryStats:
+    """
+    Число, суммарное время и формы выполненных запросов
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.shapes[statement_shape(statement)] += 1
+
+    def n_plus_one(self, threshold: int = settings.SQL_N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """
+        Формы SELECT-запросов, выполненных не меньше threshold раз
+        """
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= threshold and shape.upper().startswith("SELECT")
+        ]
+
+    def report(self, limit: int = 5) -> str:
+        lines = [f"{self.count} запросов за {self.duration * 1000:.1f} мс"]
+        for shape, count in self.shapes.most_common(limit):
+            lines.append(f"  {count} x {shape[:200]}")
+        return "\n".join(lines)
+
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+# Перехваты capture_queries(): видят запросы из всех потоков (TestClient выполняет
+# приложение в отдельном потоке, куда contextvar теста не передается)
+_captures: List[QueryStats] = []
+
+def start_request_stats() -> QueryStats:
+    """
+    Начало учета запросов текущего HTTP-запроса (или задачи)
+    """
+    stats = QueryStats()
+    _request_stats.set(stats)
+    return stats
+
+@contextmanager
+def capture_queries():
+    """
+    Учет всех запросов, выполненных внутри блока
+    """
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = _request_stats.get()
+    if stats is None and not _captures:
+        return
+    duration = time.perf_counter() - started
+    if stats is not None:
+        stats.record(statement, duration)
+    for capture in list(_captures):
+        capture.record(statement, duration)
+
+def _handle_error(exception_context):
+    # Запрос с ошибкой не доходит до after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+def install_query_instrumentation():
+    """
+    Подключение слушателей ко всем движкам SQLAlchemy (повторный вызов ничего не делает)
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
@@ -0,0 +1,197 @@
+"""
+Ограничение частоты запросов (GCRA).
+
+Для каждого ключа хранится одно число - теоретическое время прихода следующего
+запроса (TAT). Лимит limit запросов за period секунд означает, что каждый запрос
+сдвигает TAT на period / limit, а запрос разрешен, пока TAT опережает текущее время
+не больше чем на period. Это скользящее окно без списка отметок времени: память на
+ключ постоянна, и запись сама истекает, когда ограничение перестает действовать.
+
+Состояние хранится в Redis и меняется Lua-скриптом атомарно, поэтому лимит общий
+для всех процессов приложения. Без Redis (заглушка или ошибка соединения)
+используется состояние процесса в LRU ограниченного размера.
+
+Ключи составляются из имени ограничения и субъекта: IP-адреса клиента или учетной
+записи. Для маршрутов ограничение подключается зависимостью:
+
+    @router.post("/reviews", dependencies=[Depends(RateLimit("reviews", limit=10, period=60))])
+"""
+
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, Request, status
+
+from app.config import settings
+from app.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] - ключ, ARGV: интервал между запросами (мкс), допуск (мкс), стоимость, 1 - списать / 0 - только проверить.
+# Время берется с сервера Redis, чтобы часы процессов приложения не влияли на лимит.
+# Возвращает {разрешено, мкс до повтора, оставшийся запас}
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - tolerance
+if allow_at > now then
+    return {0, allow_at - now, math.floor((tolerance - (tat - now)) / interval)}
+end
+if ARGV[4] == '1' then
+    redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000))
+end
+return {1, 0, math.floor((tolerance - (new_tat - now)) / interval)}
+"""
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+class RateLimiter:
+    """
+    GCRA в Redis с запасным состоянием процесса
+    """
+    def __init__(self, redis, namespace: str = "ratelimit", local_size: int = settings.RATE_LIMIT_LOCAL_SIZE):
+        self.redis = redis
+        self.namespace = namespace
+        self.local_size = local_size
+        self._local: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Заглушка Redis не выполняет скрипты - сразу работаем в памяти процесса
+        self._script = redis.register_script(GCRA_SCRIPT) if hasattr(redis, "register_script") else None
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _shared(self, key: str, limit: int, period: float, cost: int, consume: bool) -> Optional[RateLimitResult]:
+        if self._script is None:
+            return None
+        interval = int(period * 1_000_000 / limit)
+        try:
+            allowed, retry_after, remaining = self._script(
+                keys=[self._key(key)],
+                args=[interval, int(period * 1_000_000), cost, 1 if consume else 0]
+            )
+        except Exception as e:
+            logger.warning(f"Ограничение частоты без Redis: {str(e)}")
+            return None
+        return RateLimitResult(bool(allowed), max(int(remaining), 0), int(retry_after) / 1_000_000)
+
+    def _local_check(self, key: str, limit: int, period: float, cost: int, consume: bool) -> RateLimitResult:
+        interval = period / limit
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._local.get(key, now), now)
+            new_tat = tat + interval * cost
+            allow_at = new_tat - period
+            if allow_at > now:
+                return RateLimitResult(False, max(math.floor((period - (tat - now)) / interval), 0), allow_at - now)
+            if consume:
+                self._local[key] = new_tat
+                self._local.move_to_end(key)
+                # Вытесняются давно не использованные ключи; у большинства из них
+                # ограничение уже истекло, и их состояние равно начальному
+                while len(self._local) > self.local_size:
+                    self._local.popitem(last=False)
+            return RateLimitResult(True, max(math.floor((period - (new_tat - now)) / interval), 0), 0.0)
+
+    def hit(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitResult:
+        """
+        Учет запроса: списывает cost, если лимит не исчерпан
+        """
+        result = self._shared(key, limit, period, cost, consume=True)
+        return result if result is not None else self._local_check(key, limit, period, cost, consume=True)
+
+    def peek(self, key: str, limit: int, period: float) -> RateLimitResult:
+        """
+        Проверка, будет ли разрешен следующий запрос, без списания
+        """
+        result = self._shared(key, limit, period, 1, consume=False)
+        return result if result is not None else self._local_check(key, limit, period, 1, consume=False)
+
+    def reset(self, key: str):
+        """
+        Сброс ограничения ключа (например, после успешного входа)
+        """
+        with self._lock:
+            self._local.pop(key, None)
+        if self._script is not None:
+            try:
+                self.redis.delete(self._key(key))
+            except Exception as e:
+                logger.warning(f"Не удалось сбросить ограничение частоты {key}: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+rate_limiter = RateLimiter(redis_client)
+
+@lru_cache(maxsize=4)
+def _trusted_networks(spec: str):
+    return tuple(ipaddress.ip_network(network.strip(), strict=False) for network in spec.split(",") if network.strip())
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(settings.TRUSTED_PROXIES))
+
+def client_ip(request: Request) -> str:
+    """
+    IP-адрес клиента с учетом доверенных прокси (nginx, туннель).
+
+    Заголовкам X-Forwarded-For и X-Real-IP верим, только если соединение пришло от
+    доверенного прокси. nginx дописывает адрес в конец X-Forwarded-For к тому, что
+    прислал клиент, поэтому первые записи подделываются: клиентом считается
+    последний адрес справа, не принадлежащий доверенным прокси
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        for address in reversed([part.strip() for part in forwarded.split(",") if part.strip()]):
+            if not _is_trusted_proxy(address):
+                return address
+    return request.headers.get("x-real-ip") or peer
+
+def too_many_requests(result: RateLimitResult, detail: str = "Слишком много запросов. Пожалуйста, повторите попытку позже.") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(math.ceil(result.retry_after), 1))}
+    )
+
+class RateLimit:
+    """
+    Зависимость FastAPI: не больше limit запросов за period секунд с одного IP-адреса
+    """
+    def __init__(self, name: str, limit: int, period: float, limiter: Optional[RateLimiter] = None):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.limiter = limiter
+
+    async def __call__(self, request: Request):
+        limiter = self.limiter or rate_limiter
+        result = limiter.hit(f"{self.name}:ip:{client_ip(request)}", self.limit, self.period)
+        if not result.allowed:
+            logger.warning(f"Превышен лимит запросов {self.name} от {client_ip(request)}")
+            raise too_many_requests(result)
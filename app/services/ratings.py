@@ -0,0 +1,92 @@
+"""
+Агрегаты рейтингов продавцов и товаров.
+
+Сумма и количество оценок (а для товара еще и распределение по звездам) хранятся
+в строках users и products и обновляются атомарным UPDATE в транзакции создания
+отзыва, без пересчета всех отзывов продавца.
+"""
+
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.product import Product
+from app.models.order import Review
+
+RATING_SCORES = range(1, 6)
+
+def apply_review_rating(db: Session, review: Review):
+    """
+    Учет оценки нового отзыва в агрегатах продавца и товара (в текущей транзакции)
+    """
+    # В SET правые части вычисляются по значениям строки до обновления
+    db.execute(
+        update(User)
+        .where(User.id == review.seller_id)
+        .values(
+            rating_sum=User.rating_sum + review.rating,
+            rating_count=User.rating_count + 1,
+            seller_rating=(User.rating_sum + review.rating) * 1.0 / (User.rating_count + 1)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    histogram_column = getattr(Product, f"rating_{review.rating}")
+    db.execute(
+        update(Product)
+        .where(Product.id == review.product_id)
+        .values({
+            Product.rating_sum: Product.rating_sum + review.rating,
+            Product.rating_count: Product.rating_count + 1,
+            histogram_column: histogram_column + 1
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+def backfill_rating_aggregates(db: Session) -> dict:
+    """
+    Пересчет агрегатов по всем существующим отзывам.
+    Используется при добавлении колонок и для восстановления согласованности.
+    """
+    # Сброс агрегатов, чтобы у продавцов и товаров без отзывов остались нули
+    db.execute(update(User).values(rating_sum=0, rating_count=0, seller_rating=0.0).execution_options(synchronize_session=False))
+    db.execute(
+        update(Product)
+        .values({"rating_sum": 0, "rating_count": 0, **{f"rating_{score}": 0 for score in RATING_SCORES}})
+        .execution_options(synchronize_session=False)
+    )
+
+    sellers = db.execute(
+        select(Review.seller_id, func.sum(Review.rating), func.count(Review.id))
+        .group_by(Review.seller_id)
+    ).all()
+    for seller_id, rating_sum, rating_count in sellers:
+        db.execute(
+            update(User)
+            .where(User.id == seller_id)
+            .values(rating_sum=rating_sum, rating_count=rating_count, seller_rating=rating_sum / rating_count)
+            .execution_options(synchronize_session=False)
+        )
+
+    products = db.execute(
+        select(
+            Review.product_id,
+            func.sum(Review.rating),
+            func.count(Review.id),
+            *[func.sum(case((Review.rating == score, 1), else_=literal(0))) for score in RATING_SCORES]
+        )
+        .group_by(Review.product_id)
+    ).all()
+    for product_id, rating_sum, rating_count, *histogram in products:
+        db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values({
+                "rating_sum": rating_sum,
+                "rating_count": rating_count,
+                **{f"rating_{score}": count for score, count in zip(RATING_SCORES, histogram)}
+            })
+            .execution_options(synchronize_session=False)
+        )
+
+    return {"sellers": len(sellers), "products": len(products)}
@@ -0,0 +1,298 @@
+"""
+Кэш готовых JSON-ответов публичных эндпоинтов каталога.
+
+Ответ хранится уже сериализованным (байты JSON) в Redis и в локальном LRU процесса
+перед ним. Ключ строится по пути и отсортированным параметрам запроса и включает
+номер версии пространства имен: изменение данных каталога увеличивает версию
+(INCR в Redis), и все старые записи перестают находиться, не требуя удаления.
+Версия перечитывается из Redis не чаще раза в version_check_interval секунд.
+
+Одновременные промахи по одному ключу не нагружают базу: внутри процесса ответ
+загружает один запрос, остальные ждут его результат, а между процессами запись
+заполняет процесс, захвативший блокировку SET NX в Redis.
+
+Клиент Redis синхронный, поэтому обращения к нему из respond и current_version
+выполняются в потоках через anyio и не блокируют event loop, даже когда Redis
+отвечает медленно.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import anyio
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+from app.config import settings
+from app.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Двухуровневый кэш (локальный LRU + Redis) сериализованных ответов с инвалидацией по версии
+    """
+    def __init__(
+        self,
+        namespace: str,
+        redis,
+        ttl: int = settings.CATALOG_CACHE_TTL,
+        local_size: int = settings.CATALOG_CACHE_LOCAL_SIZE,
+        version_check_interval: float = settings.CATALOG_CACHE_VERSION_CHECK_INTERVAL,
+        lock_timeout: float = 5.0
+    ):
+        self.namespace = namespace
+        self.redis = redis
+        self.ttl = ttl
+        self.local_size = local_size
+        self.version_check_interval = version_check_interval
+        self.lock_timeout = lock_timeout
+        self._local: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._version = 0
+        self._version_checked = float("-inf")
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def _shared(self) -> bool:
+        # Заглушка Redis (без INCR) - кэш работает только в пределах процесса
+        return hasattr(self.redis, "incr")
+
+    @property
+    def version_key(self) -> str:
+        return f"cache:{self.namespace}:version"
+
+    async def current_version(self) -> int:
+        """
+        Текущая версия пространства имен (из Redis не чаще раза в version_check_interval)
+        """
+        now = time.monotonic()
+        if self._shared and now - self._version_checked >= self.version_check_interval:
+            # Отметка ставится до чтения: пока версия читается, остальные
+            # запросы используют прежнюю, а не читают ее одновременно
+            self._version_checked = now
+            try:
+                self._version = int(await anyio.to_thread.run_sync(self.redis.get, self.version_key) or 0)
+            except Exception as e:
+                logger.warning(f"Не удалось получить версию кэша {self.namespace}: {str(e)}")
+        return self._version
+
+    def bump(self):
+        """
+        Инвалидация всех записей пространства имен
+        """
+        with self._lock:
+            self._local.clear()
+        if self._shared:
+            try:
+                self._version = int(self.redis.incr(self.version_key))
+                self._version_checked = time.monotonic()
+                return
+            except Exception as e:
+                logger.error(f"Ошибка при инвалидации кэша {self.namespace}: {str(e)}")
+        self._version += 1
+
+    async def make_key(self, request: Request, variant: str = "") -> str:
+        """
+        Ключ записи: версия, путь, отсортированные параметры запроса
+        и дополнительный признак версии данных (например, ETag)
+        """
+        query = urlencode(sorted(request.query_params.multi_items()))
+        digest = hashlib.sha1(f"{request.url.path}?{query}#{variant}".encode()).hexdigest()
+        return f"cache:{self.namespace}:v{await self.current_version()}:{digest}"
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, body = entry
+            if time.monotonic() >= expires_at:
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return body
+
+    def _set_local(self, key: str, body: bytes):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, body)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    async def _get_shared(self, key: str) -> Optional[bytes]:
+        if not self._shared:
+            return None
+        try:
+            return await anyio.to_thread.run_sync(self.redis.get, key)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша {self.namespace}: {str(e)}")
+            return None
+
+    async def _store(self, key: str, body: bytes):
+        self._set_local(key, body)
+        if self._shared:
+            try:
+                await anyio.to_thread.run_sync(partial(self.redis.set, key, body, ex=self.ttl))
+            except Exception as e:
+                logger.warning(f"Ошибка записи кэша {self.namespace}: {str(e)}")
+
+    async def _lookup(self, key: str) -> Optional[bytes]:
+        body = self._get_local(key)
+        if body is not None:
+            self.local_hits += 1
+            return body
+        body = await self._get_shared(key)
+        if body is not None:
+            self.redis_hits += 1
+            self._set_local(key, body)
+        return body
+
+    async def _acquire_fill_lock(self, key: str) -> bool:
+        if not self._shared:
+            return True
+        try:
+            return bool(await anyio.to_thread.run_sync(
+                partial(self.redis.set, f"{key}:lock", b"1", nx=True, px=int(self.lock_timeout * 1000))
+            ))
+        except Exception:
+            return True
+
+    async def _release_fill_lock(self, key: str):
+        if self._shared:
+            try:
+                await anyio.to_thread.run_sync(self.redis.delete, f"{key}:lock")
+            except Exception:
+                pass
+
+    async def _wait_for_fill(self, key: str) -> Optional[bytes]:
+        # Запись заполняет другой процесс - ждем ее появления в Redis
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            body = await self._get_shared(key)
+            if body is not None:
+                self._set_local(key, body)
+                return body
+        return None
+
+    @staticmethod
+    def serialize(schema: Any, data: Any) -> bytes:
+        """
+        Сериализация как у FastAPI: проверка схемой ответа и JSON без пробелов
+        """
+        content = jsonable_encoder(parse_obj_as(schema, data))
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    async def _fill(
+        self,
+        key: str,
+        schema: Any,
+        load: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]]
+    ) -> Tuple[bytes, bool]:
+        """
+        Загрузка ответа при промахе. Возвращает тело и признак того, что оно сохранено в кэше
+        """
+        locked = await self._acquire_fill_lock(key)
+        try:
+            if not locked:
+                body = await self._wait_for_fill(key)
+                if body is not None:
+                    self.coalesced += 1
+                    return body, True
+            self.misses += 1
+            data = await load()
+            body = self.serialize(schema, data)
+            if cacheable is not None and not cacheable(data):
+                return body, False
+            await self._store(key, body)
+            return body, True
+        finally:
+            if locked:
+                await self._release_fill_lock(key)
+
+    async def respond(
+        self,
+        request: Request,
+        schema: Any,
+        load: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+        variant: str = ""
+    ) -> Response:
+        """
+        Ответ из кэша или загрузка через load() с сохранением в кэш.
+        cacheable позволяет не кэшировать отдельные ответы (например, скрытые товары),
+        variant - добавить к ключу версию данных, известную до загрузки
+        """
+        key = await self.make_key(request, variant)
+        body = await self._lookup(key)
+        if body is not None:
+            return self._response(body, "HIT")
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # Этот ключ уже загружается другим запросом процесса
+            body = await asyncio.shield(future)
+            if body is not None:
+                self.coalesced += 1
+                return self._response(body, "HIT")
+            body, _ = await self._fill(key, schema, load, lambda data: False)
+            return self._response(body, "MISS")
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        shared_body = None
+        try:
+            body, stored = await self._fill(key, schema, load, cacheable)
+            if stored:
+                shared_body = body
+        finally:
+            del self._inflight[key]
+            future.set_result(shared_body)
+        return self._response(body, "MISS")
+
+    @staticmethod
+    def _response(body: bytes, status: str) -> Response:
+        return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+
+    def clear(self):
+        """
+        Очистка локального уровня и счетчиков
+        """
+        with self._lock:
+            self._local.clear()
+        self._version_checked = float("-inf")
+        self.local_hits = self.redis_hits = self.misses = self.coalesced = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._local),
+            "version": self._version
+        }
+
+# Кэш публичного каталога: категории, списки и карточки товаров
+catalog_cache = ResponseCache("catalog", redis_client)
+
+def invalidate_catalog():
+    """
+    Сброс кэша каталога после изменения товаров или категорий
+    """
+    catalog_cache.bump()
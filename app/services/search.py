@@ -0,0 +1,86 @@
+"""
+Полнотекстовый поиск по каталогу товаров.
+
+PostgreSQL: генерируемая колонка products.search_vector (tsvector) с GIN-индексом,
+ранжирование через ts_rank_cd.
+SQLite: теневая таблица FTS5 products_fts, которая синхронизируется триггерами,
+ранжирование через bm25.
+
+Индекс обновляется самой базой данных при создании, изменении и модерации товаров,
+поэтому роутерам не нужно поддерживать его вручную. Фильтрация по статусу
+выполняется основным запросом.
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import func, or_, false, select, table, column, literal_column
+
+from app.config import settings
+from app.models.product import Product
+
+# Колонка tsvector существует только в PostgreSQL и не описана в модели
+search_vector = literal_column("products.search_vector")
+
+# Теневая таблица FTS5 для SQLite
+products_fts = table("products_fts", column("rowid"))
+
+def tokenize_search_query(search: str) -> List[str]:
+    """
+    Разбивает поисковую строку на слова, отбрасывая спецсимволы синтаксиса поиска
+    """
+    return re.findall(r"\w+", search.lower())
+
+def build_fts5_query(search: str) -> str:
+    """
+    Формирует безопасный запрос FTS5: каждое слово в кавычках с поиском по префиксу,
+    все слова должны присутствовать в документе
+    """
+    return " ".join(f'"{token}"*' for token in tokenize_search_query(search))
+
+def apply_product_search(query, search: str, dialect_name: str, ranked: bool = True):
+    """
+    Добавляет к запросу товаров полнотекстовый фильтр и сортировку по релевантности.
+    При ranked=False добавляется только фильтр (например, для курсорной пагинации,
+    где порядок задается ключом страницы). Работает как с select(), так и с Query.
+    """
+    if dialect_name == "postgresql":
+        ts_query = func.websearch_to_tsquery(settings.SEARCH_LANGUAGE, search)
+        query = query.where(search_vector.op("@@")(ts_query))
+        if not ranked:
+            return query
+        return query.order_by(
+            func.ts_rank_cd(search_vector, ts_query).desc(),
+            Product.id.desc()
+        )
+
+    if dialect_name == "sqlite":
+        fts_query = build_fts5_query(search)
+        if not fts_query:
+            # В запросе нет ни одного слова - искать нечего
+            return query.where(false())
+        matches = (
+            select(
+                products_fts.c.rowid.label("product_id"),
+                func.bm25(literal_column("products_fts")).label("rank")
+            )
+            .select_from(products_fts)
+            .where(literal_column("products_fts").op("MATCH")(fts_query))
+            .subquery()
+        )
+        query = query.join(matches, matches.c.product_id == Product.id)
+        if not ranked:
+            return query
+        return query.order_by(
+            matches.c.rank,
+            Product.id.desc()
+        )
+
+    # Для остальных СУБД - поиск подстроки без индекса
+    search_term = f"%{search}%"
+    return query.where(
+        or_(
+            Product.title.ilike(search_term),
+            Product.description.ilike(search_term)
+        )
+    )
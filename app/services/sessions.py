@@ -0,0 +1,219 @@
+"""
+Реестр сессий пользователей.
+
+При входе создается сессия с идентификатором sid, который попадает в JWT. В Redis
+хранятся данные сессии (устройство, IP-адрес, время входа) с временем жизни токена
+и множество сессий пользователя для страницы безопасности профиля. Завершение
+сессии удаляет ее запись, и токен с этим sid перестает приниматься.
+
+Проверка сессии нужна на каждый запрос, поэтому ее результат кэшируется в LRU
+процесса на SESSION_CHECK_INTERVAL секунд: завершение сессии в одном процессе
+действует в нем сразу, а в остальных - не позже чем через этот интервал.
+
+Токены без sid (выданные до появления реестра) принимаются до истечения срока.
+Без Redis (заглушка) реестр не ведется; при ошибке Redis используется последний
+известный результат проверки, а неизвестная сессия считается действующей, чтобы
+сбой Redis не разлогинивал всех пользователей.
+"""
+
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+def describe_device(user_agent: str) -> Tuple[str, str]:
+    """
+    Название устройства по User-Agent ("Chrome на Windows") и иконка Font Awesome
+    """
+    ua = user_agent or ""
+    browser = "Неизвестный браузер"
+    for marker, name in (("Edg/", "Edge"), ("OPR/", "Opera"), ("YaBrowser", "Яндекс Браузер"),
+                         ("Firefox/", "Firefox"), ("Chrome/", "Chrome"), ("Safari/", "Safari")):
+        if marker in ua:
+            browser = name
+            break
+    for marker, name, icon in (("iPhone", "iPhone", "mobile"), ("iPad", "iPad", "tablet"),
+                               ("Android", "Android", "mobile"), ("Windows", "Windows", "desktop"),
+                               ("Mac OS X", "Mac", "laptop"), ("Linux", "Linux", "desktop")):
+        if marker in ua:
+            return f"{browser} на {name}", icon
+    return browser, "desktop"
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class SessionStore:
+    """
+    Сессии в Redis с кэшем результатов проверки в памяти процесса
+    """
+    def __init__(
+        self,
+        redis,
+        ttl: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        check_interval: float = settings.SESSION_CHECK_INTERVAL,
+        cache_size: int = settings.SESSION_CACHE_SIZE
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        # Заглушка Redis не поддерживает хеши и множества - реестр не ведется
+        self.enabled = hasattr(redis, "pipeline")
+        self._checked: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _session_key(sid: str) -> str:
+        return f"session:{sid}"
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"user_sessions:{user_id}"
+
+    def _remember(self, sid: str, active: bool):
+        with self._lock:
+            self._checked[sid] = (time.monotonic(), active)
+            self._checked.move_to_end(sid)
+            while len(self._checked) > self.cache_size:
+                self._checked.popitem(last=False)
+
+    def create(self, user_id: int, ip: str, user_agent: str) -> Optional[str]:
+        """
+        Регистрация сессии при входе. Возвращает sid для токена или None без Redis
+        """
+        if not self.enabled:
+            return None
+        sid = secrets.token_urlsafe(16)
+        device, icon = describe_device(user_agent)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self._session_key(sid), mapping={
+                "user_id": user_id,
+                "device": device,
+                "device_icon": icon,
+                "ip": ip,
+                "created_at": datetime.utcnow().isoformat(),
+            })
+            pipe.expire(self._session_key(sid), self.ttl)
+            pipe.sadd(self._user_key(user_id), sid)
+            pipe.expire(self._user_key(user_id), self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось зарегистрировать сессию: {str(e)}")
+            return None
+        self._remember(sid, True)
+        return sid
+
+    def is_active(self, sid: Optional[str]) -> bool:
+        """
+        Проверка, что сессия не завершена и не истекла
+        """
+        if sid is None or not self.enabled:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            entry = self._checked.get(sid)
+            if entry is not None and now - entry[0] < self.check_interval:
+                self._checked.move_to_end(sid)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            active = bool(self.redis.exists(self._session_key(sid)))
+        except Exception as e:
+            logger.warning(f"Не удалось проверить сессию: {str(e)}")
+            return entry[1] if entry is not None else True
+        self._remember(sid, active)
+        return active
+
+    def list(self, user_id: int, current_sid: Optional[str] = None) -> List[Dict]:
+        """
+        Действующие сессии пользователя для страницы безопасности профиля
+        """
+        if not self.enabled:
+            return []
+        try:
+            sids = [_text(sid) for sid in self.redis.smembers(self._user_key(user_id))]
+            pipe = self.redis.pipeline()
+            for sid in sids:
+                pipe.hgetall(self._session_key(sid))
+            records = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось получить сессии пользователя {user_id}: {str(e)}")
+            return []
+
+        sessions, expired = [], []
+        for sid, record in zip(sids, records):
+            if not record:
+                expired.append(sid)
+                continue
+            record = {_text(key): _text(value) for key, value in record.items()}
+            sessions.append({
+                "id": sid,
+                "device": record.get("device", ""),
+                "device_icon": record.get("device_icon", "desktop"),
+                "ip": record.get("ip", ""),
+                "location": "Неизвестно",
+                "created_at": datetime.fromisoformat(record["created_at"]),
+                "is_current": sid == current_sid,
+            })
+        if expired:
+            # Истекшие сессии удаляются из множества пользователя при просмотре
+            try:
+                self.redis.srem(self._user_key(user_id), *expired)
+            except Exception:
+                pass
+        # Текущая сессия первой, остальные от новых к старым
+        return sorted(sessions, key=lambda session: (not session["is_current"], -session["created_at"].timestamp()))
+
+    def revoke(self, user_id: int, sid: str) -> bool:
+        """
+        Завершение сессии пользователя. False, если такой сессии у пользователя нет
+        """
+        if not self.enabled:
+            return False
+        try:
+            # Запись сессии удаляется, только если sid принадлежит пользователю
+            if not self.redis.srem(self._user_key(user_id), sid):
+                return False
+            self.redis.delete(self._session_key(sid))
+        except Exception as e:
+            logger.warning(f"Не удалось завершить сессию: {str(e)}")
+            return False
+        self._remember(sid, False)
+        return True
+
+    def revoke_all(self, user_id: int, except_sid: Optional[str] = None) -> int:
+        """
+        Завершение всех сессий пользователя, кроме except_sid. Возвращает число завершенных
+        """
+        if not self.enabled:
+            return 0
+        try:
+            sids = [_text(sid) for sid in self.redis.smembers(self._user_key(user_id)) if _text(sid) != except_sid]
+        except Exception as e:
+            logger.warning(f"Не удалось получить сессии пользователя {user_id}: {str(e)}")
+            return 0
+        return sum(self.revoke(user_id, sid) for sid in sids)
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._checked)}
+
+session_store = SessionStore(redis_client)
@@ -0,0 +1,80 @@
+"""
+Резервирование товаров при оформлении заказа.
+
+Товары заказа выбираются одним запросом (в PostgreSQL - с блокировкой строк
+SELECT ... FOR UPDATE в порядке id, чтобы параллельные заказы не взаимоблокировались),
+а остаток уменьшается атомарным условным UPDATE ... WHERE quantity >= :q.
+Параллельные покупатели не могут купить больше, чем есть на складе.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.order import OrderItem
+
+def reserve_products(db: Session, seller_id: int, items) -> Tuple[List[OrderItem], float]:
+    """
+    Проверка товаров заказа и списание остатков.
+    Возвращает элементы заказа и общую сумму. Изменения остаются в транзакции сессии
+    и фиксируются вместе с заказом.
+    """
+    # Одинаковые товары в нескольких строках заказа списываются одним обновлением
+    quantities: Dict[int, int] = defaultdict(int)
+    for item_data in items:
+        quantities[item_data.product_id] += item_data.quantity
+    product_ids = sorted(quantities)
+
+    query = select(Product).where(Product.id.in_(product_ids)).order_by(Product.id)
+    if db.bind.dialect.name == "postgresql":
+        query = query.with_for_update()
+    products = {product.id: product for product in db.execute(query).scalars()}
+
+    for product_id in product_ids:
+        product = products.get(product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Товар с ID {product_id} не найден"
+            )
+
+        # Проверка, что товар принадлежит указанному продавцу
+        if product.seller_id != seller_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Товар с ID {product_id} не принадлежит указанному продавцу"
+            )
+
+    # Атомарное списание остатков в порядке id. Условие в WHERE защищает от продажи
+    # сверх остатка и там, где блокировка строк недоступна (SQLite)
+    for product_id in product_ids:
+        result = db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.quantity >= quantities[product_id])
+            .values(quantity=Product.quantity - quantities[product_id])
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Недостаточное количество товара с ID {product_id}"
+            )
+
+    # Элементы заказа по строкам с ценой на момент заказа
+    order_items = []
+    total_amount = 0
+    for item_data in items:
+        product = products[item_data.product_id]
+        order_items.append(OrderItem(
+            product_id=product.id,
+            quantity=item_data.quantity,
+            price=product.price
+        ))
+        total_amount += product.price * item_data.quantity
+
+    return order_items, total_amount
@@ -0,0 +1,74 @@
+"""
+Кэш проверенных JWT токенов доступа.
+
+Проверка подписи и разбор токена выполняются на каждый запрос, хотя один и тот же
+токен приходит многократно до истечения срока действия. Результат успешной проверки
+хранится в LRU ограниченного размера по SHA-256 от токена до момента exp из самого
+токена, поэтому истекший токен из кэша не возвращается. Недействительные токены и
+токены без exp не кэшируются.
+
+В кэше лежат только утверждения токена; активность и роль пользователя проверяются
+по записи пользователя (см. app.services.user_cache).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+class TokenCache:
+    """
+    LRU проверенных токенов: хеш токена -> (exp, утверждения)
+    """
+    def __init__(self, max_size: int = settings.TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        # Сам токен не хранится: по дампу памяти его нельзя будет использовать
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                exp, claims = entry
+                if time.time() < exp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, token: str, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (float(exp), claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+# Общий кэш токенов процесса
+token_cache = TokenCache()
@@ -0,0 +1,109 @@
+"""
+Сохранение загруженных изображений.
+
+Файл копируется из UploadFile частями по UPLOAD_CHUNK_SIZE во временный файл
+media/uploads/temp, поэтому в памяти процесса одновременно находится не больше
+одной части, а копирование прерывается, как только превышен MAX_UPLOAD_SIZE.
+Тип изображения определяется по сигнатуре в начале файла, а не по content_type
+и расширению от клиента; расширение сохраненного файла соответствует найденному
+типу. Готовый файл переносится на место одной операцией os.replace (временный
+каталог находится в той же файловой системе), так что по ссылке из базы никогда
+не окажется недописанный файл.
+
+Запись и перенос файлов выполняются в потоках через anyio и не блокируют event loop.
+"""
+
+import logging
+import os
+from typing import Optional
+from uuid import uuid4
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Сигнатуры поддерживаемых форматов: (смещение, байты, расширение)
+IMAGE_SIGNATURES = (
+    (0, b"\xff\xd8\xff", ".jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", ".png"),
+    (0, b"GIF87a", ".gif"),
+    (0, b"GIF89a", ".gif"),
+    (8, b"WEBP", ".webp"),  # RIFF-контейнер, см. проверку ниже
+)
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    Расширение изображения по первым байтам файла или None для других форматов
+    """
+    for offset, signature, extension in IMAGE_SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            if extension == ".webp" and not header.startswith(b"RIFF"):
+                continue
+            return extension
+    return None
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Размер файла превышает максимально допустимый ({max_size / 1024 / 1024:.1f} МБ)"
+    )
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Не удалось удалить файл {path}: {str(e)}")
+
+async def save_image_upload(file: UploadFile, subdir: str, max_size: int = settings.MAX_UPLOAD_SIZE) -> str:
+    """
+    Сохранение изображения в UPLOAD_DIR/<subdir>. Возвращает путь относительно UPLOAD_DIR.
+
+    413 - файл больше max_size, 415 - файл не является изображением поддерживаемого формата
+    """
+    # Размер известен, если multipart-парсер уже принял файл целиком
+    if file.size is not None and file.size > max_size:
+        raise _too_large(max_size)
+
+    header = await file.read(settings.UPLOAD_CHUNK_SIZE)
+    extension = sniff_image_type(header)
+    if extension is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Файл должен быть изображением (JPEG, PNG, GIF или WebP)"
+        )
+
+    temp_dir = os.path.join(settings.UPLOAD_DIR, "temp")
+    target_dir = os.path.join(settings.UPLOAD_DIR, subdir)
+    await anyio.Path(temp_dir).mkdir(parents=True, exist_ok=True)
+    await anyio.Path(target_dir).mkdir(parents=True, exist_ok=True)
+
+    filename = f"{uuid4()}{extension}"
+    temp_path = os.path.join(temp_dir, f"{filename}.part")
+    try:
+        size = 0
+        async with await anyio.open_file(temp_path, "wb") as buffer:
+            chunk = header
+            while chunk:
+                size += len(chunk)
+                if size > max_size:
+                    raise _too_large(max_size)
+                await buffer.write(chunk)
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        await anyio.to_thread.run_sync(os.replace, temp_path, os.path.join(target_dir, filename))
+    except BaseException:
+        await anyio.to_thread.run_sync(_remove_quietly, temp_path)
+        raise
+
+    return os.path.join(subdir, filename)
+
+async def delete_upload(relative_path: Optional[str]):
+    """
+    Удаление ранее загруженного файла (например, старого аватара)
+    """
+    if relative_path:
+        await anyio.to_thread.run_sync(_remove_quietly, os.path.join(settings.UPLOAD_DIR, relative_path))
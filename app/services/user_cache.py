@@ -0,0 +1,152 @@
+"""
+Кэш пользователей с коротким временем жизни для определения текущего пользователя
+без обращения к базе данных на каждый запрос.
+
+Кэш свой у каждого процесса. Чтобы деактивация или смена роли действовали во всех
+процессах, invalidate увеличивает версию кэша в Redis (INCR), а каждый процесс
+перечитывает ее не чаще раза в USER_CACHE_VERSION_CHECK_INTERVAL секунд и при
+изменении очищает свои записи целиком. Такие изменения редки, поэтому полная
+очистка дешевле учета инвалидаций по отдельным пользователям.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal, redis_client
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """
+    Кэш записей пользователей по ID с ограничением времени жизни.
+    Хранит отсоединенные от сессии объекты User, поэтому через них доступны
+    только колонки, но не ленивые связи.
+    """
+
+    VERSION_KEY = "user_cache:version"
+
+    def __init__(
+        self,
+        ttl: int,
+        max_size: int = 10000,
+        redis=None,
+        version_check_interval: float = settings.USER_CACHE_VERSION_CHECK_INTERVAL
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.redis = redis
+        self.version_check_interval = version_check_interval
+        self._entries: Dict[int, Tuple[float, User]] = {}
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._version_checked = float("-inf")
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _shared(self) -> bool:
+        # Заглушка Redis (без INCR) - инвалидация только в пределах процесса
+        return hasattr(self.redis, "incr")
+
+    def _check_version(self) -> None:
+        """
+        Очистка записей, если другой процесс изменил версию кэша
+        """
+        now = time.monotonic()
+        if not self._shared or now - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = now
+        try:
+            version = int(self.redis.get(self.VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Не удалось получить версию кэша пользователей: {str(e)}")
+            return
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def get(self, user_id: int) -> Optional[User]:
+        """
+        Получение пользователя из кэша, если запись еще не устарела
+        """
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, user = entry
+                if time.monotonic() < expires_at:
+                    self.hits += 1
+                    return user
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user: User) -> None:
+        """
+        Сохранение пользователя в кэш
+        """
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Освобождаем место: удаляем самую старую запись
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Удаление пользователя из кэша этого процесса и из кэшей остальных процессов
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self._shared:
+            try:
+                self.redis.incr(self.VERSION_KEY)
+            except Exception as e:
+                logger.error(f"Ошибка при инвалидации кэша пользователей: {str(e)}")
+
+    def clear(self) -> None:
+        """
+        Полная очистка кэша и счетчиков
+        """
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._version_checked = float("-inf")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики попаданий и промахов для оценки сэкономленных запросов к БД
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+# Общий кэш пользователей процесса
+user_cache = UserCache(ttl=settings.USER_CACHE_TTL, redis=redis_client)
+
+def get_user_by_id_cached(user_id: int) -> Optional[User]:
+    """
+    Получение пользователя по ID: из кэша или из базы данных.
+    Сессия БД открывается только при промахе и сразу закрывается.
+    """
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        if user is not None:
+            # Отсоединяем объект, чтобы безопасно использовать его после закрытия сессии
+            db.expunge(user)
+    finally:
+        db.close()
+
+    if user is not None:
+        user_cache.set(user)
+    return user
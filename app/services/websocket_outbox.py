@@ -0,0 +1,83 @@
+"""
+Очередь исходящих сообщений WebSocket-подключения.
+
+Рассылка только кладет сообщение в ограниченную очередь подключения, а отправкой
+занимается отдельная задача-писатель. Медленный или зависший клиент задерживает
+только свою очередь и не влияет на остальных участников чата.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+class ConnectionOutbox:
+    """
+    Ограниченная очередь исходящих сообщений и задача-писатель для одного подключения
+    """
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_size: int,
+        send_timeout: float,
+        on_failure: Callable[["ConnectionOutbox"], Awaitable[None]]
+    ):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.send_timeout = send_timeout
+        self.on_failure = on_failure
+        self.dropped = 0
+        self.closed = False
+        self._task = asyncio.create_task(self._writer())
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def enqueue(self, text: str) -> bool:
+        """
+        Постановка сообщения в очередь без ожидания.
+        Возвращает False, если очередь переполнена и сообщение отброшено.
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _writer(self):
+        """
+        Последовательная отправка сообщений из очереди
+        """
+        try:
+            while True:
+                text = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(text), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Клиент отключился или не принимает данные дольше таймаута
+            logger.info(f"Ошибка отправки в WebSocket, подключение закрывается: {type(e).__name__} {e}")
+            await self.on_failure(self)
+
+    async def close(self, code: Optional[int] = None):
+        """
+        Остановка писателя и, если указан код, закрытие сокета
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        if code is not None:
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code), self.send_timeout)
+            except Exception:
+                # Сокет уже закрыт клиентом или не отвечает
+                pass
@@ -1,7 +1,10 @@
 from celery import Celery
+from celery.signals import task_prerun, task_postrun, worker_process_shutdown
 from app.config import settings
+from app.services.metrics import CELERY_TASK_DURATION, mark_process_dead
 import logging
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
@@ -18,6 +21,23 @@ celery = Celery("tradehub")
 celery.conf.broker_url = settings.REDIS_URL
 celery.conf.result_backend = settings.REDIS_URL
 
+# Время начала выполняемых задач процесса для метрики длительности
+_task_started = {}
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    mark_process_dead(pid)
+
 # Задачи Celery
 @celery.task(name="send_email_notification")
 def send_email_notification(email, subject, message):
@@ -138,6 +158,20 @@ def periodic_cleanup():
         logger.error(f"Ошибка при выполнении периодической очистки: {str(e)}")
         return False
 
+@celery.task(name="refresh_dashboard_stats")
+def refresh_dashboard_stats():
+    """
+    Периодический пересчет снимка статистики панели администратора
+    """
+    from app.services.dashboard import refresh_dashboard_snapshot
+    
+    try:
+        refresh_dashboard_snapshot()
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении статистики дашборда: {str(e)}")
+        return False
+
 # Настройка периодических задач
 @celery.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
@@ -146,4 +180,11 @@ def setup_periodic_tasks(sender, **kwargs):
         86400.0,  # 24 часа = 86400 секунд
         periodic_cleanup.s(),
         name="daily_cleanup"
+    )
+    
+    # Обновление снимка статистики дашборда
+    sender.add_periodic_task(
+        float(settings.DASHBOARD_REFRESH_INTERVAL),
+        refresh_dashboard_stats.s(),
+        name="refresh_dashboard_stats"
     ) 
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Пересчет агрегатов рейтинга продавцов и товаров по всем отзывам.
+
+Запуск:
+    python backfill_ratings.py
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Получаем путь к корневой директории проекта
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# Импортируем необходимые модули
+import app.models  # noqa: F401 - регистрация всех моделей в метаданных
+from app.database import SessionLocal
+from app.services.ratings import backfill_rating_aggregates
+
+def main():
+    db = SessionLocal()
+    try:
+        result = backfill_rating_aggregates(db)
+        db.commit()
+        print(f"Агрегаты рейтинга пересчитаны: продавцов {result['sellers']}, товаров {result['products']}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при пересчете рейтингов: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
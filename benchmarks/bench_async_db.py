@@ -0,0 +1,186 @@
+"""
+Бенчмарк конкурентности под смешанной нагрузкой на чтение: синхронная сессия
+внутри async-обработчиков (как было раньше) против AsyncSession.
+
+Пока идут запросы к каталогу, параллельно измеряется задержка лёгкого эндпоинта /ping.
+Если запросы к БД блокируют event loop, задержка /ping растёт вместе с нагрузкой.
+
+Конкурентность держите ниже размера пула синхронного движка (5 + 10 overflow):
+при большем числе одновременных запросов синхронный вариант блокирует event loop
+в ожидании соединения из пула и зависает до pool_timeout (30 секунд).
+
+Запуск:
+    python benchmarks/bench_async_db.py --products 20000 --requests 400 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Отдельная база для бенчмарка, задается до импорта модулей приложения
+BENCH_DIR = tempfile.mkdtemp(prefix="tradehub-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(BENCH_DIR, 'bench.db')}"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import Base, engine, SessionLocal, get_db
+from app.models.user import User, UserRole
+from app.models.product import Product, Category, ProductImage, ProductStatus
+from app.schemas.product import Product as ProductSchema, ProductDetail, Category as CategorySchema
+from app.routers import products
+
+WORDS = ["ключ", "аккаунт", "скин", "подписка", "игра", "валюта", "буст", "предмет", "курс", "шаблон"]
+
+def seed(count: int) -> None:
+    """
+    Наполнение базы синтетическим каталогом
+    """
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seller = User(email="bench@example.com", username="bench", hashed_password="x", role=UserRole.SELLER.value)
+    categories = [Category(name=f"Категория {i}", slug=f"category-{i}") for i in range(20)]
+    db.add(seller)
+    db.add_all(categories)
+    db.flush()
+    for i in range(count):
+        title = " ".join(random.choices(WORDS, k=3))
+        product = Product(
+            title=f"{title} {i}",
+            description=f"Описание товара {i}: " + " ".join(random.choices(WORDS, k=20)),
+            price=random.randint(10, 10000),
+            status=ProductStatus.ACTIVE.value,
+            seller_id=seller.id,
+        )
+        product.categories = [random.choice(categories)]
+        product.images = [ProductImage(image_url=f"products/{i}.png", is_primary=True)]
+        db.add(product)
+        if i % 5000 == 0:
+            db.flush()
+    db.commit()
+    db.close()
+
+def build_sync_app() -> FastAPI:
+    """
+    Приложение с прежней реализацией: синхронная сессия в async-обработчиках
+    """
+    app = FastAPI()
+
+    @app.get("/products/categories", response_model=List[CategorySchema])
+    async def read_categories(db: Session = Depends(get_db)):
+        return db.query(Category).filter(Category.parent_id == None).limit(100).all()
+
+    @app.get("/products/", response_model=List[ProductSchema])
+    async def read_products(search: Optional[str] = None, limit: int = 20, db: Session = Depends(get_db)):
+        query = db.query(Product).filter(Product.status == ProductStatus.ACTIVE.value)
+        if search:
+            term = f"%{search}%"
+            query = query.filter(or_(Product.title.ilike(term), Product.description.ilike(term)))
+        return query.limit(limit).all()
+
+    @app.get("/products/{product_id}", response_model=ProductDetail)
+    async def read_product(product_id: int, db: Session = Depends(get_db)):
+        return db.query(Product).filter(Product.id == product_id).first()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+def build_async_app() -> FastAPI:
+    """
+    Приложение с роутером товаров на AsyncSession
+    """
+    app = FastAPI()
+    app.include_router(products.router, prefix="/products")
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+def mixed_read_paths(total: int, product_count: int) -> List[str]:
+    """
+    Смешанная нагрузка: поиск по каталогу, карточки товаров и категории
+    """
+    paths = []
+    for _ in range(total):
+        kind = random.random()
+        if kind < 0.4:
+            paths.append(f"/products/?search={random.choice(WORDS)}%20{random.randint(0, product_count)}&limit=20")
+        elif kind < 0.9:
+            paths.append(f"/products/{random.randint(1, product_count)}")
+        else:
+            paths.append("/products/categories")
+    return paths
+
+async def run(app: FastAPI, paths: List[str], concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    ping_latencies = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def load(path: str):
+            async with semaphore:
+                response = await client.get(path)
+                assert response.status_code in (200, 404), response.text
+
+        async def probe():
+            # Задержка считается от запланированного момента запроса, поэтому
+            # время, пока event loop занят чужим запросом к БД, тоже учитывается
+            while not done.is_set():
+                scheduled = time.perf_counter() + 0.005
+                await asyncio.sleep(0.005)
+                await client.get("/ping")
+                ping_latencies.append(time.perf_counter() - scheduled)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(load(path) for path in paths))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    ping_latencies.sort()
+    return {
+        "rps": len(paths) / elapsed,
+        "ping_p50_ms": statistics.median(ping_latencies) * 1000,
+        "ping_p99_ms": ping_latencies[int(len(ping_latencies) * 0.99) - 1] * 1000,
+        "ping_count": len(ping_latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"Наполнение каталога: {args.products} товаров ({BENCH_DIR})")
+    seed(args.products)
+    paths = mixed_read_paths(args.requests, args.products)
+
+    for name, app in (("sync Session", build_sync_app()), ("AsyncSession", build_async_app())):
+        result = asyncio.run(run(app, paths, args.concurrency))
+        print(
+            f"{name:>13}: {result['rps']:8.1f} req/s, "
+            f"/ping p50 {result['ping_p50_ms']:7.2f} мс, p99 {result['ping_p99_ms']:7.2f} мс "
+            f"({result['ping_count']} замеров)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Стоимость аутентификации запроса: прежняя схема (разбор и проверка подписи JWT
+на каждый запрос + поиск пользователя по имени) против кэша проверенных токенов
+и загрузки пользователя по первичному ключу.
+
+Отдельно измеряется get_cookie_user (HTML-страницы), где пользователь берется
+из кэша пользователей без обращения к базе.
+
+Запуск:
+    python benchmarks/bench_auth.py --users 10000 --requests 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - регистрация всех моделей в метаданных
+from app.config import settings
+from app.database import Base
+from app.models.user import User
+from app.security import create_access_token, get_cookie_user, get_user_by_claims, decode_access_token, get_user_by_username
+from app.services import user_cache as user_cache_module
+from app.services.token_cache import token_cache
+from app.services.user_cache import user_cache
+
+def legacy_auth(db, token: str) -> User:
+    """
+    Прежняя реализация get_current_user
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    return get_user_by_username(db, payload["sub"])
+
+def cached_auth(db, token: str) -> User:
+    return get_user_by_claims(db, decode_access_token(token))
+
+def measure(name: str, func, tokens, requests: int):
+    started = time.perf_counter()
+    for _ in range(requests):
+        func(random.choice(tokens))
+    elapsed = time.perf_counter() - started
+    print(f"{name:>46}: {elapsed / requests * 1_000_000:8.1f} мкс/запрос")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--active", type=int, default=1000, help="число пользователей, от которых идут запросы")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    path = os.path.join(tempfile.mkdtemp(prefix="tradehub-auth-"), "auth.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x", "role": "buyer"}
+            for i in range(1, args.users + 1)
+        ])
+    Session = sessionmaker(bind=engine)
+    user_cache_module.SessionLocal = Session
+
+    tokens = [
+        create_access_token({"sub": f"user{i}", "id": i, "role": "buyer"}, expires_delta=timedelta(minutes=30))
+        for i in random.sample(range(1, args.users + 1), min(args.active, args.users))
+    ]
+    print(f"{args.users} пользователей, {len(tokens)} активных токенов, {args.requests} запросов")
+
+    db = Session()
+    # Сессия закрывается после каждого запроса, как в get_db
+    def per_request(func):
+        def run(token):
+            func(db, token)
+            db.close()
+        return run
+
+    measure("JWT каждый раз + поиск по имени", per_request(legacy_auth), tokens, args.requests)
+    token_cache.clear()
+    measure("кэш токенов + первичный ключ", per_request(cached_auth), tokens, args.requests)
+    print(f"{'':>46}  кэш токенов: {token_cache.stats()}")
+
+    requests = [SimpleNamespace(cookies={"access_token": f"Bearer {token}"}) for token in tokens]
+    token_cache.clear()
+    user_cache.clear()
+    measure("get_cookie_user (кэши токенов и пользователей)", get_cookie_user, requests, args.requests)
+    db.close()
+
+if __name__ == "__main__":
+    main()
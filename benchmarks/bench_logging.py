@@ -0,0 +1,175 @@
+"""
+Бенчмарк накладных расходов логирования запросов.
+
+Сравнивает прежний log_requests (BaseHTTPMiddleware, разбор тела каждого POST,
+синхронный FileHandler в event loop) с ASGI-middleware и записью логов через
+QueueHandler/QueueListener. Для каждого варианта выводится среднее время запроса
+и накладные расходы относительно приложения без логирования.
+
+Запуск:
+    python benchmarks/bench_logging.py --requests 3000 --rounds 3
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request, UploadFile, File
+
+from app.middleware import RequestPipelineMiddleware
+from app.services.log_pipeline import setup_logging, stop_logging
+
+api_logger = logging.getLogger("api")
+error_logger = logging.getLogger("errors")
+
+async def legacy_log_requests(request: Request, call_next):
+    """
+    Прежний middleware из app/main.py
+    """
+    request_id = f"{datetime.now().timestamp()}-{id(request)}"
+    client_host = request.client.host if request.client else "unknown"
+    request_info = {
+        "request_id": request_id,
+        "client_ip": client_host,
+        "method": request.method,
+        "url": str(request.url),
+        "path": request.url.path,
+        "headers": dict(request.headers),
+        "timestamp": datetime.now().isoformat()
+    }
+    api_logger.info(f"Запрос {request_id}: {request.method} {request.url.path} от {client_host}")
+    if request.method == "POST":
+        try:
+            if request.headers.get("content-type", "").startswith("application/json"):
+                body = await request.json()
+                if "password" in body:
+                    body["password"] = "[СКРЫТО]"
+                request_info["body"] = body
+                api_logger.debug(f"Тело запроса: {json.dumps(body, ensure_ascii=False)}")
+            elif request.headers.get("content-type", "").startswith("multipart/form-data"):
+                form = await request.form()
+                form_dict = {k: "[FILE]" if hasattr(v, "filename") else v for k, v in form.items()}
+                request_info["form"] = form_dict
+                api_logger.debug(f"Форма запроса: {json.dumps(form_dict, ensure_ascii=False)}")
+        except Exception as e:
+            api_logger.error(f"Ошибка при логировании тела запроса: {str(e)}")
+    start_time = datetime.now()
+    response = await call_next(request)
+    process_time = (datetime.now() - start_time).total_seconds()
+    api_logger.info(
+        f"Ответ {request_id}: {response.status_code} для {request.method} {request.url.path} "
+        f"(выполнено за {process_time:.4f} сек)"
+    )
+    response.headers["X-Process-Time"] = str(process_time)
+    return response
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    if variant == "legacy":
+        app.middleware("http")(legacy_log_requests)
+    elif variant == "asgi":
+        app.add_middleware(RequestPipelineMiddleware)
+    return app
+
+def configure_logging(variant: str, logs_dir: Path, console):
+    stop_logging()
+    root = logging.getLogger()
+    if variant == "legacy":
+        handler = logging.FileHandler(logs_dir / "legacy.log")
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        console_handler = logging.StreamHandler(console)
+        root.handlers = [handler, console_handler]
+        root.setLevel(logging.DEBUG)
+    elif variant == "asgi":
+        setup_logging(logs_dir, logging.DEBUG, console=console)
+
+async def measure(app: FastAPI, requests: int, payload: dict, upload: bytes) -> dict:
+    """
+    Среднее время запроса в микросекундах по видам запросов
+    """
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        workloads = {
+            "GET": lambda: client.get("/ping"),
+            "POST JSON": lambda: client.post("/echo", json=payload),
+            "POST файл 1 МБ": lambda: client.post("/upload", files={"file": ("image.png", upload, "image/png")}),
+        }
+        for name, call in workloads.items():
+            count = requests if name != "POST файл 1 МБ" else max(requests // 10, 50)
+            try:
+                await asyncio.wait_for(call(), timeout=5)
+            except asyncio.TimeoutError:
+                # Тело уже прочитано в BaseHTTPMiddleware, и эндпоинт ждет его бесконечно
+                results[name] = None
+                continue
+            for _ in range(20):
+                await call()
+            timings = []
+            for _ in range(count):
+                started = time.perf_counter()
+                await call()
+                timings.append(time.perf_counter() - started)
+            results[name] = statistics.mean(timings) * 1_000_000
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    logs_dir = Path(tempfile.mkdtemp(prefix="tradehub-logging-"))
+    payload = {"title": "Товар", "description": "Описание " * 50, "password": "secret", "items": list(range(100))}
+    upload = os.urandom(1024 * 1024)
+
+    # Варианты чередуются по раундам, в зачет идет лучший раунд: так меньше влияние
+    # прогрева и фоновой нагрузки на машине
+    with open(os.devnull, "w") as console:
+        results = {}
+        for _ in range(args.rounds):
+            for variant in ("none", "legacy", "asgi"):
+                configure_logging(variant, logs_dir, console)
+                measured = asyncio.run(measure(build_app(variant), args.requests, payload, upload))
+                best = results.setdefault(variant, measured)
+                for workload, value in measured.items():
+                    if value is not None and value < best[workload]:
+                        best[workload] = value
+        stop_logging()
+
+    names = {"none": "без логирования", "legacy": "прежний log_requests", "asgi": "ASGI + очередь"}
+    for variant in ("legacy", "asgi"):
+        print(names[variant])
+        for workload, value in results[variant].items():
+            if value is None:
+                print(f"  {workload:>15}: запрос зависает (тело прочитано в middleware)")
+                continue
+            overhead = value - results["none"][workload]
+            print(f"  {workload:>15}: {value:9.1f} мкс/запрос, накладные расходы {overhead:8.1f} мкс")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Бенчмарк накладных расходов middleware на /health.
+
+Сравнивает прежнюю цепочку из трех @app.middleware("http") (log_requests,
+add_current_user_to_request, check_serveo_url - три слоя BaseHTTPMiddleware,
+запись файла URL туннеля на каждый запрос) с единым RequestPipelineMiddleware.
+Логирование в обоих вариантах одинаковое (очередь, вывод в /dev/null), так что
+разница - это стоимость самих слоев. Запросы через Serveo измеряются отдельно.
+
+Запуск:
+    python benchmarks/bench_middleware.py --requests 3000 --rounds 3
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+
+from app.middleware import RequestPipelineMiddleware
+from app.services.log_pipeline import setup_logging, stop_logging
+from bench_logging import legacy_log_requests
+
+logger = logging.getLogger("tradehub")
+
+def resolve_user(request: Request):
+    # В /health пользователь не разбирается, резолвер нужен только для полноты цепочки
+    return None
+
+def build_app(variant: str, logs_dir: Path) -> FastAPI:
+    app = FastAPI()
+    url_file = logs_dir / "serveo" / "current_url.txt"
+    url_file.parent.mkdir(parents=True, exist_ok=True)
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "ok", "time": datetime.now().isoformat()}
+
+    if variant == "legacy":
+        # Порядок регистрации как в прежнем app/main.py
+        async def add_current_user_to_request(request: Request, call_next):
+            current_user = None
+            if not request.url.path.startswith(("/static", "/media", "/health")) and \
+                    "text/html" in request.headers.get("accept", ""):
+                current_user = resolve_user(request)
+            request.state.user = current_user
+            return await call_next(request)
+
+        async def check_serveo_url(request: Request, call_next):
+            host = request.headers.get("host", "")
+            if "serveo.net" in host:
+                logger.info(f"Запрос через Serveo: {host}")
+                with open(url_file, "w") as f:
+                    f.write(f"http://{host}")
+            response = await call_next(request)
+            response.headers["X-Content-Type-Options"] = "nosniff"
+            response.headers["X-Frame-Options"] = "SAMEORIGIN"
+            return response
+
+        app.middleware("http")(legacy_log_requests)
+        app.middleware("http")(add_current_user_to_request)
+        app.middleware("http")(check_serveo_url)
+    elif variant == "pipeline":
+        app.add_middleware(RequestPipelineMiddleware, user_resolver=resolve_user, tunnel_url_file=url_file)
+    return app
+
+async def measure(app: FastAPI, requests: int) -> dict:
+    """
+    Среднее время запроса в микросекундах для прямого запроса и запроса через туннель
+    """
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        workloads = {
+            "GET /health": lambda: client.get("/health"),
+            "через Serveo": lambda: client.get("/health", headers={"host": "bench.serveo.net"}),
+        }
+        for name, call in workloads.items():
+            for _ in range(20):
+                await call()
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                await call()
+                timings.append(time.perf_counter() - started)
+            results[name] = statistics.mean(timings) * 1_000_000
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    logs_dir = Path(tempfile.mkdtemp(prefix="tradehub-middleware-"))
+
+    # Варианты чередуются по раундам, в зачет идет лучший раунд
+    with open(os.devnull, "w") as console:
+        setup_logging(logs_dir, logging.INFO, console=console)
+        results = {}
+        for _ in range(args.rounds):
+            for variant in ("none", "legacy", "pipeline"):
+                measured = asyncio.run(measure(build_app(variant, logs_dir), args.requests))
+                best = results.setdefault(variant, measured)
+                for workload, value in measured.items():
+                    best[workload] = min(best[workload], value)
+        stop_logging()
+
+    names = {"legacy": "три @app.middleware", "pipeline": "RequestPipelineMiddleware"}
+    for variant in ("legacy", "pipeline"):
+        print(names[variant])
+        for workload, value in results[variant].items():
+            overhead = value - results["none"][workload]
+            print(f"  {workload:>12}: {value:8.1f} мкс/запрос, накладные расходы {overhead:7.1f} мкс")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Нагрузочный тест входа: проверка bcrypt прямо в async-обработчике (как было раньше)
+против пула хеширования паролей.
+
+Во время серии одновременных входов измеряется задержка легкого эндпоинта /ping
+того же процесса. Если bcrypt выполняется в event loop, задержка /ping растет до
+суммарного времени всех проверок паролей, поставленных в очередь перед ним.
+Отклоненные при переполнении очереди пула входы (503) считаются отдельно.
+
+Запуск:
+    python benchmarks/bench_password_hashing.py --logins 200 --concurrency 50 --rounds 12
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Form
+from passlib.context import CryptContext
+
+from app.services.password_hasher import PasswordHasher
+
+PASSWORD = "Secret1!"
+
+def build_blocking_app(context: CryptContext, hashed: str) -> FastAPI:
+    """
+    Прежняя реализация: bcrypt в event loop
+    """
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login(password: str = Form(...)):
+        return {"ok": context.verify(password, hashed)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+def build_pool_app(hasher: PasswordHasher, hashed: str) -> FastAPI:
+    """
+    Проверка пароля в ограниченном пуле потоков
+    """
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login(password: str = Form(...)):
+        return {"ok": await hasher.verify(password, hashed)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+async def run(app: FastAPI, logins: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    ping_latencies = []
+    login_latencies = []
+    statuses = {}
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/login", data={"password": PASSWORD})
+                login_latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            # Задержка считается от запланированного момента запроса, поэтому
+            # время, пока event loop занят bcrypt, тоже учитывается
+            while not done.is_set():
+                scheduled = time.perf_counter() + 0.005
+                await asyncio.sleep(0.005)
+                await client.get("/ping")
+                ping_latencies.append(time.perf_counter() - scheduled)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "logins_per_second": statuses.get(200, 0) / elapsed,
+        "rejected": statuses.get(503, 0),
+        "login_p50_ms": statistics.median(login_latencies) * 1000,
+        "ping_p50_ms": statistics.median(ping_latencies) * 1000,
+        "ping_p99_ms": percentile(ping_latencies, 0.99) * 1000,
+        "ping_count": len(ping_latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=0, help="потоков пула (0 - по числу ядер, не больше 4)")
+    parser.add_argument("--queue", type=int, default=32)
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash(PASSWORD)
+    hasher = PasswordHasher(context, max_workers=args.workers, max_queue=args.queue)
+    print(f"bcrypt rounds={args.rounds}, {args.logins} входов, одновременно {args.concurrency}, потоков пула {hasher.max_workers}")
+
+    for name, app in (("в event loop", build_blocking_app(context, hashed)), ("пул потоков", build_pool_app(hasher, hashed))):
+        result = asyncio.run(run(app, args.logins, args.concurrency))
+        print(
+            f"{name:>13}: {result['logins_per_second']:7.1f} входов/с, отклонено {result['rejected']:4d}, "
+            f"вход p50 {result['login_p50_ms']:8.1f} мс, "
+            f"/ping p50 {result['ping_p50_ms']:7.2f} мс, p99 {result['ping_p99_ms']:8.2f} мс "
+            f"({result['ping_count']} замеров)"
+        )
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    main()
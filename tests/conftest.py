@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+import app.models  # noqa: F401 - регистрация всех моделей в метаданных
+from app.database import Base, get_async_database_url, get_db, get_async_db
+from app.routers import products
+from app.services.query_stats import capture_queries
+from app.services.response_cache import catalog_cache
+from app.services.category_tree import category_tree
+
+@pytest.fixture
+def database_url(tmp_path):
+    """
+    URL временной файловой базы SQLite (общей для синхронного и асинхронного движков)
+    """
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+@pytest.fixture
+def engine(database_url):
+    """
+    Синхронный движок с созданными таблицами
+    """
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    """
+    Синхронная сессия базы данных для подготовки тестовых данных
+    """
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def async_session_factory(engine, database_url):
+    """
+    Фабрика асинхронных сессий для той же базы данных
+    """
+    async_engine = create_async_engine(get_async_database_url(database_url))
+    yield async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    async_engine.sync_engine.dispose()
+
+@pytest.fixture
+def client(engine, async_session_factory):
+    """
+    Тестовый клиент с роутером товаров, работающий с временной базой
+    """
+    # Ответы каталога из предыдущих тестов относятся к другой базе
+    catalog_cache.clear()
+    catalog_cache.bump()
+    category_tree.clear()
+    app = FastAPI()
+    app.include_router(products.router, prefix="/products")
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def override_get_async_db():
+        async with async_session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return TestClient(app)
+
+@pytest.fixture
+def query_budget():
+    """
+    Проверка числа SQL-запросов в блоке:
+
+        with query_budget(3):
+            client.get("/products/1")
+
+    Тест падает, если запросов больше бюджета или один запрос повторяется
+    n_plus_one раз и больше (ленивая загрузка в цикле)
+    """
+    @contextmanager
+    def budget(max_queries: int, n_plus_one: int = 3):
+        with capture_queries() as stats:
+            yield stats
+        if stats.count > max_queries:
+            pytest.fail(f"Превышен бюджет SQL-запросов ({max_queries}): {stats.report()}")
+        repeated = stats.n_plus_one(n_plus_one)
+        if repeated:
+            pytest.fail(f"Повторяющиеся SQL-запросы (N+1): {stats.report()}")
+
+    return budget
@@ -0,0 +1,76 @@
+from app.migrations.add_category_paths import run_migration
+from app.models.user import User, UserRole
+from app.models.product import Category, Product, ProductStatus
+from app.services.category_tree import category_tree
+from app.services.query_stats import capture_queries
+
+def create_tree(db):
+    electronics = Category(name="Электроника", slug="electronics")
+    phones = Category(name="Телефоны", slug="phones", parent=electronics)
+    android = Category(name="Android", slug="android", parent=phones)
+    books = Category(name="Книги", slug="books")
+    db.add_all([electronics, phones, android, books])
+    db.commit()
+    return electronics, phones, android, books
+
+def test_paths_assigned_on_insert(db):
+    electronics, phones, android, books = create_tree(db)
+
+    assert electronics.path == f"/{electronics.id}/"
+    assert android.path == f"/{electronics.id}/{phones.id}/{android.id}/"
+    assert books.path == f"/{books.id}/"
+
+def test_migration_backfills_paths(db, engine):
+    electronics, phones, android, _ = create_tree(db)
+    db.query(Category).update({Category.path: None})
+    db.commit()
+
+    assert run_migration(engine)
+    db.expire_all()
+    assert android.path == f"/{electronics.id}/{phones.id}/{android.id}/"
+
+def test_category_subtree_served_from_tree(client, db):
+    electronics, phones, android, _ = create_tree(db)
+
+    url = f"/products/categories/{electronics.id}"
+
+    # Валидаторы и одна загрузка всех категорий, независимо от глубины дерева
+    with capture_queries() as stats:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert stats.count == 2, stats.report()
+    data = response.json()
+    assert data["subcategories"][0]["slug"] == "phones"
+    assert data["subcategories"][0]["subcategories"][0]["slug"] == "android"
+
+    assert [c["slug"] for c in client.get("/products/categories").json()] == ["electronics", "books"]
+    assert client.get("/products/categories/999").status_code == 404
+
+    # Новая категория перестраивает дерево
+    rebuilds = category_tree.rebuilds
+    db.add(Category(name="iOS", slug="ios", parent=phones))
+    db.commit()
+    category_tree.cache.bump()
+    data = client.get(f"/products/categories/{phones.id}").json()
+    assert [c["slug"] for c in data["subcategories"]] == ["android", "ios"]
+    assert category_tree.rebuilds == rebuilds + 1
+
+def test_products_filter_includes_descendants(client, db):
+    electronics, phones, android, books = create_tree(db)
+    seller = User(email="seller@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    for title, category in (("Смартфон", android), ("Телефон", phones), ("Роман", books)):
+        db.add(Product(
+            title=title,
+            description="Описание товара",
+            price=10.0,
+            status=ProductStatus.ACTIVE.value,
+            seller=seller,
+            categories=[category]
+        ))
+    db.commit()
+
+    titles = {p["title"] for p in client.get(f"/products/?category_id={electronics.id}").json()}
+    assert titles == {"Смартфон", "Телефон"}
+    titles = {p["title"] for p in client.get(f"/products/?category_id={android.id}").json()}
+    assert titles == {"Смартфон"}
+    assert client.get("/products/?category_id=999").json() == []
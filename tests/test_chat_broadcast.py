@@ -0,0 +1,209 @@
+import asyncio
+import json
+import multiprocessing
+import time
+
+import pytest
+import redis
+
+from app.config import settings
+from app.services.broadcast import LocalBroadcast, RedisBroadcast
+
+CHAT_ID = 424242
+
+class FakeWebSocket:
+    """
+    WebSocket, запоминающий отправленные сообщения
+    """
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+class StuckWebSocket(FakeWebSocket):
+    """
+    Клиент, который перестал принимать данные
+    """
+    async def send_text(self, text):
+        await asyncio.Event().wait()
+
+def run_worker(redis_url, ready, results):
+    """
+    Отдельный процесс приложения с подключенным к чату пользователем
+    """
+    from app.routers.chat import ConnectionManager
+
+    async def main():
+        manager = ConnectionManager(RedisBroadcast(redis.from_url(redis_url)))
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, CHAT_ID, user_id=2)
+        ready.set()
+
+        deadline = time.monotonic() + 10
+        while len(websocket.sent) < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        results.put([json.loads(text) for text in websocket.sent])
+        manager.broadcast.close()
+
+    asyncio.run(main())
+
+@pytest.fixture
+def redis_url():
+    try:
+        redis.from_url(settings.REDIS_URL, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        pytest.skip("Redis недоступен")
+    return settings.REDIS_URL
+
+def test_local_broadcast():
+    from app.routers.chat import ConnectionManager
+
+    async def main():
+        manager = ConnectionManager(LocalBroadcast())
+        buyer, seller = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(buyer, CHAT_ID, user_id=1)
+        await manager.connect(seller, CHAT_ID, user_id=2)
+        await manager.send_message({"content": "привет"}, CHAT_ID, exclude_user_id=1)
+        await asyncio.sleep(0.05)
+        return buyer.sent, seller.sent
+
+    buyer_sent, seller_sent = asyncio.run(main())
+    assert buyer_sent == []
+    assert json.loads(seller_sent[0]) == {"content": "привет"}
+
+@pytest.mark.parametrize("policy", ["drop", "disconnect"])
+def test_slow_consumer_isolated(policy):
+    from app.routers.chat import ConnectionManager
+
+    async def main():
+        manager = ConnectionManager(LocalBroadcast(), queue_size=2, send_timeout=5, slow_consumer_policy=policy)
+        fast, stuck = FakeWebSocket(), StuckWebSocket()
+        await manager.connect(fast, CHAT_ID, user_id=1)
+        await manager.connect(stuck, CHAT_ID, user_id=2)
+        for i in range(10):
+            await manager.send_message({"n": i}, CHAT_ID)
+            await asyncio.sleep(0.01)
+        stats = manager.stats()
+        await manager.disconnect(CHAT_ID, 1)
+        await manager.disconnect(CHAT_ID, 2)
+        return fast, stuck, stats
+
+    fast, stuck, stats = asyncio.run(main())
+
+    # Зависший клиент не задерживает доставку остальным
+    assert [json.loads(text)["n"] for text in fast.sent] == list(range(10))
+    if policy == "drop":
+        # Одно сообщение у писателя, два в очереди, остальные отброшены
+        assert stats["dropped_messages"] == 7
+        assert stats["connections"] == 2
+        assert stats["max_queue_depth"] == 2
+    else:
+        # Клиент отключен при первом переполнении очереди
+        assert stats["slow_disconnects"] == 1
+        assert stats["connections"] == 1
+        assert stuck.close_code == 1013
+
+def test_failed_send_removes_connection():
+    from app.routers.chat import ConnectionManager
+
+    async def main():
+        manager = ConnectionManager(LocalBroadcast(), queue_size=10, send_timeout=0.05)
+        stuck = StuckWebSocket()
+        await manager.connect(stuck, CHAT_ID, user_id=2)
+        await manager.send_message({"n": 1}, CHAT_ID)
+        await asyncio.sleep(0.2)
+        return manager.stats(), stuck
+
+    stats, stuck = asyncio.run(main())
+    # Отправка не уложилась в таймаут - подключение закрыто и удалено
+    assert stats["failed_connections"] == 1
+    assert stats["connections"] == 0
+    assert stuck.close_code == 1011
+
+def test_redis_broadcast_across_processes(redis_url):
+    from app.routers.chat import ConnectionManager
+
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Event(), context.Queue()
+    worker = context.Process(target=run_worker, args=(redis_url, ready, results))
+    worker.start()
+    try:
+        assert ready.wait(15)
+        client = redis.from_url(redis_url)
+        # Ждем, пока подписка процесса-получателя станет активной
+        while client.pubsub_numsub(f"chat:{CHAT_ID}")[0][1] == 0:
+            time.sleep(0.05)
+
+        async def main():
+            # Отправитель подключен к другому процессу
+            manager = ConnectionManager(RedisBroadcast(client))
+            sender = FakeWebSocket()
+            await manager.connect(sender, CHAT_ID, user_id=1)
+            await manager.send_message({"content": "первое"}, CHAT_ID, exclude_user_id=1)
+            await manager.send_message({"content": "второе"}, CHAT_ID)
+            await asyncio.sleep(0.5)
+            manager.broadcast.close()
+            return sender.sent
+
+        sender_sent = asyncio.run(main())
+        received = results.get(timeout=15)
+    finally:
+        worker.join(15)
+
+    # Получатель в другом процессе видит оба сообщения, отправитель - только адресованное всем
+    assert [message["content"] for message in received] == ["первое", "второе"]
+    assert [json.loads(text)["content"] for text in sender_sent] == ["второе"]
+
+def test_reconnect_during_unsubscribe_keeps_subscription():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.routers.chat import ConnectionManager
+
+    client = fakeredis.FakeRedis()
+
+    async def main():
+        manager = ConnectionManager(RedisBroadcast(client, poll_timeout=0.02))
+        first, second = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(first, CHAT_ID, user_id=1)
+        # Отключение и повторное подключение к тому же чату одновременно
+        await asyncio.gather(
+            manager.disconnect(CHAT_ID, 1, first),
+            manager.connect(second, CHAT_ID, user_id=1)
+        )
+        await asyncio.sleep(0.1)
+        subscribers = client.pubsub_numsub(f"chat:{CHAT_ID}")[0][1]
+        await manager.send_message({"content": "после переподключения"}, CHAT_ID)
+        await asyncio.sleep(0.2)
+        manager.broadcast.close()
+        return subscribers, second.sent
+
+    subscribers, sent = asyncio.run(main())
+    assert subscribers == 1
+    assert [json.loads(text)["content"] for text in sent] == ["после переподключения"]
+
+def test_delivery_error_logged(caplog):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+
+    async def main():
+        broadcast = RedisBroadcast(client, poll_timeout=0.02)
+
+        async def failing_handler(chat_id, message):
+            raise RuntimeError("сбой доставки")
+
+        broadcast.set_handler(failing_handler)
+        await broadcast.subscribe(CHAT_ID)
+        await broadcast.publish(CHAT_ID, {"content": "привет"})
+        await asyncio.sleep(0.2)
+        broadcast.close()
+
+    with caplog.at_level("ERROR", logger="app.services.broadcast"):
+        asyncio.run(main())
+    assert "Ошибка доставки сообщения чата" in caplog.text
@@ -0,0 +1,104 @@
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+
+from app.models.user import User, UserRole
+from app.models.product import Category, Product, ProductStatus
+from app.security import create_access_token, get_current_seller
+from app.services import user_cache as user_cache_module
+from app.services.query_stats import capture_queries
+from app.services.user_cache import user_cache
+
+def create_product(db):
+    seller = User(email="seller@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    product = Product(
+        title="Товар",
+        description="Описание товара",
+        price=10.0,
+        status=ProductStatus.ACTIVE.value,
+        seller=seller,
+        categories=[Category(name="Игры", slug="games")]
+    )
+    db.add(product)
+    db.commit()
+    return product
+
+def test_product_etag_and_not_modified(client, db):
+    product = create_product(db)
+
+    response = client.get(f"/products/{product.id}")
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert "last-modified" in response.headers
+
+    # 304 отдается после одного запроса валидаторов, без загрузки товара
+    with capture_queries() as stats:
+        cached = client.get(f"/products/{product.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert stats.count == 1
+
+    response = client.get(f"/products/{product.id}", headers={"If-Modified-Since": response.headers["last-modified"]})
+    assert response.status_code == 304
+
+    # Изменение остатка меняет ETag и ответ, хотя кэш каталога не сбрасывался
+    db.execute(update(Product).where(Product.id == product.id).values(quantity=7))
+    db.commit()
+    response = client.get(f"/products/{product.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["quantity"] == 7
+
+def test_list_and_category_etags(client, db):
+    product = create_product(db)
+
+    for url in ("/products/", "/products/categories", f"/products/categories/{product.categories[0].id}"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    etag = client.get("/products/").headers["etag"]
+    product.title = "Новое название"
+    db.commit()
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "Новое название"
+
+def test_product_etag_changes_after_image_upload(client, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    product = create_product(db)
+    seller_id = product.seller_id
+    client.app.dependency_overrides[get_current_seller] = lambda: db.get(User, seller_id)
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+    response = client.post(f"/products/{product.id}/images", files={"file": ("first.png", png, "image/png")})
+    assert response.status_code == 200
+    etag = client.get(f"/products/{product.id}").headers["etag"]
+
+    # Второе изображение не становится миниатюрой, но ответ товара меняется
+    response = client.post(f"/products/{product.id}/images", files={"file": ("second.png", png, "image/png")})
+    assert response.status_code == 200
+    response = client.get(f"/products/{product.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["images"]) == 2
+
+def test_hidden_product_visible_to_owner_with_bearer_token(client, db, engine, monkeypatch):
+    monkeypatch.setattr(user_cache_module, "SessionLocal", sessionmaker(bind=engine))
+    user_cache.clear()
+    product = create_product(db)
+    product.status = ProductStatus.DRAFT.value
+    db.commit()
+    seller = product.seller
+
+    assert client.get(f"/products/{product.id}").status_code == 404
+
+    token = create_access_token({"sub": seller.username, "id": seller.id})
+    response = client.get(f"/products/{product.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["id"] == product.id
+
+    client.cookies.set("access_token", f"Bearer {token}")
+    assert client.get(f"/products/{product.id}").status_code == 200
+    user_cache.clear()
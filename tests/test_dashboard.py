@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.models.order import Order, OrderStatus
+from app.services import dashboard as dashboard_module
+from app.services.dashboard import compute_dashboard_stats, get_dashboard_snapshot
+
+class FakeRedis:
+    """
+    Хранилище ключей в памяти вместо Redis
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+def seed(db):
+    old = datetime.utcnow() - timedelta(days=60)
+    seller = User(email="s@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    admin = User(email="a@example.com", username="admin", hashed_password="x", role=UserRole.ADMIN.value)
+    buyer = User(email="b@example.com", username="buyer", hashed_password="x", is_active=False, created_at=old)
+    db.add_all([seller, admin, buyer])
+    db.add_all([
+        Product(title="A", description="d", price=10.0, status=ProductStatus.ACTIVE.value, seller=seller),
+        Product(title="B", description="d", price=20.0, status=ProductStatus.ACTIVE.value, seller=seller),
+        Product(title="C", description="d", price=60.0, status=ProductStatus.MODERATION.value, seller=seller),
+        Product(title="D", description="d", price=30.0, status=ProductStatus.HIDDEN.value, seller=seller),
+    ])
+    db.add_all([
+        Order(buyer=buyer, seller=seller, total_amount=100.0, status=OrderStatus.COMPLETED.value),
+        Order(buyer=buyer, seller=seller, total_amount=50.0, status=OrderStatus.COMPLETED.value, created_at=old),
+        Order(buyer=buyer, seller=seller, total_amount=70.0, status=OrderStatus.PENDING.value),
+        Order(buyer=buyer, seller=seller, total_amount=30.0, status=OrderStatus.CANCELLED.value, created_at=old),
+    ])
+    db.commit()
+
+def test_compute_dashboard_stats(db, engine):
+    seed(db)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    stats = compute_dashboard_stats(db)
+
+    # Вся статистика собирается тремя агрегирующими запросами
+    assert len(statements) == 3
+    assert stats["users"] == {"total": 3, "active": 2, "sellers": 1, "admins": 1, "new_month": 2}
+    assert stats["products"] == {"total": 4, "active": 2, "moderation": 1, "hidden": 1, "avg_price": 30.0}
+    assert {k: v for k, v in stats["orders"].items() if k != "avg_completion_time"} == {
+        "total": 4, "pending": 1, "completed": 2, "cancelled": 1, "new_month": 2
+    }
+    assert stats["sales"]["total"] == 150.0
+    assert stats["sales"]["month"] == 100.0
+    assert stats["sales"]["avg_order"] == 75.0
+
+def test_dashboard_snapshot(db, monkeypatch):
+    seed(db)
+    monkeypatch.setattr(dashboard_module, "redis_client", FakeRedis())
+
+    # Первый запрос рассчитывает и сохраняет снимок
+    first = get_dashboard_snapshot(db)
+    assert first["products"]["total"] == 4
+
+    # Следующие запросы читают снимок и не видят новых данных до пересчета
+    db.add(Product(title="E", description="d", price=1.0, status=ProductStatus.ACTIVE.value, seller_id=1))
+    db.commit()
+    assert get_dashboard_snapshot(db) == first
+
+    dashboard_module.refresh_dashboard_snapshot(db)
+    assert get_dashboard_snapshot(db)["products"]["total"] == 5
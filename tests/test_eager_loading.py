@@ -0,0 +1,75 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_async_db
+from app.models.user import User, UserRole
+from app.models.product import Category, Product, ProductImage, ProductStatus
+from app.models.order import Order, OrderItem
+from app.routers import orders
+from app.security import get_current_user
+from app.services.query_stats import capture_queries
+
+def create_catalog(db, count):
+    seller = User(email="seller@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    buyer = User(email="buyer@example.com", username="buyer", hashed_password="x", role=UserRole.ADMIN.value)
+    category = Category(name="Игры", slug="games")
+    products = []
+    for i in range(count):
+        product = Product(
+            title=f"Товар {i}",
+            description="Описание товара для теста",
+            price=10.0,
+            status=ProductStatus.ACTIVE.value,
+            seller=seller,
+            categories=[category],
+            images=[ProductImage(image_url=f"products/{i}.png")]
+        )
+        products.append(product)
+        db.add(Order(
+            buyer=buyer,
+            seller=seller,
+            total_amount=10.0,
+            items=[OrderItem(product=product, quantity=1, price=10.0)]
+        ))
+    db.add_all(products)
+    db.commit()
+    # Атрибуты текущего пользователя не должны догружаться во время замеров
+    db.refresh(buyer)
+    return buyer
+
+def count_queries(client, url, **params):
+    with capture_queries() as stats:
+        response = client.get(url, params=params)
+    assert response.status_code == 200
+    return stats.count, response.json()
+
+def test_product_page_query_count_constant(client, db):
+    create_catalog(db, 30)
+
+    small, items = count_queries(client, "/products/", limit=3)
+    large, more_items = count_queries(client, "/products/", limit=30)
+
+    assert len(items) == 3 and len(more_items) == 30
+    assert more_items[0]["categories"][0]["slug"] == "games"
+    assert len(more_items[0]["images"]) == 1
+    assert small == large
+
+def test_order_page_query_count_constant(db, async_session_factory):
+    buyer = create_catalog(db, 30)
+
+    app = FastAPI()
+    app.include_router(orders.router, prefix="/orders")
+
+    async def override_get_async_db():
+        async with async_session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_current_user] = lambda: buyer
+    client = TestClient(app)
+
+    small, page = count_queries(client, "/orders/", limit=3)
+    large, more = count_queries(client, "/orders/", limit=30)
+    assert len(page) == 3 and len(more) == 30
+    assert more[0]["items"][0]["quantity"] == 1
+    assert small == large
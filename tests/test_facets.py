@@ -0,0 +1,59 @@
+from app.models.user import User, UserRole
+from app.models.product import Category, Product, ProductStatus
+from app.services.query_stats import capture_queries
+
+def create_catalog(db):
+    games = Category(name="Игры", slug="games")
+    keys = Category(name="Ключи", slug="keys", parent=games)
+    music = Category(name="Музыка", slug="music")
+    alice = User(email="alice@example.com", username="alice", hashed_password="x", role=UserRole.SELLER.value)
+    bob = User(email="bob@example.com", username="bob", hashed_password="x", role=UserRole.SELLER.value)
+    for title, price, seller, categories, status in (
+        ("Ключ 1", 50, alice, [keys], ProductStatus.ACTIVE),
+        ("Ключ 2", 150, alice, [keys, games], ProductStatus.ACTIVE),
+        ("Игра", 700, bob, [games], ProductStatus.ACTIVE),
+        ("Альбом", 20000, bob, [music], ProductStatus.ACTIVE),
+        ("Черновик", 70, bob, [games], ProductStatus.DRAFT),
+    ):
+        db.add(Product(
+            title=title,
+            description="Описание товара",
+            price=price,
+            status=status.value,
+            seller=seller,
+            categories=categories
+        ))
+    db.commit()
+    return games, keys, music
+
+def test_facets_count_whole_selection(client, db):
+    games, keys, music = create_catalog(db)
+
+    response = client.get("/products/facets?limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 2
+    assert data["total"] == 4
+    assert {(c["name"], c["count"]) for c in data["categories"]} == {("Игры", 2), ("Ключи", 2), ("Музыка", 1)}
+    assert [(s["name"], s["count"]) for s in data["sellers"]] == [("alice", 2), ("bob", 2)]
+    buckets = {(b["min"], b["max"]): b["count"] for b in data["price_buckets"]}
+    assert buckets[(0, 100)] == 1
+    assert buckets[(100, 500)] == 1
+    assert buckets[(500, 1000)] == 1
+    assert buckets[(10000, None)] == 1
+    assert sum(buckets.values()) == data["total"]
+
+def test_facets_follow_filters_and_cache(client, db):
+    games, keys, music = create_catalog(db)
+    url = f"/products/facets?category_id={games.id}&max_price=1000"
+
+    data = client.get(url).json()
+    assert data["total"] == 3
+    assert {s["name"] for s in data["sellers"]} == {"alice", "bob"}
+
+    # Повторный запрос - из кэша каталога, только запрос валидаторов
+    with capture_queries() as stats:
+        response = client.get(url)
+    assert response.headers["x-cache"] == "HIT"
+    assert stats.count == 1
+    assert response.json() == data
@@ -0,0 +1,34 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import get_async_database_url
+from app.models.chat import Message
+from app.services.message_writer import MessageWriter
+
+def test_message_writer_batches_inserts(db, database_url):
+    async def main():
+        engine = create_async_engine(get_async_database_url(database_url))
+        writer = MessageWriter(engine, batch_interval=0.01, max_batch_size=30)
+        try:
+            # Сообщения из 50 "сокетов" одновременно
+            rows = await asyncio.gather(*[
+                writer.write(chat_id=1 + i % 3, sender_id=i, content=f"сообщение {i}")
+                for i in range(50)
+            ])
+            return rows, writer.stats()
+        finally:
+            await engine.dispose()
+
+    rows, stats = asyncio.run(main())
+
+    # Каждый отправитель получил свою строку с id и временем создания
+    assert [row["content"] for row in rows] == [f"сообщение {i}" for i in range(50)]
+    assert len({row["id"] for row in rows}) == 50
+    assert all(row["created_at"] is not None and row["is_read"] is False for row in rows)
+
+    # Вставки объединены в пакеты не больше max_batch_size
+    assert stats == {"batches": 2, "messages": 50, "pending": 0}
+
+    saved = {m.id: m for m in db.query(Message).all()}
+    assert all(saved[row["id"]].sender_id == row["sender_id"] for row in rows)
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app.middleware import RequestPipelineMiddleware
+from app.services.metrics import instrument_engine, instrument_redis, render_metrics
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_request_histogram_uses_route_template():
+    app = FastAPI()
+    app.add_middleware(RequestPipelineMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") >= 1
+    assert sample("http_requests_in_progress", method="GET") == 0
+    assert b'route="/items/{item_id}"' in render_metrics()
+
+def test_engine_pool_metrics(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    instrument_engine(engine, "test")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert sample("db_pool_checked_out", engine="test") == 1
+    assert sample("db_pool_checked_out", engine="test") == 0
+    assert sample("db_pool_checkouts_total", engine="test") == 1
+
+    # После dispose пул заменяется, время ожидания продолжает измеряться
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert sample("db_pool_wait_seconds_count", engine="test") == 2
+
+def test_pool_metrics_under_concurrent_checkouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}", pool_size=4, max_overflow=8)
+    instrument_engine(engine, "concurrent")
+
+    def work():
+        for _ in range(50):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        for future in [executor.submit(work) for _ in range(12)]:
+            future.result()
+
+    # События пула из разных потоков не сбивают счетчик выданных соединений
+    assert sample("db_pool_checked_out", engine="concurrent") == 0
+    assert sample("db_pool_overflow", engine="concurrent") == 0
+    assert sample("db_pool_checkouts_total", engine="concurrent") == 600
+
+def test_redis_command_latency():
+    class Client:
+        def execute_command(self, *args, **options):
+            return "PONG"
+
+        def ping(self):
+            return self.execute_command("PING")
+
+    before = sample("redis_command_duration_seconds_count", command="PING")
+    client = instrument_redis(Client())
+    assert client.ping() == "PONG"
+    assert sample("redis_command_duration_seconds_count", command="PING") == before + 1
@@ -0,0 +1,36 @@
+from sqlalchemy import inspect, select
+
+from app.migrations import runner
+from app.models.chat import Message
+from index_advisor import QUERIES, explain
+
+def test_runner_applies_pending_once(engine):
+    assert runner.run_pending_migrations(engine)
+    assert set(runner.applied_versions(engine)) == {version for version, _ in runner.MIGRATIONS}
+    assert runner.pending_migrations(engine) == []
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("orders")}
+    assert {"ix_orders_buyer_id_created_at", "ix_orders_seller_id_status"} <= indexes
+
+def test_runner_stops_on_failed_migration(engine, monkeypatch):
+    calls = []
+
+    def fake_import(name):
+        module_name = name.rsplit(".", 1)[-1]
+        calls.append(module_name)
+        return type("Migration", (), {"run_migration": staticmethod(lambda bind: module_name != "broken")})
+
+    monkeypatch.setattr(runner, "MIGRATIONS", [("0001", "first"), ("0002", "broken"), ("0003", "last")])
+    monkeypatch.setattr(runner.importlib, "import_module", fake_import)
+
+    assert not runner.run_pending_migrations(engine)
+    assert calls == ["first", "broken"]
+    assert set(runner.applied_versions(engine)) == {"0001"}
+
+def test_index_advisor_reports_scans(engine):
+    runner.run_pending_migrations(engine)
+    with engine.connect() as conn:
+        for name, build in QUERIES.items():
+            assert explain(conn, build()) == [], name
+        # Для фильтра по тексту сообщения индекса нет
+        assert explain(conn, select(Message).where(Message.content == "x"))
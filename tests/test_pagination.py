@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.services.pagination import encode_cursor, decode_cursor
+
+def test_cursor_roundtrip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+def test_read_products_cursor(client, db):
+    seller = User(
+        email="seller@example.com",
+        username="seller",
+        hashed_password="x",
+        role=UserRole.SELLER.value
+    )
+    started = datetime(2024, 1, 1)
+    # У части товаров одинаковая дата создания - порядок внутри нее задает id
+    products = [
+        Product(
+            title=f"Товар {i}",
+            description="Описание товара для теста",
+            price=10.0,
+            status=ProductStatus.ACTIVE.value,
+            seller=seller,
+            created_at=started + timedelta(minutes=i // 2)
+        )
+        for i in range(7)
+    ]
+    db.add_all(products)
+    db.commit()
+    expected = [p.id for p in sorted(products, key=lambda p: (p.created_at, p.id), reverse=True)]
+
+    # Обход всех страниц по курсору без пропусков и повторов
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get("/products/", params={"cursor": cursor, "limit": 3})
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+    assert seen == expected
+
+    # Новый товар не сдвигает уже выданные страницы
+    first_page = client.get("/products/", params={"cursor": "", "limit": 3}).json()
+    db.add(Product(
+        title="Новый товар",
+        description="Описание товара для теста",
+        price=10.0,
+        status=ProductStatus.ACTIVE.value,
+        seller=seller
+    ))
+    db.commit()
+    second_page = client.get("/products/", params={"cursor": first_page["next_cursor"], "limit": 3}).json()
+    assert [item["id"] for item in second_page["items"]] == expected[3:6]
+
+    # Без курсора сохраняется прежний формат ответа
+    response = client.get("/products/", params={"skip": 0, "limit": 3})
+    assert isinstance(response.json(), list)
+
+    # Некорректный курсор
+    response = client.get("/products/", params={"cursor": "не курсор"})
+    assert response.status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app import security
+from app.models.user import User
+from app.services.password_hasher import PasswordHasher
+
+def make_hasher(rounds=4, **kwargs):
+    return PasswordHasher(CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds), **kwargs)
+
+def test_hash_and_verify_in_pool():
+    hasher = make_hasher(max_workers=2)
+
+    async def scenario():
+        hashed = await hasher.hash("Secret1!")
+        return hashed, await hasher.verify("Secret1!", hashed), await hasher.verify("wrong", hashed)
+
+    hashed, ok, wrong = asyncio.run(scenario())
+    assert hashed.startswith("$2b$04$")
+    assert ok and not wrong
+    assert hasher.pending == 0
+    hasher.shutdown()
+
+def test_rehash_on_login_when_cost_changes(monkeypatch):
+    user = User(username="alice", hashed_password=make_hasher(rounds=4).context.hash("Secret1!"))
+    monkeypatch.setattr(security, "password_hasher", make_hasher(rounds=5))
+
+    assert not asyncio.run(security.verify_user_password(user, "wrong"))
+    assert user.hashed_password.startswith("$2b$04$")
+
+    assert asyncio.run(security.verify_user_password(user, "Secret1!"))
+    assert user.hashed_password.startswith("$2b$05$")
+    assert security.password_hasher.context.verify("Secret1!", user.hashed_password)
+
+def test_rejects_when_saturated():
+    hasher = make_hasher(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.create_task(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as error:
+            await hasher.hash("Secret1!")
+        release.set()
+        await asyncio.gather(*blocked)
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert hasher.rejected == 1
+    assert hasher.pending == 0
+    hasher.shutdown()
+
+def test_cancelled_caller_keeps_slot_until_job_finishes():
+    hasher = make_hasher(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0.05)
+        # Клиент отключился, но вызов в пуле продолжает выполняться
+        running.cancel()
+        await asyncio.sleep(0.01)
+        pending_after_cancel = hasher.pending
+        queued = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException):
+            await hasher.hash("Secret1!")
+        release.set()
+        await queued
+        await asyncio.sleep(0.01)
+        return pending_after_cancel
+
+    assert asyncio.run(scenario()) == 1
+    assert hasher.pending == 0
+    hasher.shutdown()
@@ -0,0 +1,71 @@
+import logging
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.middleware import RequestPipelineMiddleware
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.services.query_stats import capture_queries, statement_shape
+
+def create_products(db, count=4):
+    seller = User(email="seller@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    products = [
+        Product(
+            title=f"Товар {i}",
+            description="Описание товара для теста",
+            price=10.0,
+            status=ProductStatus.ACTIVE.value,
+            seller=User(email=f"s{i}@example.com", username=f"s{i}", hashed_password="x") if i else seller
+        )
+        for i in range(count)
+    ]
+    db.add_all(products)
+    db.commit()
+    return products
+
+def test_statement_shape_collapses_parameter_lists():
+    assert statement_shape("SELECT *\n  FROM t WHERE id IN (?, ?, ?)") == statement_shape("SELECT * FROM t WHERE id IN (?)")
+    assert statement_shape("SELECT * FROM t WHERE id IN ($1, $2)") == "SELECT * FROM t WHERE id IN (?)"
+
+def test_lazy_loading_in_loop_detected(db):
+    create_products(db)
+    db.expire_all()
+
+    with capture_queries() as stats:
+        products = db.execute(select(Product)).scalars().all()
+        sellers = [product.seller.username for product in products]
+
+    assert len(sellers) == 4
+    assert stats.count == 5
+    [(shape, count)] = stats.n_plus_one(threshold=3)
+    assert count == 4 and "FROM users" in shape
+
+def test_query_budget_for_product_detail(client, db, query_budget):
+    product = create_products(db, count=1)[0]
+    with query_budget(5):
+        response = client.get(f"/products/{product.id}")
+    assert response.status_code == 200
+
+def test_middleware_reports_queries(db, caplog):
+    create_products(db, count=6)
+    app = FastAPI()
+    app.add_middleware(RequestPipelineMiddleware, query_stats=True)
+
+    def get_session():
+        with db.bind.connect() as conn:
+            yield conn
+
+    @app.get("/sellers")
+    def sellers(conn=Depends(get_session)):
+        # Синхронный обработчик выполняется в пуле потоков
+        ids = conn.execute(select(Product.seller_id)).scalars().all()
+        return [conn.execute(select(User.username).where(User.id == seller_id)).scalar() for seller_id in ids]
+
+    with caplog.at_level(logging.WARNING, logger="sql"):
+        response = TestClient(app).get("/sellers")
+
+    assert response.headers["x-db-query-count"] == "7"
+    assert float(response.headers["x-db-query-time"]) > 0
+    assert any("N+1" in record.getMessage() and "/sellers" in record.getMessage() for record in caplog.records)
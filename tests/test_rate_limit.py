@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app import security
+from app.models.user import User
+from app.services import rate_limit
+from app.services.rate_limit import RateLimit, RateLimiter
+
+class RedisMock:
+    def get(self, key):
+        return None
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+def test_local_gcra_window(clock):
+    limiter = RateLimiter(RedisMock())
+
+    results = [limiter.hit("k", limit=3, period=60) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    # Следующий запрос разрешается через period / limit после первого
+    assert results[3].retry_after == pytest.approx(20)
+
+    clock[0] += 20
+    assert limiter.peek("k", limit=3, period=60).allowed
+    assert limiter.hit("k", limit=3, period=60).allowed
+    assert not limiter.hit("k", limit=3, period=60).allowed
+
+def test_local_state_is_bounded(clock):
+    limiter = RateLimiter(RedisMock(), local_size=100)
+    for i in range(1000):
+        limiter.hit(f"user-{i}", limit=5, period=60)
+    assert len(limiter._local) == 100
+
+def test_redis_script_is_shared():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeRedis()
+    first, second = RateLimiter(redis), RateLimiter(redis)
+
+    assert first.hit("k", limit=2, period=60).allowed
+    assert second.hit("k", limit=2, period=60).allowed
+    denied = first.hit("k", limit=2, period=60)
+    assert not denied.allowed
+    assert 29 < denied.retry_after <= 30
+    assert 0 < redis.pttl("ratelimit:k") <= 60_000
+
+    # Проверка без списания не расходует лимит
+    assert second.peek("other", limit=1, period=60).allowed
+    assert second.hit("other", limit=1, period=60).allowed
+
+    first.reset("k")
+    assert first.hit("k", limit=2, period=60).allowed
+
+def test_falls_back_to_local_on_redis_error():
+    class BrokenRedis:
+        def register_script(self, script):
+            def run(keys, args):
+                raise ConnectionError("redis down")
+            return run
+
+    limiter = RateLimiter(BrokenRedis())
+    assert limiter.hit("k", limit=1, period=60).allowed
+    assert not limiter.hit("k", limit=1, period=60).allowed
+
+def test_dependency_limits_per_ip():
+    limiter = RateLimiter(RedisMock())
+    app = FastAPI()
+
+    @app.get("/limited", dependencies=[Depends(RateLimit("test", limit=2, period=60, limiter=limiter))])
+    async def limited():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/limited").status_code == 200
+    assert client.get("/limited").status_code == 200
+    response = client.get("/limited")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    # Подделанный X-Forwarded-For от недоверенного адреса не обходит ограничение
+    assert client.get("/limited", headers={"X-Forwarded-For": "10.0.0.2"}).status_code == 429
+
+def test_client_ip_behind_trusted_proxy():
+    def request(peer, headers):
+        return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+    # Клиент подставил свой X-Forwarded-For, nginx дописал реальный адрес
+    assert rate_limit.client_ip(request("172.18.0.5", {"x-forwarded-for": "1.2.3.4, 203.0.113.7"})) == "203.0.113.7"
+    assert rate_limit.client_ip(request("172.18.0.5", {"x-real-ip": "203.0.113.7"})) == "203.0.113.7"
+    assert rate_limit.client_ip(request("172.18.0.5", {})) == "172.18.0.5"
+    # Заголовки от недоверенного адреса игнорируются
+    assert rate_limit.client_ip(request("203.0.113.9", {"x-forwarded-for": "1.2.3.4", "x-real-ip": "1.2.3.4"})) == "203.0.113.9"
+
+def test_login_attempts_per_account(monkeypatch):
+    monkeypatch.setattr(security, "rate_limiter", RateLimiter(RedisMock()))
+    monkeypatch.setattr(security.settings, "LOGIN_MAX_ATTEMPTS", 2)
+
+    for _ in range(2):
+        security.check_rate_limit("Alice", "10.0.0.1")
+    with pytest.raises(HTTPException) as error:
+        security.check_rate_limit("alice", "10.0.0.3")
+    assert error.value.status_code == 429
+
+    # Успешный вход сбрасывает лимит учетной записи
+    security.record_login_attempt("alice", True)
+    security.check_rate_limit("alice", "10.0.0.3")
+
+def test_concurrent_logins_limited_before_password_check(db, monkeypatch):
+    monkeypatch.setattr(security, "rate_limiter", RateLimiter(RedisMock()))
+    monkeypatch.setattr(security.settings, "LOGIN_MAX_ATTEMPTS", 5)
+    db.add(User(email="alice@example.com", username="alice", hashed_password="x"))
+    db.commit()
+
+    verified = []
+
+    async def slow_verify(user, password):
+        # Проверка пароля занимает время, за которое приходят остальные попытки
+        verified.append(password)
+        await asyncio.sleep(0.05)
+        return False
+
+    monkeypatch.setattr(security, "verify_user_password", slow_verify)
+
+    async def main():
+        return await asyncio.gather(
+            *(security.authenticate_user("alice", f"guess-{i}", db) for i in range(30)),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert len(verified) == 5
+    assert sum(isinstance(r, HTTPException) and r.status_code == 429 for r in results) == 25
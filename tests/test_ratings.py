@@ -0,0 +1,44 @@
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.models.order import Review
+from app.services.ratings import apply_review_rating, backfill_rating_aggregates
+
+def test_review_rating_aggregates(db, engine):
+    seller = User(email="s@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    buyer = User(email="b@example.com", username="buyer", hashed_password="x")
+    first = Product(title="A", description="d", price=1.0, status=ProductStatus.ACTIVE.value, seller=seller)
+    second = Product(title="B", description="d", price=1.0, status=ProductStatus.ACTIVE.value, seller=seller)
+    db.add_all([buyer, first, second])
+    db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    for product, rating in [(first, 5), (first, 4), (second, 1)]:
+        review = Review(reviewer_id=buyer.id, seller_id=seller.id, product_id=product.id, rating=rating)
+        db.add(review)
+        apply_review_rating(db, review)
+        db.commit()
+
+    # Агрегаты обновляются без чтения остальных отзывов
+    assert not any("FROM reviews" in statement for statement in statements)
+    assert sum(statement.startswith("UPDATE") for statement in statements) == 6
+
+    db.refresh(seller)
+    db.refresh(first)
+    db.refresh(second)
+    assert (seller.rating_sum, seller.rating_count, seller.seller_rating) == (10, 3, 10 / 3)
+    assert (first.rating_sum, first.rating_count, first.rating_average) == (9, 2, 4.5)
+    assert first.rating_histogram == {1: 0, 2: 0, 3: 0, 4: 1, 5: 1}
+    assert second.rating_histogram == {1: 1, 2: 0, 3: 0, 4: 0, 5: 0}
+
+    # Пересчет по всем отзывам дает те же значения
+    expected = (seller.rating_sum, seller.rating_count, first.rating_histogram, second.rating_histogram)
+    seller.rating_count = first.rating_5 = 0
+    db.commit()
+    assert backfill_rating_aggregates(db) == {"sellers": 1, "products": 2}
+    db.commit()
+    for obj in (seller, first, second):
+        db.refresh(obj)
+    assert (seller.rating_sum, seller.rating_count, first.rating_histogram, second.rating_histogram) == expected
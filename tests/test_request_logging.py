@@ -0,0 +1,81 @@
+import json
+import logging
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.middleware import RequestPipelineMiddleware
+from app.services.log_pipeline import JsonFormatter
+
+def make_client(**options):
+    app = FastAPI()
+    app.add_middleware(RequestPipelineMiddleware, **options)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return await request.json()
+
+    return TestClient(app)
+
+def test_request_logged_with_capped_body(caplog):
+    client = make_client(body_sample_rate=1.0, body_max_bytes=40)
+    with caplog.at_level(logging.INFO, logger="api"):
+        response = client.post("/echo", json={"password": "qwerty", "comment": "x" * 100})
+
+    # Приложение получило тело полностью, в лог попало только начало без пароля
+    assert response.json()["comment"] == "x" * 100
+    assert float(response.headers["x-process-time"]) >= 0
+    record = next(r for r in caplog.records if r.name == "api")
+    assert record.status == 200
+    assert record.path == "/echo"
+    assert "qwerty" not in record.body
+    assert record.body.startswith('{"password": "[СКРЫТО]"')
+    assert len(record.body.encode()) <= 40 + len("[СКРЫТО]".encode())
+
+def test_request_body_not_sampled(caplog):
+    client = make_client(body_sample_rate=0.0)
+    with caplog.at_level(logging.INFO, logger="api"):
+        client.post("/echo", json={"comment": "hello"})
+    record = next(r for r in caplog.records if r.name == "api")
+    assert not hasattr(record, "body")
+
+def test_json_formatter_includes_extra():
+    record = logging.LogRecord("api", logging.INFO, __file__, 1, "GET %s", ("/health",), None)
+    record.status = 200
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "GET /health"
+    assert entry["status"] == 200
+    assert entry["level"] == "INFO"
+
+def test_pipeline_user_headers_and_tunnel_url(tmp_path):
+    resolved = []
+    url_file = tmp_path / "serveo" / "current_url.txt"
+    app = FastAPI()
+    app.add_middleware(
+        RequestPipelineMiddleware,
+        user_resolver=lambda request: resolved.append(request.url.path) or "alice",
+        tunnel_url_file=url_file
+    )
+
+    @app.get("/page")
+    async def page(request: Request):
+        return {"user": getattr(request.state, "user", None)}
+
+    client = TestClient(app)
+
+    # Пользователь разбирается только для HTML-запросов
+    assert client.get("/page", headers={"accept": "application/json"}).json() == {"user": None}
+    response = client.get("/page", headers={"accept": "text/html"})
+    assert response.json() == {"user": "alice"}
+    assert resolved == ["/page"]
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["x-frame-options"] == "SAMEORIGIN"
+
+    # Файл с URL туннеля перезаписывается только при смене адреса
+    client.get("/page", headers={"host": "abc.serveo.net"})
+    assert url_file.read_text() == "http://abc.serveo.net"
+    url_file.write_text("changed")
+    client.get("/page", headers={"host": "abc.serveo.net"})
+    assert url_file.read_text() == "changed"
+    client.get("/page", headers={"host": "xyz.serveo.net"})
+    assert url_file.read_text() == "http://xyz.serveo.net"
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import List
+
+from pydantic import BaseModel
+from starlette.requests import Request
+
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.services.query_stats import capture_queries
+from app.services.response_cache import ResponseCache, catalog_cache
+
+class FakeRedis:
+    """
+    Хранилище ключей в памяти вместо Redis (общее для нескольких «процессов»)
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+class Item(BaseModel):
+    id: int
+    title: str
+
+def make_request(path="/items", query=b""):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query, "headers": []})
+
+def test_catalog_served_from_cache_until_invalidated(client, db):
+    seller = User(email="seller@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    db.add(Product(title="Товар", description="Описание товара", price=10.0, status=ProductStatus.ACTIVE.value, seller=seller))
+    db.commit()
+
+    first = client.get("/products/", params={"limit": 10, "skip": 0})
+    with capture_queries() as stats:
+        # Порядок параметров не влияет на ключ
+        second = client.get("/products/?skip=0&limit=10")
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    # Из базы читается только max(updated_at) для ETag
+    assert stats.count == 1
+    assert second.content == first.content
+    assert second.json()[0]["title"] == "Товар"
+
+    catalog_cache.bump()
+    assert client.get("/products/", params={"limit": 10, "skip": 0}).headers["x-cache"] == "MISS"
+
+def test_concurrent_misses_load_once():
+    cache = ResponseCache("test", FakeRedis(), ttl=60, local_size=10, version_check_interval=0)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [{"id": 1, "title": "a"}]
+
+    async def run():
+        return await asyncio.gather(*[cache.respond(make_request(), List[Item], load) for _ in range(10)])
+
+    responses = asyncio.run(run())
+    assert len(calls) == 1
+    assert {response.body for response in responses} == {b'[{"id":1,"title":"a"}]'}
+
+def test_shared_entries_and_version_between_processes():
+    redis = FakeRedis()
+    first = ResponseCache("test", redis, ttl=60, local_size=10, version_check_interval=0)
+    second = ResponseCache("test", redis, ttl=60, local_size=10, version_check_interval=0)
+    data = {"id": 1, "title": "a"}
+
+    async def load():
+        return dict(data)
+
+    async def get(cache):
+        return await cache.respond(make_request("/items/1"), Item, load)
+
+    assert asyncio.run(get(first)).headers["x-cache"] == "MISS"
+    assert asyncio.run(get(second)).headers["x-cache"] == "HIT"
+    assert second.redis_hits == 1
+
+    # Изменение в одном процессе делает записи другого недоступными
+    data["title"] = "b"
+    first.bump()
+    response = asyncio.run(get(second))
+    assert response.headers["x-cache"] == "MISS"
+    assert response.body == b'{"id":1,"title":"b"}'
+
+def test_uncacheable_response_not_stored():
+    cache = ResponseCache("test", FakeRedis(), ttl=60, local_size=10, version_check_interval=0)
+
+    async def load():
+        return {"id": 1, "title": "скрытый"}
+
+    async def get():
+        return await cache.respond(make_request(), Item, load, cacheable=lambda data: False)
+
+    assert asyncio.run(get()).headers["x-cache"] == "MISS"
+    assert asyncio.run(get()).headers["x-cache"] == "MISS"
+
+def test_slow_redis_does_not_block_event_loop():
+    class SlowRedis(FakeRedis):
+        def get(self, key):
+            time.sleep(0.05)
+            return super().get(key)
+
+    redis = SlowRedis()
+    cache = ResponseCache("test", redis, ttl=60, local_size=10, version_check_interval=0)
+
+    async def load():
+        return {"id": 1, "title": "a"}
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        # Запись заполняет другой процесс, захвативший блокировку:
+        # этот ждет ее появления, опрашивая Redis
+        key = await cache.make_key(make_request())
+        redis.set(f"{key}:lock", b"1")
+        waiting = asyncio.create_task(cache.respond(make_request(), Item, load))
+        await asyncio.sleep(0.3)
+        redis.set(key, b'{"id":1,"title":"a"}')
+        response = await waiting
+        task.cancel()
+        return response, ticks
+
+    response, ticks = asyncio.run(run())
+    # Ответ получен из записи другого процесса, без загрузки
+    assert (cache.coalesced, cache.misses) == (1, 0)
+    assert response.body == b'{"id":1,"title":"a"}'
+    # Чтения из Redis идут в потоках: loop продолжает обслуживать другие задачи
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.04
@@ -0,0 +1,60 @@
+from app.migrations.create_product_search_index import run_migration
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.services.search import build_fts5_query
+
+def test_build_fts5_query():
+    # Спецсимволы синтаксиса FTS5 не попадают в запрос
+    assert build_fts5_query('Ключ "Steam" OR -скин*') == '"ключ"* "steam"* "or"* "скин"*'
+    assert build_fts5_query("!!!") == ""
+
+def test_search_ranked_and_in_sync(client, engine, db):
+    seller = User(email="seller@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    exact = Product(
+        title="Ключ Steam для игры",
+        description="Ключ активации в Steam, ключ приходит сразу",
+        price=100.0,
+        status=ProductStatus.ACTIVE.value,
+        seller=seller
+    )
+    weak = Product(
+        title="Аккаунт с играми",
+        description="В описании упоминается ключ один раз",
+        price=200.0,
+        status=ProductStatus.ACTIVE.value,
+        seller=seller
+    )
+    db.add_all([exact, weak])
+    db.commit()
+
+    # Индекс строится по уже существующим товарам
+    assert run_migration(engine)
+
+    response = client.get("/products/", params={"search": "ключ"})
+    assert [p["id"] for p in response.json()] == [exact.id, weak.id]
+
+    # Новый товар сразу попадает в индекс
+    created = Product(
+        title="Подписка на сервис",
+        description="Годовая подписка с автопродлением",
+        price=300.0,
+        status=ProductStatus.ACTIVE.value,
+        seller=seller
+    )
+    db.add(created)
+    db.commit()
+    response = client.get("/products/", params={"search": "подписк"})
+    assert [p["id"] for p in response.json()] == [created.id]
+
+    # Изменение названия обновляет индекс
+    created.title = "Премиум доступ"
+    created.description = "Годовой доступ к сервису"
+    db.commit()
+    assert client.get("/products/", params={"search": "подписка"}).json() == []
+    assert [p["id"] for p in client.get("/products/", params={"search": "премиум"}).json()] == [created.id]
+
+    # Товар, снятый с публикации модератором, пропадает из выдачи
+    exact.status = ProductStatus.HIDDEN.value
+    db.commit()
+    response = client.get("/products/", params={"search": "ключ"})
+    assert [p["id"] for p in response.json()] == [weak.id]
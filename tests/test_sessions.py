@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import security
+from app.models.user import User
+from app.services import sessions as sessions_module
+from app.services.sessions import SessionStore, describe_device
+from app.services.token_cache import token_cache
+
+CHROME_WINDOWS = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+SAFARI_IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Version/17.0 Mobile/15E148 Safari/604.1"
+
+class RedisMock:
+    def get(self, key):
+        return None
+
+@pytest.fixture
+def redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_describe_device():
+    assert describe_device(CHROME_WINDOWS) == ("Chrome на Windows", "desktop")
+    assert describe_device(SAFARI_IPHONE) == ("Safari на iPhone", "mobile")
+    assert describe_device("") == ("Неизвестный браузер", "desktop")
+
+def test_sessions_listed_and_revoked_across_workers(redis, clock):
+    # Два процесса приложения с общим Redis
+    first = SessionStore(redis, ttl=3600, check_interval=5)
+    second = SessionStore(redis, ttl=3600, check_interval=5)
+
+    laptop = first.create(1, "10.0.0.1", CHROME_WINDOWS)
+    phone = first.create(1, "10.0.0.2", SAFARI_IPHONE)
+    first.create(2, "10.0.0.3", CHROME_WINDOWS)
+
+    sessions = second.list(1, current_sid=phone)
+    assert [s["id"] for s in sessions] == [phone, laptop]
+    assert sessions[0]["is_current"] and sessions[0]["device"] == "Safari на iPhone"
+    assert sessions[1]["ip"] == "10.0.0.1"
+    assert 0 < redis.ttl(f"session:{laptop}") <= 3600
+
+    assert second.is_active(laptop)
+    # Чужую сессию завершить нельзя
+    assert not first.revoke(2, laptop)
+    assert first.revoke(1, laptop)
+
+    # В процессе, завершившем сессию, она недействительна сразу,
+    # в остальных - после интервала проверки
+    assert not first.is_active(laptop)
+    assert second.is_active(laptop)
+    clock[0] += 5
+    assert not second.is_active(laptop)
+    assert [s["id"] for s in second.list(1)] == [phone]
+
+    assert first.revoke_all(1, except_sid=phone) == 0
+    assert first.revoke_all(1) == 1
+    assert first.list(1) == []
+
+def test_session_store_without_redis():
+    store = SessionStore(RedisMock())
+    assert store.create(1, "10.0.0.1", CHROME_WINDOWS) is None
+    assert store.is_active("unknown")
+    assert store.list(1) == []
+
+def test_revoked_session_token_rejected(redis, monkeypatch):
+    store = SessionStore(redis, ttl=3600, check_interval=5)
+    monkeypatch.setattr(security, "session_store", store)
+    token_cache.clear()
+
+    user = User(id=1, username="buyer", role="buyer")
+    request = SimpleNamespace(headers={"user-agent": CHROME_WINDOWS}, client=SimpleNamespace(host="10.0.0.1"))
+    token = security.create_session_token(user, request)
+    claims = security.decode_access_token(token)
+    assert claims["sid"] == store.list(1)[0]["id"]
+
+    store.revoke(1, claims["sid"])
+    # Проверенный токен остается в кэше токенов, но его сессия завершена
+    assert security.decode_access_token(token) is None
+    token_cache.clear()
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from app.models.user import User, UserRole
+from app.models.product import Product, ProductStatus
+from app.models.order import Order, OrderStatus
+from app.schemas.order import OrderItemCreate
+from app.services.stock import reserve_products
+
+def create_products(db, *quantities):
+    seller = User(email="s@example.com", username="seller", hashed_password="x", role=UserRole.SELLER.value)
+    buyer = User(email="b@example.com", username="buyer", hashed_password="x")
+    products = [
+        Product(title=f"Товар {i}", description="d", price=10.0 * (i + 1), quantity=quantity,
+                status=ProductStatus.ACTIVE.value, seller=seller)
+        for i, quantity in enumerate(quantities)
+    ]
+    db.add_all([buyer, *products])
+    db.commit()
+    return seller, buyer, products
+
+def test_reserve_products(db):
+    seller, buyer, (first, second) = create_products(db, 5, 1)
+
+    # Повторяющийся товар списывается суммарно, строки заказа сохраняются
+    items = [
+        OrderItemCreate(product_id=first.id, quantity=2),
+        OrderItemCreate(product_id=second.id, quantity=1),
+        OrderItemCreate(product_id=first.id, quantity=1),
+    ]
+    order_items, total = reserve_products(db, seller.id, items)
+    db.commit()
+    assert [item.quantity for item in order_items] == [2, 1, 1]
+    assert total == 10.0 * 3 + 20.0
+    db.refresh(first)
+    db.refresh(second)
+    assert (first.quantity, second.quantity) == (2, 0)
+
+    # Нехватка любого товара отменяет все списания заказа
+    with pytest.raises(HTTPException) as error:
+        reserve_products(db, seller.id, [
+            OrderItemCreate(product_id=first.id, quantity=1),
+            OrderItemCreate(product_id=second.id, quantity=1),
+        ])
+    assert error.value.status_code == 400
+    db.refresh(first)
+    assert first.quantity == 2
+
+def test_no_overselling_under_concurrency(db, engine):
+    stock = 25
+    seller, buyer, (product,) = create_products(db, stock)
+    session_factory = sessionmaker(bind=engine)
+
+    def buy(_):
+        session = session_factory()
+        try:
+            order_items, total = reserve_products(
+                session, seller.id, [OrderItemCreate(product_id=product.id, quantity=1)]
+            )
+            session.add(Order(buyer_id=buyer.id, seller_id=seller.id, total_amount=total,
+                              status=OrderStatus.PENDING.value, items=order_items))
+            session.commit()
+            return True
+        except HTTPException:
+            return False
+        finally:
+            session.close()
+
+    # Покупателей в четыре раза больше, чем товара на складе
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(buy, range(stock * 4)))
+
+    db.refresh(product)
+    assert results.count(True) == stock
+    assert product.quantity == 0
+    assert db.query(Order).count() == stock
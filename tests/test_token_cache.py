@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.database import get_db
+from app.models.user import User
+from app.security import (
+    create_access_token, create_password_reset_token, decode_access_token,
+    get_current_seller, get_current_user
+)
+from app.services import token_cache as token_cache_module
+from app.services import user_cache as user_cache_module
+from app.services.query_stats import capture_queries
+from app.services.token_cache import TokenCache, token_cache
+from app.services.user_cache import user_cache
+
+def make_token(user: User) -> str:
+    return create_access_token(
+        {"sub": user.username, "id": user.id, "role": user.role},
+        expires_delta=timedelta(minutes=5)
+    )
+
+@pytest.fixture
+def auth_client(engine, monkeypatch):
+    token_cache.clear()
+    user_cache.clear()
+    monkeypatch.setattr(user_cache_module, "SessionLocal", sessionmaker(bind=engine))
+
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(current_user: User = Depends(get_current_user)):
+        return {"username": current_user.username}
+
+    @app.get("/seller")
+    async def seller(current_user: User = Depends(get_current_seller)):
+        return {"username": current_user.username}
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as client:
+        yield client
+    token_cache.clear()
+    user_cache.clear()
+
+def test_token_cache_expires_with_token(monkeypatch):
+    cache = TokenCache(max_size=2)
+    now = token_cache_module.time.time()
+    cache.set("a", {"sub": "a", "exp": now + 60})
+    cache.set("no-exp", {"sub": "b"})
+
+    assert cache.get("a")["sub"] == "a"
+    assert cache.get("no-exp") is None
+
+    monkeypatch.setattr(token_cache_module.time, "time", lambda: now + 61)
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 0}
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2)
+    exp = token_cache_module.time.time() + 60
+    for token in ("a", "b"):
+        cache.set(token, {"sub": token, "exp": exp})
+    cache.get("a")
+    cache.set("c", {"sub": "c", "exp": exp})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+def test_decode_access_token_caches_only_valid_tokens():
+    token_cache.clear()
+    token = create_access_token({"sub": "buyer", "id": 1}, expires_delta=timedelta(minutes=5))
+
+    assert decode_access_token(token)["id"] == 1
+    assert decode_access_token(token)["id"] == 1
+    assert decode_access_token(token + "x") is None
+    # Токен сброса пароля не принимается как токен доступа
+    assert decode_access_token(create_password_reset_token("buyer@example.com")) is None
+    assert token_cache.stats() == {"hits": 1, "misses": 3, "size": 1}
+    token_cache.clear()
+
+def test_current_user_by_primary_key(auth_client, db):
+    user = User(email="buyer@example.com", username="buyer", hashed_password="x")
+    db.add(user)
+    db.commit()
+    token = make_token(user)
+
+    with capture_queries() as stats:
+        response = auth_client.get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json() == {"username": "buyer"}
+    assert stats.count == 1, stats.report()
+    assert any("users.id = " in shape for shape in stats.shapes), stats.report()
+
+    user.is_active = False
+    db.commit()
+    response = auth_client.get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+def test_role_check_answered_from_claims(auth_client, db):
+    buyer = User(email="buyer@example.com", username="buyer", hashed_password="x", role="buyer")
+    db.add(buyer)
+    db.commit()
+    headers = {"Authorization": f"Bearer {make_token(buyer)}"}
+
+    assert auth_client.get("/seller", headers=headers).status_code == 403
+    # Роль подтверждена кэшем пользователей - повторный отказ без запросов к базе
+    with capture_queries() as stats:
+        assert auth_client.get("/seller", headers=headers).status_code == 403
+    assert stats.count == 0
+
+    # После перехода в продавцы старый токен с ролью покупателя продолжает работать
+    buyer.role = "seller"
+    db.commit()
+    user_cache.invalidate(buyer.id)
+    response = auth_client.get("/seller", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"username": "buyer"}
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.config import settings
+from app.services.uploads import delete_upload, save_image_upload, sniff_image_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+class TrackingFile(io.BytesIO):
+    """
+    Файл загрузки, запоминающий наибольший размер одного чтения
+    """
+    largest_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.largest_read = max(self.largest_read, len(data))
+        return data
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+    return tmp_path
+
+def save(data: bytes, max_size: int = 10_000, filename: str = "photo.exe"):
+    file = TrackingFile(data)
+    # size не передается: размер становится известен только при копировании
+    upload = UploadFile(file, filename=filename)
+    return asyncio.run(save_image_upload(upload, "avatars", max_size=max_size)), file
+
+def test_sniff_image_type():
+    assert sniff_image_type(b"\xff\xd8\xff\xe0\x00\x10JFIF") == ".jpg"
+    assert sniff_image_type(PNG) == ".png"
+    assert sniff_image_type(b"GIF89a\x01\x00") == ".gif"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ".webp"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WAVEfmt ") is None
+    assert sniff_image_type(b"<svg xmlns=") is None
+
+def test_upload_streamed_in_chunks(upload_dir):
+    data = PNG + b"\x01" * 5000
+    relative_path, file = save(data)
+
+    # Расширение определяется по содержимому, а не по имени от клиента
+    assert relative_path.startswith("avatars") and relative_path.endswith(".png")
+    assert (upload_dir / relative_path).read_bytes() == data
+    assert file.largest_read <= 1024
+    assert os.listdir(upload_dir / "temp") == []
+
+    asyncio.run(delete_upload(relative_path))
+    assert not (upload_dir / relative_path).exists()
+
+def test_upload_rejected_without_leftovers(upload_dir):
+    with pytest.raises(HTTPException) as error:
+        save(b"MZ\x90\x00" + b"\x00" * 100)
+    assert error.value.status_code == 415
+
+    with pytest.raises(HTTPException) as error:
+        save(PNG + b"\x01" * 50_000, max_size=3000)
+    assert error.value.status_code == 413
+    assert os.listdir(upload_dir / "temp") == []
+    assert os.listdir(upload_dir / "avatars") == []
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.user import User
+from app.security import create_access_token, get_cookie_user
+from app.services import user_cache as user_cache_module
+from app.services.user_cache import UserCache, user_cache
+
+@pytest.fixture
+def cached_user(engine, db, monkeypatch):
+    # Кэш должен ходить во временную базу тестов
+    monkeypatch.setattr(user_cache_module, "SessionLocal", sessionmaker(bind=engine))
+    user_cache.clear()
+
+    user = User(email="buyer@example.com", username="buyer", hashed_password="x")
+    db.add(user)
+    db.commit()
+    yield user
+    user_cache.clear()
+
+def make_request(token: str):
+    return SimpleNamespace(cookies={"access_token": f"Bearer {token}"})
+
+def test_user_cache_ttl(monkeypatch):
+    cache = UserCache(ttl=30)
+    user = User(id=1, username="buyer")
+
+    assert cache.get(1) is None
+    cache.set(user)
+    assert cache.get(1) is user
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    # Запись устаревает по истечении TTL
+    now = user_cache_module.time.monotonic()
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now + 31)
+    assert cache.get(1) is None
+    assert cache.stats()["size"] == 0
+
+def test_cookie_user_served_from_cache(cached_user):
+    token = create_access_token(
+        {"sub": cached_user.username, "id": cached_user.id, "role": cached_user.role},
+        expires_delta=timedelta(minutes=5)
+    )
+
+    first = get_cookie_user(make_request(token))
+    second = get_cookie_user(make_request(token))
+
+    assert first.username == "buyer"
+    assert second is first
+    assert user_cache.stats()["misses"] == 1
+    assert user_cache.stats()["hits"] == 1
+
+def test_deactivation_reaches_other_workers(cached_user, db, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(user_cache, "redis", redis)
+    monkeypatch.setattr(user_cache, "version_check_interval", 0)
+    token = create_access_token({"sub": cached_user.username, "id": cached_user.id}, expires_delta=timedelta(minutes=5))
+    assert get_cookie_user(make_request(token)).is_active
+
+    # Администратор деактивирует пользователя в другом процессе
+    cached_user.is_active = False
+    db.commit()
+    UserCache(ttl=30, redis=redis).invalidate(cached_user.id)
+
+    assert get_cookie_user(make_request(token)) is None